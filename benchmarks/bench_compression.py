@@ -0,0 +1,91 @@
+"""Measure the CPU cost of response compression against the bytes it saves.
+
+Run from the project root with the usual environment variables set:
+
+    python -m benchmarks.bench_compression [--books 50,500,5000] [--seconds 1]
+
+The payloads are `/books` and `/books/{uid}` style JSON produced by the
+precompiled serializers. For every available encoding (gzip always, brotli and
+zstd when installed) and a range of levels this reports the compressed size,
+the share of bytes saved and the time one compression takes, which is what the
+middleware spends per response (in a worker thread above
+COMPRESSION_THREAD_THRESHOLD).
+"""
+
+import argparse
+import time
+
+import orjson
+
+from benchmarks.bench_serialization import make_book
+from src.books.schemas import Book, BookDetailModel
+from src.compression import BrotliEncoder, GzipEncoder, ZstdEncoder, brotli, zstandard
+from src.serializers import compile_serializer
+
+LEVELS = {
+    "gzip": (GzipEncoder, (1, 4, 6, 9)),
+    "br": (BrotliEncoder, (1, 4, 6, 11)),
+    "zstd": (ZstdEncoder, (1, 3, 9, 19)),
+}
+
+
+def payloads(book_counts):
+    list_serializer = compile_serializer(Book)
+    detail_serializer = compile_serializer(BookDetailModel)
+
+    for count in book_counts:
+        books = [make_book(i) for i in range(count)]
+        yield f"list x{count}", orjson.dumps(list_serializer.encode_many(books))
+
+    yield "detail", orjson.dumps(detail_serializer.encode(make_book(0, reviews=50)))
+
+
+def measure(encoder_class, level: int, body: bytes, seconds: float):
+    compressed = encoder_class(level).finish(body)
+    runs = 0
+    started = time.perf_counter()
+
+    while time.perf_counter() - started < seconds:
+        encoder_class(level).finish(body)
+        runs += 1
+
+    return len(compressed), (time.perf_counter() - started) / runs * 1000
+
+
+def main(book_counts, seconds: float):
+    available = {"gzip"}
+
+    if brotli is not None:
+        available.add("br")
+    if zstandard is not None:
+        available.add("zstd")
+
+    print(
+        f"{'payload':<14}{'encoding':<10}{'level':>6}{'bytes':>11}{'saved':>8}"
+        f"{'ms':>9}{'MB/s':>9}"
+    )
+
+    for name, body in payloads(book_counts):
+        print(f"{name:<14}{'identity':<10}{'':>6}{len(body):>11}")
+
+        for encoding, (encoder_class, levels) in LEVELS.items():
+            if encoding not in available:
+                continue
+
+            for level in levels:
+                size, ms = measure(encoder_class, level, body, seconds)
+                saved = 1 - size / len(body)
+                throughput = len(body) / 1024 / 1024 / (ms / 1000)
+                print(
+                    f"{'':<14}{encoding:<10}{level:>6}{size:>11}{saved:>8.1%}"
+                    f"{ms:>9.3f}{throughput:>9.1f}"
+                )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--books", default="50,500,5000")
+    parser.add_argument("--seconds", type=float, default=1.0)
+    args = parser.parse_args()
+
+    main([int(n) for n in args.books.split(",")], args.seconds)
@@ -0,0 +1,108 @@
+"""Compare the ORM read path with the raw asyncpg fast path against a live database.
+
+Run from the project root with DATABASE_URL pointing at a populated database:
+
+    python -m benchmarks.bench_fastpath [--iterations 200]
+
+For the book list, book detail and tag list queries this reports mean/p95
+latency and the peak Python memory allocated per call (tracemalloc). That both
+paths return the same JSON is checked by src/tests/test_fastpath.py.
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+import tracemalloc
+from typing import List
+from unittest import mock
+
+import orjson
+from sqlalchemy.orm import sessionmaker
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.books.schemas import Book, BookDetailModel
+from src.books.service import BookService
+from src.config import Config
+from src.db.main import async_engine
+from src.db.models import Book as BookRow
+from src.serializers import compile_serializer
+from src.tags.schemas import TagModel
+from src.tags.service import TagService
+
+Session = sessionmaker(bind=async_engine, class_=AsyncSession, expire_on_commit=False)
+
+book_service = BookService()
+tag_service = TagService()
+
+
+def render(model, result, many: bool) -> bytes:
+    serializer = compile_serializer(model)
+
+    if many:
+        return orjson.dumps(serializer.encode_many(result))
+
+    return orjson.dumps(serializer.encode(result))
+
+
+async def run(call, model, many: bool, fast: bool):
+    with mock.patch.object(Config, "DB_FAST_PATH", fast):
+        async with Session() as session:
+            return render(model, await call(session), many)
+
+
+async def measure(call, model, many: bool, fast: bool, iterations: int):
+    timings: List[float] = []
+    peaks: List[int] = []
+
+    for _ in range(iterations):
+        tracemalloc.start()
+        started = time.perf_counter()
+
+        await run(call, model, many, fast)
+
+        timings.append(time.perf_counter() - started)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+
+    timings.sort()
+
+    return (
+        statistics.mean(timings) * 1000,
+        timings[int(len(timings) * 0.95) - 1] * 1000,
+        statistics.mean(peaks) / 1024,
+    )
+
+
+async def main(iterations: int):
+    async with Session() as session:
+        book_uid = (await session.exec(select(BookRow.uid).limit(1))).first()
+
+    cases = [
+        ("book list", book_service.get_all_books, Book, True),
+        (
+            "book detail",
+            lambda session: book_service.get_book_detail(book_uid, session),
+            BookDetailModel,
+            False,
+        ),
+        ("tag list", tag_service.get_tags, TagModel, True),
+    ]
+
+    print(f"{'query':<14}{'path':<6}{'mean ms':>10}{'p95 ms':>10}{'peak KiB':>11}")
+
+    for name, call, model, many in cases:
+        for label, fast in (("orm", False), ("fast", True)):
+            mean, p95, peak = await measure(call, model, many, fast, iterations)
+            print(f"{name:<14}{label:<6}{mean:>10.2f}{p95:>10.2f}{peak:>11.1f}")
+
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    asyncio.run(main(args.iterations))
@@ -0,0 +1,112 @@
+"""Compare per-task SMTP connections with the pooled, batching mail sender.
+
+Runs against the in-process SMTP sink, so no mail provider is needed:
+
+    python -m benchmarks.bench_mail [--messages 500] [--threads 8] [--latency-ms 5]
+        [--handshake-ms 100] [--pool-size 4]
+
+`--threads` imitates a `--pool threads` email worker with that concurrency.
+"connect per message" is the previous behaviour: every task connects, logs in,
+sends and quits on a fresh event loop. "pooled" goes through `MailSender`,
+which reuses `--pool-size` sessions and sends queued messages in batches.
+"""
+
+import argparse
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import aiosmtplib
+
+from benchmarks.smtp_sink import SMTPSink
+from src.config import Config
+from src.mail import MailSender, SMTPPool, create_message, mail_config
+
+
+def start_sink(latency: float, handshake: float):
+    sink = SMTPSink(latency, handshake)
+    loop = asyncio.new_event_loop()
+    ready = threading.Event()
+    server = None
+
+    def run():
+        nonlocal server
+        asyncio.set_event_loop(loop)
+        server = loop.run_until_complete(sink.start())
+        ready.set()
+        loop.run_forever()
+
+    threading.Thread(target=run, daemon=True).start()
+    ready.wait()
+
+    return sink, server.sockets[0].getsockname()[1]
+
+
+def connect_per_message(config, message) -> None:
+    async def send():
+        smtp = aiosmtplib.SMTP(
+            hostname=config.MAIL_SERVER, port=config.MAIL_PORT, start_tls=False
+        )
+        await smtp.connect()
+        await smtp.login(config.MAIL_USERNAME, config.MAIL_PASSWORD)
+        await smtp.send_message(message)
+        await smtp.quit()
+
+    asyncio.run(send())
+
+
+def run(name: str, send, messages: int, threads: int, sink: SMTPSink) -> None:
+    message = create_message(["reader@example.com"], "Verify your email", "<p>Hi</p>")
+    sink.connections = 0
+    started = time.perf_counter()
+
+    with ThreadPoolExecutor(threads) as executor:
+        list(executor.map(lambda _: send(message), range(messages)))
+
+    elapsed = time.perf_counter() - started
+    print(
+        f"{name:<22}{messages / elapsed:>10.1f}{elapsed:>10.2f}{sink.connections:>13}"
+    )
+
+
+def main(
+    messages: int, threads: int, latency_ms: float, handshake_ms: float, pool_size: int
+) -> None:
+    sink, port = start_sink(latency_ms / 1000, handshake_ms / 1000)
+    config = mail_config.model_copy(
+        update={
+            "MAIL_SERVER": "127.0.0.1",
+            "MAIL_PORT": port,
+            "MAIL_STARTTLS": False,
+            "MAIL_SSL_TLS": False,
+            "USE_CREDENTIALS": True,
+        }
+    )
+    sender = MailSender(
+        SMTPPool(
+            config,
+            size=pool_size,
+            check_after=Config.MAIL_CHECK_AFTER_SECONDS,
+            max_messages=Config.MAIL_MAX_MESSAGES_PER_CONNECTION,
+        ),
+        batch_size=Config.MAIL_BATCH_SIZE,
+        batch_wait=Config.MAIL_BATCH_WAIT_MS / 1000,
+    )
+
+    print(f"{'mode':<22}{'msg/s':>10}{'seconds':>10}{'connections':>13}")
+    run("connect per message", lambda m: connect_per_message(config, m), messages, threads, sink)
+    run("pooled", lambda m: sender.send(m, timeout=60), messages, threads, sink)
+    sender.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=500)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--latency-ms", type=float, default=5)
+    parser.add_argument("--handshake-ms", type=float, default=100)
+    parser.add_argument("--pool-size", type=int, default=Config.MAIL_POOL_SIZE)
+    args = parser.parse_args()
+
+    main(args.messages, args.threads, args.latency_ms, args.handshake_ms, args.pool_size)
@@ -0,0 +1,220 @@
+"""Compare the response_model serialization path with the precompiled serializers.
+
+Run from the project root with the usual environment variables set:
+
+    python -m benchmarks.bench_serialization [--books 50] [--seconds 2]
+
+Two measurements are reported for each endpoint:
+
+- serialize: the per-request serialization work alone. The legacy path is
+  what FastAPI does with `response_model` (validate from attributes, dump to
+  JSON-compatible python, stdlib `json.dumps`); the fast path is
+  `Serializer.encode` + `orjson.dumps`.
+- end-to-end: requests per second through the ASGI app with auth and the
+  database stubbed out, with the routes returning ORM objects (legacy) or
+  the serializer's response (fast).
+"""
+
+import argparse
+import json
+import time
+import uuid
+from datetime import date, datetime
+from typing import List
+from unittest import mock
+
+import orjson
+from fastapi.testclient import TestClient
+from pydantic import TypeAdapter
+
+from src import app
+from src.auth.dependencies import get_current_user
+from src.auth.schemas import UserBooksModel
+from src.books.schemas import Book, BookDetailModel
+from src.db.main import get_session
+from src.db.models import Book as BookRow
+from src.db.models import Review, Tag, User
+from src.serializers import Serializer, compile_serializer
+from src.tags.schemas import TagModel
+
+
+def make_tag(i: int) -> Tag:
+    return Tag(
+        uid=uuid.uuid4(), name=f"tag-{i}", book_count=i, created_at=datetime.now()
+    )
+
+
+def make_book(i: int, reviews: int = 5, tags: int = 3) -> BookRow:
+    book = BookRow(
+        uid=uuid.uuid4(),
+        title=f"Book {i}",
+        author="Some Author",
+        publisher="Some Publisher",
+        published_date=date(2020, 1, 1),
+        page_count=300,
+        language="English",
+        created_at=datetime.now(),
+        update_at=datetime.now(),
+    )
+    book.reviews = [
+        Review(
+            uid=uuid.uuid4(),
+            rating=3,
+            review_text="A fine book " * 10,
+            user_uid=uuid.uuid4(),
+            book_uid=book.uid,
+            created_at=datetime.now(),
+            update_at=datetime.now(),
+        )
+        for _ in range(reviews)
+    ]
+    book.tags = [make_tag(t) for t in range(tags)]
+    return book
+
+
+def make_user(books: List[BookRow]) -> User:
+    user = User(
+        uid=uuid.uuid4(),
+        username="reader",
+        email="reader@example.com",
+        first_name="Avid",
+        last_name="Reader",
+        is_verified=True,
+        password_hash="x",
+        created_at=datetime.now(),
+        update_at=datetime.now(),
+    )
+    user.books = books
+    user.reviews = [review for book in books for review in book.reviews]
+    return user
+
+
+def rate(fn, seconds: float) -> float:
+    calls, deadline = 0, time.perf_counter() + seconds
+
+    while time.perf_counter() < deadline:
+        fn()
+        calls += 1
+
+    return calls / seconds
+
+
+def legacy_path(annotation, payload):
+    adapter = TypeAdapter(annotation)
+
+    def run():
+        validated = adapter.validate_python(payload, from_attributes=True)
+        content = adapter.dump_python(validated, mode="json")
+        json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode()
+
+    return run
+
+
+def fast_path(model, payload, many):
+    serializer = compile_serializer(model)
+
+    if many:
+        return lambda: orjson.dumps(serializer.encode_many(payload))
+
+    return lambda: orjson.dumps(serializer.encode(payload))
+
+
+def stub_app(books, tags, user):
+    import src.auth.routes as auth_routes
+    import src.books.routes as book_routes
+    import src.tags.routes as tag_routes
+
+    async def session():
+        yield None
+
+    async def all_books(*args, **kwargs):
+        return books
+
+    async def one_book(*args, **kwargs):
+        return books[0]
+
+    async def all_tags(*args, **kwargs):
+        return tags
+
+    app.dependency_overrides[get_session] = session
+    app.dependency_overrides[book_routes.acccess_token_bearer] = lambda: {}
+    app.dependency_overrides[book_routes.role_checker.dependency] = lambda: True
+    app.dependency_overrides[tag_routes.user_role_checker.dependency] = lambda: True
+    app.dependency_overrides[auth_routes.role_checker] = lambda: True
+    app.dependency_overrides[get_current_user] = lambda: user
+
+    return [
+        mock.patch.object(book_routes.book_service, "get_all_books", all_books),
+        mock.patch.object(book_routes.book_service, "get_book", one_book),
+        mock.patch.object(tag_routes.tag_service, "get_tags", all_tags),
+    ]
+
+
+def legacy_responses():
+    return [
+        mock.patch.object(Serializer, "response", lambda self, obj, **kwargs: obj),
+        mock.patch.object(Serializer, "list_response", lambda self, objs: objs),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--books", type=int, default=50)
+    parser.add_argument("--seconds", type=float, default=2.0)
+    args = parser.parse_args()
+
+    books = [make_book(i) for i in range(args.books)]
+    tags = [make_tag(i) for i in range(args.books * 4)]
+    user = make_user(books[:10])
+
+    cases = [
+        ("GET /books", List[Book], Book, books, True),
+        ("GET /books/{uid}", BookDetailModel, BookDetailModel, books[0], False),
+        ("GET /tags", List[TagModel], TagModel, tags, True),
+        ("GET /auth/me", UserBooksModel, UserBooksModel, user, False),
+    ]
+
+    print("serialize (ops/s)")
+    print(f"{'endpoint':<20}{'legacy':>12}{'fast':>12}{'speedup':>10}")
+
+    for name, annotation, model, payload, many in cases:
+        legacy = rate(legacy_path(annotation, payload), args.seconds)
+        fast = rate(fast_path(model, payload, many), args.seconds)
+        print(f"{name:<20}{legacy:>12.0f}{fast:>12.0f}{fast / legacy:>9.1f}x")
+
+    urls = [
+        ("GET /books", "/api/v1/books/"),
+        ("GET /books/{uid}", f"/api/v1/books/{books[0].uid}"),
+        ("GET /tags", "/api/v1/tags/"),
+        ("GET /auth/me", "/api/v1/auth/me"),
+    ]
+
+    stubs = stub_app(books, tags, user)
+    for patcher in stubs:
+        patcher.start()
+
+    client = TestClient(app, base_url="http://localhost")
+
+    print("\nend-to-end (requests/s)")
+    print(f"{'endpoint':<20}{'legacy':>12}{'fast':>12}{'speedup':>10}")
+
+    for name, url in urls:
+        fast = rate(lambda: client.get(url), args.seconds)
+
+        patchers = legacy_responses()
+        for patcher in patchers:
+            patcher.start()
+        legacy = rate(lambda: client.get(url), args.seconds)
+        for patcher in patchers:
+            patcher.stop()
+
+        print(f"{name:<20}{legacy:>12.0f}{fast:>12.0f}{fast / legacy:>9.1f}x")
+
+    for patcher in stubs:
+        patcher.stop()
+
+    app.dependency_overrides.clear()
+
+
+if __name__ == "__main__":
+    main()
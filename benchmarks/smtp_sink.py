@@ -0,0 +1,92 @@
+"""A local SMTP server that accepts and discards every message.
+
+Stands in for the mail provider in benchmarks and local runs:
+
+    python -m benchmarks.smtp_sink [--port 1025] [--latency-ms 5] [--handshake-ms 100]
+
+then point the worker at it with MAIL_SERVER=localhost MAIL_PORT=1025
+MAIL_STARTTLS=false USE_CREDENTIALS=false. `--latency-ms` delays every reply
+to imitate the round trip to a remote server, and `--handshake-ms` is added to
+the greeting and AUTH replies to stand in for the TLS handshake and login a
+real provider needs, which is what connection reuse saves. AUTH is accepted
+with any credentials; there is no TLS.
+"""
+
+import argparse
+import asyncio
+
+
+class SMTPSink:
+    def __init__(self, latency: float = 0.0, handshake: float = 0.0) -> None:
+        self.latency = latency
+        self.handshake = handshake
+        self.messages = 0
+        self.connections = 0
+
+    async def reply(self, writer: asyncio.StreamWriter, line: str) -> None:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        writer.write(line.encode() + b"\r\n")
+        await writer.drain()
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        await asyncio.sleep(self.handshake)
+        await self.reply(writer, "220 bookly-sink ESMTP")
+
+        try:
+            while line := await reader.readline():
+                command = line.decode(errors="replace").strip()
+                verb = command.split(" ", 1)[0].upper()
+
+                if verb == "EHLO":
+                    await self.reply(
+                        writer, "250-bookly-sink\r\n250-8BITMIME\r\n250 AUTH PLAIN LOGIN"
+                    )
+                elif verb == "AUTH":
+                    if command.upper().startswith("AUTH LOGIN"):
+                        for prompt in ("334 VXNlcm5hbWU6", "334 UGFzc3dvcmQ6"):
+                            await self.reply(writer, prompt)
+                            await reader.readline()
+
+                    await asyncio.sleep(self.handshake)
+                    await self.reply(writer, "235 Authentication successful")
+                elif verb == "DATA":
+                    await self.reply(writer, "354 End data with <CR><LF>.<CR><LF>")
+
+                    while (await reader.readline()) not in (b".\r\n", b""):
+                        pass
+
+                    self.messages += 1
+                    await self.reply(writer, "250 OK queued")
+                elif verb == "QUIT":
+                    await self.reply(writer, "221 Bye")
+                    break
+                elif verb in ("HELO", "MAIL", "RCPT", "RSET", "NOOP"):
+                    await self.reply(writer, "250 OK")
+                else:
+                    await self.reply(writer, "502 Command not implemented")
+        finally:
+            writer.close()
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> asyncio.Server:
+        return await asyncio.start_server(self.handle, host, port)
+
+
+async def main(port: int, latency_ms: float, handshake_ms: float) -> None:
+    server = await SMTPSink(latency_ms / 1000, handshake_ms / 1000).start(port=port)
+    print(f"SMTP sink listening on {server.sockets[0].getsockname()}")
+
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=1025)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--handshake-ms", type=float, default=0)
+    args = parser.parse_args()
+
+    asyncio.run(main(args.port, args.latency_ms, args.handshake_ms))
@@ -0,0 +1,28 @@
+"""add tag name trigram index
+
+Revision ID: 5c2b8e1f9a37
+Revises: a04d79012711
+Create Date: 2026-10-19 09:12:41.513206
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c2b8e1f9a37'
+down_revision: Union[str, None] = 'a04d79012711'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.execute(
+        "CREATE INDEX ix_tags_name_trgm ON tags USING gin (lower(name) gin_trgm_ops)"
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS ix_tags_name_trgm")
@@ -0,0 +1,40 @@
+"""add tag book count
+
+Revision ID: 8e4f0d6a2b91
+Revises: 5c2b8e1f9a37
+Create Date: 2026-10-19 10:02:17.840562
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8e4f0d6a2b91'
+down_revision: Union[str, None] = '5c2b8e1f9a37'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        'tags',
+        sa.Column('book_count', sa.INTEGER(), server_default='0', nullable=False),
+    )
+    op.execute(
+        "UPDATE tags SET book_count = counts.n "
+        "FROM (SELECT tag_id, count(*) AS n FROM booktag GROUP BY tag_id) AS counts "
+        "WHERE tags.uid = counts.tag_id"
+    )
+    op.create_index(op.f('ix_tags_book_count'), 'tags', ['book_count'], unique=False)
+    op.create_index(
+        'ix_booktag_tag_id_book_id', 'booktag', ['tag_id', 'book_id'], unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_booktag_tag_id_book_id', table_name='booktag')
+    op.drop_index(op.f('ix_tags_book_count'), table_name='tags')
+    op.drop_column('tags', 'book_count')
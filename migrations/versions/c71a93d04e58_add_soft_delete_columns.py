@@ -0,0 +1,43 @@
+"""add soft delete columns
+
+Revision ID: c71a93d04e58
+Revises: 8e4f0d6a2b91
+Create Date: 2026-10-19 11:24:05.117382
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = 'c71a93d04e58'
+down_revision: Union[str, None] = '8e4f0d6a2b91'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+LIVE_ROWS = sa.text('deleted_at IS NULL')
+TOMBSTONED_ROWS = sa.text('deleted_at IS NOT NULL')
+
+
+def upgrade() -> None:
+    op.add_column('books', sa.Column('deleted_at', postgresql.TIMESTAMP(), nullable=True))
+    op.add_column('reviews', sa.Column('deleted_at', postgresql.TIMESTAMP(), nullable=True))
+    op.create_index('ix_books_live_created_at', 'books', ['created_at'], unique=False, postgresql_where=LIVE_ROWS)
+    op.create_index('ix_books_live_user_uid', 'books', ['user_uid', 'created_at'], unique=False, postgresql_where=LIVE_ROWS)
+    op.create_index('ix_books_deleted_at', 'books', ['deleted_at'], unique=False, postgresql_where=TOMBSTONED_ROWS)
+    op.create_index('ix_reviews_live_book_uid', 'reviews', ['book_uid'], unique=False, postgresql_where=LIVE_ROWS)
+    op.create_index('ix_reviews_live_created_at', 'reviews', ['created_at'], unique=False, postgresql_where=LIVE_ROWS)
+    op.create_index('ix_reviews_deleted_at', 'reviews', ['deleted_at'], unique=False, postgresql_where=TOMBSTONED_ROWS)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_reviews_deleted_at', table_name='reviews')
+    op.drop_index('ix_reviews_live_created_at', table_name='reviews')
+    op.drop_index('ix_reviews_live_book_uid', table_name='reviews')
+    op.drop_index('ix_books_deleted_at', table_name='books')
+    op.drop_index('ix_books_live_user_uid', table_name='books')
+    op.drop_index('ix_books_live_created_at', table_name='books')
+    op.drop_column('reviews', 'deleted_at')
+    op.drop_column('books', 'deleted_at')
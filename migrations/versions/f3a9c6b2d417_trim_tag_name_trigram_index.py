@@ -0,0 +1,32 @@
+"""trim tag name trigram index
+
+Revision ID: f3a9c6b2d417
+Revises: e2d5a7c90b14
+Create Date: 2026-10-19 16:04:27.318845
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3a9c6b2d417'
+down_revision: Union[str, None] = 'e2d5a7c90b14'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS ix_tags_name_trgm")
+    op.execute(
+        "CREATE INDEX ix_tags_name_trgm ON tags "
+        "USING gin (lower(trim(name)) gin_trgm_ops)"
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS ix_tags_name_trgm")
+    op.execute(
+        "CREATE INDEX ix_tags_name_trgm ON tags USING gin (lower(name) gin_trgm_ops)"
+    )
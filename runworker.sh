@@ -1,4 +1,11 @@
+# Transactional mail gets a worker of its own so bulk sends never delay it;
+# the thread pool lets the pooled SMTP sender batch concurrent messages.
+celery -A src.celery_tasks.c_app worker -Q transactional -n transactional@%h --pool threads --concurrency 8 --loglevel=INFO &
 
-celery -A src.celery_tasks.c_app worker --loglevel=INFO &
+celery -A src.celery_tasks.c_app worker -Q bulk -n bulk@%h --pool threads --concurrency 8 --loglevel=INFO &
 
-celery -A src.celery_tasks.c_app flower
\ No newline at end of file
+celery -A src.celery_tasks.c_app worker -Q maintenance,default -n maintenance@%h --concurrency 2 --loglevel=INFO &
+
+celery -A src.celery_tasks.c_app beat --loglevel=INFO &
+
+celery -A src.celery_tasks.c_app flower
@@ -1,12 +1,23 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
+from src.admin.routes import admin_router
 from src.auth.routes import auth_router
 from src.books.routes import book_router
 from src.reviews.routes import review_router
 from src.tags.routes import tags_router
 from .errors import register_all_errors
+from .config import Config
+from .health import health_router
+from .logger import setup_logging
+from .loop_monitor import loop_monitor
+from .metrics import mark_process_dead, metrics_router
 from .middleware import register_middleware
 
 
+setup_logging()
+
 version = "v1"
 
 description = """
@@ -20,6 +31,20 @@ This REST API is able to;
 
 version_prefix =f"/api/{version}"
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if Config.LOOP_MONITOR_ENABLED:
+        loop_monitor.start()
+
+    yield
+
+    if Config.LOOP_MONITOR_ENABLED:
+        await loop_monitor.stop()
+
+    mark_process_dead()
+
+
 app = FastAPI(
     title="Bookly",
     description=description,
@@ -33,7 +58,9 @@ app = FastAPI(
     terms_of_service="httpS://example.com/tos",
     openapi_url=f"{version_prefix}/openapi.json",
     docs_url=f"{version_prefix}/docs",
-    redoc_url=f"{version_prefix}/redoc"
+    redoc_url=f"{version_prefix}/redoc",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan,
 )
 
 register_all_errors(app)
@@ -45,3 +72,6 @@ app.include_router(book_router, prefix=f"{version_prefix}/books", tags=["books"]
 app.include_router(auth_router, prefix=f"{version_prefix}/auth", tags=["auth"])
 app.include_router(review_router, prefix=f"{version_prefix}/reviews", tags=["reviews"])
 app.include_router(tags_router, prefix=f"{version_prefix}/tags", tags=["tags"])
+app.include_router(admin_router, prefix=f"{version_prefix}/admin", tags=["admin"])
+app.include_router(metrics_router)
+app.include_router(health_router)
@@ -0,0 +1,153 @@
+import asyncio
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import List, Optional
+
+import orjson
+
+from src.auth.dependencies import RoleChecker
+from src.auth.service import UserService
+from src.auth.utils import decode_token
+from src.config import Config
+from src.db.main import standalone_session
+from src.db.redis import redis_client, token_in_blocklist
+
+PROFILES_KEY = "bookly:profiles"
+PROFILE_KEY = "bookly:profiles:{}"
+QUOTA_KEY = "bookly:profiles:quota:{}"
+
+IDLE_STACK = "(awaiting I/O)"
+
+user_service = UserService()
+admin_role_checker = RoleChecker(["admin"])
+
+
+def frame_label(frame) -> str:
+    code = frame.f_code
+
+    return f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})"
+
+
+class RequestProfiler:
+    """Sample the event loop thread while one request's task is running.
+
+    Samples taken while the loop is running some other task are counted as
+    time the request spent awaiting I/O, so the totals add up to wall time.
+    """
+
+    def __init__(self, interval: float, max_seconds: float) -> None:
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self.stacks: Counter = Counter()
+        self.stopped = threading.Event()
+        self.loop = asyncio.get_running_loop()
+        self.task = asyncio.current_task()
+        self.thread_id = threading.get_ident()
+        self.thread = threading.Thread(target=self.run, name="bookly-profiler", daemon=True)
+
+    def start(self) -> None:
+        self.thread.start()
+
+    def stop(self) -> None:
+        self.stopped.set()
+        self.thread.join()
+
+    def run(self) -> None:
+        deadline = time.monotonic() + self.max_seconds
+
+        while not self.stopped.wait(self.interval) and time.monotonic() < deadline:
+            if asyncio.current_task(self.loop) is not self.task:
+                self.stacks[IDLE_STACK] += 1
+                continue
+
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+
+            while frame is not None:
+                stack.append(frame_label(frame))
+                frame = frame.f_back
+
+            self.stacks[";".join(reversed(stack))] += 1
+
+    def folded(self) -> str:
+        """Stacks in the folded format read by flamegraph.pl and speedscope"""
+
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.items())
+
+
+class ProfileStore:
+    """Profiles kept in Redis so any worker can serve the download"""
+
+    async def acquire_slot(self) -> bool:
+        key = QUOTA_KEY.format(int(time.time() // 60))
+
+        async with redis_client.pipeline(transaction=True) as pipe:
+            pipe.incr(key)
+            pipe.expire(key, 120)
+            used, _ = await pipe.execute()
+
+        return used <= Config.PROFILE_MAX_PER_MINUTE
+
+    async def save(self, profile_id: str, meta: dict, folded: str) -> None:
+        now = time.time()
+        ttl = Config.PROFILE_TTL_SECONDS
+
+        async with redis_client.pipeline(transaction=True) as pipe:
+            pipe.set(PROFILE_KEY.format(profile_id), folded, ex=ttl)
+            pipe.set(PROFILE_KEY.format(f"{profile_id}:meta"), orjson.dumps(meta), ex=ttl)
+            pipe.zadd(PROFILES_KEY, {profile_id: now})
+            pipe.zremrangebyscore(PROFILES_KEY, 0, now - ttl)
+            await pipe.execute()
+
+    async def list(self, limit: int = 50) -> List[dict]:
+        profile_ids = await redis_client.zrevrange(PROFILES_KEY, 0, limit - 1)
+
+        if not profile_ids:
+            return []
+
+        metas = await redis_client.mget(
+            [PROFILE_KEY.format(f"{pid.decode()}:meta") for pid in profile_ids]
+        )
+
+        return [orjson.loads(meta) for meta in metas if meta is not None]
+
+    async def get(self, profile_id: str) -> Optional[bytes]:
+        return await redis_client.get(PROFILE_KEY.format(profile_id))
+
+
+async def is_admin(authorization: Optional[str]) -> bool:
+    """Apply the access token and `RoleChecker(["admin"])` checks outside of a route"""
+
+    scheme, _, token = (authorization or "").partition(" ")
+
+    if scheme.lower() != "bearer" or not token:
+        return False
+
+    token_data = decode_token(token)
+
+    if token_data is None or token_data.get("refresh"):
+        return False
+
+    if await token_in_blocklist(token_data["jti"]):
+        return False
+
+    async with standalone_session() as session:
+        user = await user_service.get_user_by_email(token_data["user"]["email"], session)
+
+    if user is None:
+        return False
+
+    try:
+        return admin_role_checker(current_user=user)
+    except Exception:
+        return False
+
+
+def new_profile_id() -> str:
+    return uuid.uuid4().hex
+
+
+profile_store = ProfileStore()
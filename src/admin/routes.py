@@ -0,0 +1,52 @@
+from typing import List
+
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import PlainTextResponse
+
+from src.admission import admission_priority
+from src.auth.dependencies import RoleChecker
+from src.db.slow_queries import slow_query_log
+from src.errors import ProfileNotFound
+
+from .profiling import profile_store
+from .schemas import ProfileModel, SlowQueryModel
+
+admin_router = APIRouter()
+admin_role_checker = Depends(RoleChecker(["admin"]))
+
+
+@admin_router.get(
+    "/slow-queries",
+    response_model=List[SlowQueryModel],
+    dependencies=[admin_role_checker],
+)
+@admission_priority("low")
+async def get_slow_queries(limit: int = Query(default=20, ge=1, le=100)):
+    return await slow_query_log.top_offenders(limit)
+
+
+@admin_router.get(
+    "/profiles", response_model=List[ProfileModel], dependencies=[admin_role_checker]
+)
+@admission_priority("low")
+async def get_profiles(limit: int = Query(default=50, ge=1, le=200)):
+    return await profile_store.list(limit)
+
+
+@admin_router.get(
+    "/profiles/{profile_id}",
+    response_class=PlainTextResponse,
+    dependencies=[admin_role_checker],
+)
+async def download_profile(profile_id: str):
+    folded = await profile_store.get(profile_id)
+
+    if folded is None:
+        raise ProfileNotFound()
+
+    return PlainTextResponse(
+        folded,
+        headers={
+            "Content-Disposition": f'attachment; filename="profile-{profile_id}.folded"'
+        },
+    )
@@ -0,0 +1,26 @@
+from typing import Any, List, Optional
+
+from pydantic import BaseModel
+
+
+class SlowQueryModel(BaseModel):
+    fingerprint: str
+    count: int
+    total_ms: float
+    mean_ms: Optional[float] = None
+    statement: Optional[str] = None
+    parameter_shapes: List[str] = []
+    origin: Optional[str] = None
+    elapsed_ms: Optional[float] = None
+    seen_at: Optional[str] = None
+    plan: Any = None
+
+
+class ProfileModel(BaseModel):
+    uid: str
+    method: str
+    path: str
+    status: int
+    duration_ms: float
+    samples: int
+    created_at: float
@@ -0,0 +1,175 @@
+import asyncio
+import time
+from collections import deque
+from typing import Dict
+
+from src.config import Config
+from src.metrics import ADMISSION_IN_FLIGHT, ADMISSION_LIMIT, ADMISSION_QUEUED, ADMISSION_SHED
+from src.routing import route_policy
+
+PRIORITIES = ("critical", "normal", "low")
+
+
+class Overloaded(Exception):
+    """The request was shed; the caller should answer 503"""
+
+
+def admission_priority(priority: str):
+    """Mark a route critical (shed last) or low (shed first); default is normal"""
+
+    if priority not in PRIORITIES:
+        raise ValueError(f"Unknown admission priority {priority!r}")
+
+    return route_policy("priority", priority)
+
+
+class AdmissionController:
+    """Per-worker concurrency limit adapted with AIMD on observed latency.
+
+    The limit grows by 1/limit for every request finishing under the target
+    latency and is multiplied by `backoff` (at most once per interval) when
+    one is slower. Requests over the limit wait in a bounded queue until a
+    deadline; critical requests may go a little over the limit and low
+    priority ones only get a share of it, so they are shed first.
+    """
+
+    def __init__(
+        self,
+        initial_limit: float,
+        min_limit: float,
+        max_limit: float,
+        target_latency: float,
+        queue_size: int,
+        queue_timeout: float,
+    ) -> None:
+        self.limit = initial_limit
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.target_latency = target_latency
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.queues: Dict[str, deque] = {priority: deque() for priority in PRIORITIES}
+        self.last_decrease = 0.0
+        ADMISSION_LIMIT.set(self.limit)
+
+    def capacity(self, priority: str) -> float:
+        if priority == "critical":
+            return self.limit + Config.ADMISSION_CRITICAL_HEADROOM
+
+        if priority == "low":
+            return self.limit * Config.ADMISSION_LOW_PRIORITY_SHARE
+
+        return self.limit
+
+    def queued(self) -> int:
+        return sum(len(queue) for queue in self.queues.values())
+
+    def waiting_ahead(self, priority: str) -> bool:
+        for other in PRIORITIES[: PRIORITIES.index(priority) + 1]:
+            if any(not future.done() for future in self.queues[other]):
+                return True
+
+        return False
+
+    async def acquire(self, priority: str) -> None:
+        if self.in_flight < self.capacity(priority) and not self.waiting_ahead(priority):
+            self.admit()
+            return
+
+        if self.queued() >= self.queue_size and not self.evict_below(priority):
+            ADMISSION_SHED.labels(priority, "queue_full").inc()
+            raise Overloaded()
+
+        future = asyncio.get_running_loop().create_future()
+        self.queues[priority].append(future)
+        ADMISSION_QUEUED.inc()
+
+        try:
+            await asyncio.wait_for(future, self.queue_timeout)
+        except asyncio.TimeoutError:
+            ADMISSION_SHED.labels(priority, "timeout").inc()
+            raise Overloaded()
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled() and future.exception() is None:
+                # The slot was handed over just as the client went away
+                self.release(None)
+            raise
+        finally:
+            ADMISSION_QUEUED.dec()
+
+            try:
+                self.queues[priority].remove(future)
+            except ValueError:
+                pass
+
+    def evict_below(self, priority: str) -> bool:
+        """Shed the newest waiter of a lower priority to make room"""
+
+        for lower in reversed(PRIORITIES[PRIORITIES.index(priority) + 1 :]):
+            queue = self.queues[lower]
+
+            while queue:
+                future = queue.pop()
+
+                if not future.done():
+                    future.set_exception(Overloaded())
+                    ADMISSION_SHED.labels(lower, "evicted").inc()
+                    return True
+
+        return False
+
+    def admit(self) -> None:
+        self.in_flight += 1
+        ADMISSION_IN_FLIGHT.inc()
+
+    def release(self, latency) -> None:
+        self.in_flight -= 1
+        ADMISSION_IN_FLIGHT.dec()
+
+        if latency is not None:
+            self.adjust(latency)
+
+        self.wake()
+
+    def wake(self) -> None:
+        for priority in PRIORITIES:
+            queue = self.queues[priority]
+
+            while queue and self.in_flight < self.capacity(priority):
+                future = queue.popleft()
+
+                if not future.done():
+                    self.admit()
+                    future.set_result(None)
+
+    def adjust(self, latency: float) -> None:
+        if latency <= self.target_latency:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+        else:
+            now = time.monotonic()
+
+            if now - self.last_decrease < Config.ADMISSION_DECREASE_INTERVAL_SECONDS:
+                return
+
+            self.last_decrease = now
+            self.limit = max(self.min_limit, self.limit * Config.ADMISSION_BACKOFF)
+
+        ADMISSION_LIMIT.set(self.limit)
+
+    def snapshot(self) -> dict:
+        return {
+            "limit": round(self.limit, 2),
+            "in_flight": self.in_flight,
+            "queued": self.queued(),
+        }
+
+
+admission_controller = AdmissionController(
+    initial_limit=Config.ADMISSION_INITIAL_LIMIT,
+    min_limit=Config.ADMISSION_MIN_LIMIT,
+    max_limit=Config.ADMISSION_MAX_LIMIT,
+    target_latency=Config.ADMISSION_TARGET_LATENCY_MS / 1000,
+    queue_size=Config.ADMISSION_QUEUE_SIZE,
+    queue_timeout=Config.ADMISSION_QUEUE_TIMEOUT_MS / 1000,
+)
@@ -9,6 +9,8 @@ from sqlmodel.ext.asyncio.session import AsyncSession
 from src.db.main import get_session
 from src.db.models import User
 from src.db.redis import token_in_blocklist
+from src.db.stats import timed_phase
+from src.tracing import span, traced
 
 from .service import UserService
 from .utils import decode_token
@@ -28,19 +30,20 @@ class TokenBearer(HTTPBearer):
         super().__init__(auto_error=auto_error)
 
     async def __call__(self, request: Request) -> HTTPAuthorizationCredentials | None:
-        creds = await super().__call__(request)
+        with timed_phase("auth"), span(type(self).__name__):
+            creds = await super().__call__(request)
 
-        token = creds.credentials
+            token = creds.credentials
 
-        token_data = decode_token(token)
+            token_data = decode_token(token)
 
-        if not self.token_valid(token):
-            raise InvalidToken()
+            if not self.token_valid(token):
+                raise InvalidToken()
 
-        if await token_in_blocklist(token_data["jti"]):
-            raise InvalidToken()
+            if await token_in_blocklist(token_data["jti"]):
+                raise InvalidToken()
 
-        self.verify_token_data(token_data)
+            self.verify_token_data(token_data)
 
         return token_data
 
@@ -65,6 +68,7 @@ class RefreshTokenBearer(TokenBearer):
             raise RefreshTokenRequired()
 
 
+@traced("get_current_user")
 async def get_current_user(
     token_details: dict = Depends(AccessTokenBearer()),
     session: AsyncSession = Depends(get_session),
@@ -80,6 +84,7 @@ class RoleChecker:
     def __init__(self, allowed_roles: List[str]) -> None:
         self.allowed_roles = allowed_roles
 
+    @traced("RoleChecker")
     def __call__(self, current_user: User = Depends(get_current_user)) -> Any:
         if not current_user.is_verified:
             raise AccountNotVerified()
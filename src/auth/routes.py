@@ -2,10 +2,12 @@ from datetime import datetime, timedelta
 
 from fastapi import APIRouter, Depends, status, BackgroundTasks
 from fastapi.exceptions import HTTPException
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import JSONResponse
 from sqlmodel.ext.asyncio.session import AsyncSession
 
 from src.db.main import get_session
+from src.db.bulkhead import db_bulkhead
 from src.db.redis import add_jti_to_blocklist
 
 from .dependencies import (
@@ -20,6 +22,7 @@ from .schemas import (
     UserLoginModel,
     UserModel,
     EmailModel,
+    BulkMailJobModel,
     PasswordResetRequestModel,
     PasswordResetConfirmModel,
 )
@@ -31,14 +34,25 @@ from .utils import (
     create_url_safe_token,
     decode_url_safe_token,
 )
-from src.errors import UserAlreadyExists, UserNotFound, InvalidCredentials, InvalidToken
+from src.errors import (
+    UserAlreadyExists,
+    UserNotFound,
+    InvalidCredentials,
+    InvalidToken,
+    MailJobNotFound,
+)
 from src.config import Config
 from src.db.main import get_session
-from src.celery_tasks import send_email
+from src.celery_tasks import send_bulk_mail, send_email
+from src.bulk_mail import bulk_mail_jobs, plan_chunks
+from src.ratelimit import rate_limit
+from src.admission import admission_priority
+from src.serializers import compile_serializer
 
 auth_router = APIRouter()
 user_service = UserService()
 role_checker = RoleChecker(["admin", "user"])
+user_books_serializer = compile_serializer(UserBooksModel)
 
 
 REFRESH_TOKEN_EXPIRY = 2
@@ -47,19 +61,37 @@ REFRESH_TOKEN_EXPIRY = 2
 # Bearer Token
 
 
-@auth_router.post("/send_mail")
+@auth_router.post(
+    "/send_mail",
+    status_code=status.HTTP_202_ACCEPTED,
+    dependencies=[Depends(RoleChecker(["admin"]))],
+)
+@rate_limit(per_minute=10, burst=5)
 async def send_mail(emails: EmailModel):
-    emails = emails.addresses
+    chunks = plan_chunks(emails.addresses, Config.MAIL_BULK_CHUNK_SIZE)
+    job_id = await bulk_mail_jobs.create(chunks, "welcome", {})
+    await run_in_threadpool(send_bulk_mail, job_id, chunks)
+
+    return {"message": "Emails queued for sending", "job_id": job_id}
 
-    html = "<h1>Welcome to the app</h1>"
-    subject = "Welcome to our app"
 
-    send_email.delay(emails, subject, html)
+@auth_router.get(
+    "/send_mail/{job_id}",
+    response_model=BulkMailJobModel,
+    dependencies=[Depends(RoleChecker(["admin"]))],
+)
+async def get_send_mail_status(job_id: str):
+    job = await bulk_mail_jobs.status(job_id)
+
+    if job is None:
+        raise MailJobNotFound()
 
-    return {"message": "Email sent successfully"}
+    return job
 
 
 @auth_router.post("/signup", status_code=status.HTTP_201_CREATED)
+@db_bulkhead("auth")
+@rate_limit(per_minute=10, burst=5, by="ip")
 async def create_user_Account(
     user_data: UserCreateModel,
     bg_tasks: BackgroundTasks,
@@ -83,16 +115,7 @@ async def create_user_Account(
 
     link = f"http://{Config.DOMAIN}/api/v1/auth/verify/{token}"
 
-    html = f"""
-    <h1>Verify your Email</h1>
-    <p>Please click this <a href="{link}">link</a> to verify your email</p>
-    """
-
-    emails = [email]
-
-    subject = "Verify Your email"
-
-    send_email.delay(emails, subject, html)
+    send_email.delay([email], "verify_email", {"link": link})
 
     return {
         "message": "Account Created! Check email to verify your account",
@@ -101,6 +124,7 @@ async def create_user_Account(
 
 
 @auth_router.get("/verify/{token}")
+@db_bulkhead("auth")
 async def verify_user_account(token: str, session: AsyncSession = Depends(get_session)):
 
     token_data = decode_url_safe_token(token)
@@ -127,6 +151,8 @@ async def verify_user_account(token: str, session: AsyncSession = Depends(get_se
 
 
 @auth_router.post("/login")
+@db_bulkhead("auth")
+@rate_limit(per_minute=20, burst=10, by="ip")
 async def login_users(
     login_data: UserLoginModel, session: AsyncSession = Depends(get_session)
 ):
@@ -166,6 +192,7 @@ async def login_users(
 
 
 @auth_router.get("/refresh_token")
+@admission_priority("critical")
 async def get_new_access_token(token_details: dict = Depends(RefreshTokenBearer())):
     expiry_timestamp = token_details["exp"]
 
@@ -178,10 +205,11 @@ async def get_new_access_token(token_details: dict = Depends(RefreshTokenBearer(
 
 
 @auth_router.get("/me", response_model=UserBooksModel)
+@db_bulkhead("auth")
 async def get_current_user(
     user=Depends(get_current_user), _: bool = Depends(role_checker)
 ):
-    return user
+    return user_books_serializer.response(user)
 
 
 @auth_router.get("/logout")
@@ -197,6 +225,7 @@ async def revoke_token(token_details: dict = Depends(AccessTokenBearer())):
 
 
 @auth_router.post("/password-reset-request")
+@rate_limit(per_minute=5, burst=3, by="ip")
 async def password_reset_request(email_data: PasswordResetRequestModel):
     email = email_data.email
 
@@ -204,13 +233,8 @@ async def password_reset_request(email_data: PasswordResetRequestModel):
 
     link = f"http://{Config.DOMAIN}/api/v1/auth/password-reset-confirm/{token}"
 
-    html_message = f"""
-    <h1>Reset Your Password</h1>
-    <p>Please click this <a href="{link}">link</a> to Reset Your Password</p>
-    """
-    subject = "Reset Your Password"
+    send_email.delay([email], "password_reset", {"link": link})
 
-    send_email.delay([email], subject, html_message)
     return JSONResponse(
         content={
             "message": "Please check your email for instructions to reset your password",
@@ -220,6 +244,8 @@ async def password_reset_request(email_data: PasswordResetRequestModel):
 
 
 @auth_router.post("/password-reset-confirm/{token}")
+@db_bulkhead("auth")
+@rate_limit(per_minute=10, burst=5, by="ip")
 async def reset_account_password(
     token: str,
     passwords: PasswordResetConfirmModel,
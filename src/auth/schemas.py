@@ -54,6 +54,18 @@ class EmailModel(BaseModel):
     addresses : List[str]
 
 
+class BulkMailJobModel(BaseModel):
+    job_id: str
+    status: str
+    total: int
+    chunks: int
+    chunks_done: int
+    sent: int
+    failed: int
+    failed_recipients: List[str]
+    created_at: float
+
+
 class PasswordResetRequestModel(BaseModel):
     email: str
 
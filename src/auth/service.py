@@ -2,11 +2,13 @@ from sqlmodel import select
 from sqlmodel.ext.asyncio.session import AsyncSession
 
 from src.db.models import User
+from src.tracing import traced_service
 
 from .schemas import UserCreateModel
 from .utils import generate_passwd_hash
 
 
+@traced_service
 class UserService:
     async def get_user_by_email(self, email: str, session: AsyncSession):
         statement = select(User).where(User.email == email)
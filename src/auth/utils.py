@@ -7,6 +7,7 @@ import jwt
 from passlib.context import CryptContext
 
 from src.config import Config
+from src.tracing import traced
 
 passwd_context = CryptContext(schemes=["bcrypt"])
 
@@ -14,12 +15,14 @@ passwd_context = CryptContext(schemes=["bcrypt"])
 ACCESS_TOKEN_EXPIRY = 3600
 
 
+@traced("bcrypt.hash")
 def generate_passwd_hash(password: str) -> str:
     hash = passwd_context.hash(password)
 
     return hash
 
 
+@traced("bcrypt.verify")
 def verify_password(password: str, hash: str) -> bool:
     return passwd_context.verify(password, hash)
 
@@ -0,0 +1,210 @@
+import logging
+from datetime import datetime
+from typing import List, Optional
+
+import sqlalchemy.dialects.postgresql as pg
+from sqlalchemy.orm import noload
+from sqlmodel import TEXT, cast, delete, desc, func, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.config import Config
+from src.db.models import Book, BookDocument, BookTag, Review, Tag
+from src.singleflight import single_flight
+from src.tracing import traced_service
+
+from .schemas import Book as BookModel
+from .schemas import BookDocumentModel
+
+
+def render_document(
+    book, reviews, tags, review_count: int, average_rating: Optional[float]
+) -> dict:
+    """Render a `BookDocumentModel` as JSON-ready data from ORM objects or records"""
+
+    document = BookDocumentModel.model_validate(
+        {
+            **{name: getattr(book, name) for name in BookModel.model_fields},
+            "reviews": reviews,
+            "tags": tags,
+            "review_count": review_count,
+            "average_rating": (
+                round(float(average_rating), 2) if average_rating is not None else None
+            ),
+        },
+        from_attributes=True,
+    )
+
+    return document.model_dump(mode="json")
+
+
+@traced_service
+class BookDocumentService:
+    """Maintains `book_documents`, the pre-rendered JSON for `GET /books/{book_uid}`.
+
+    A document is a `BookDocumentModel`: the most recent reviews, plus
+    `review_count` and `average_rating` over all live reviews. Tag popularity
+    is left out so that tagging one book does not invalidate every document
+    sharing the tag.
+    """
+
+    @property
+    def enabled(self) -> bool:
+        return Config.BOOK_DOCUMENTS_ENABLED
+
+    async def build_document(
+        self, book_uid: str, session: AsyncSession
+    ) -> Optional[dict]:
+        """Render the detail document of a live book from the normalized tables"""
+
+        result = await session.exec(
+            select(Book)
+            .where(Book.uid == book_uid, Book.deleted_at.is_(None))
+            .options(noload(Book.reviews), noload(Book.tags))
+        )
+
+        book = result.first()
+
+        if book is None:
+            return None
+
+        tags = await session.exec(
+            select(Tag)
+            .join(BookTag, BookTag.tag_id == Tag.uid)
+            .where(BookTag.book_id == book.uid)
+            .order_by(Tag.name)
+            .options(noload(Tag.books))
+        )
+
+        live_reviews = (Review.book_uid == book.uid, Review.deleted_at.is_(None))
+
+        reviews = await session.exec(
+            select(Review)
+            .where(*live_reviews)
+            .order_by(desc(Review.created_at))
+            .limit(Config.BOOK_DOCUMENT_REVIEW_LIMIT)
+        )
+
+        aggregates = await session.exec(
+            select(func.count(Review.uid), func.avg(Review.rating)).where(
+                *live_reviews
+            )
+        )
+
+        review_count, average_rating = aggregates.one()
+
+        return render_document(
+            book, reviews.all(), tags.all(), review_count, average_rating
+        )
+
+    def document_from_detail(self, book) -> dict:
+        """Render the document of a book loaded with all its live reviews and tags"""
+
+        reviews = sorted(book.reviews, key=lambda review: review.created_at, reverse=True)
+        ratings = [review.rating for review in reviews]
+
+        return render_document(
+            book,
+            reviews[: Config.BOOK_DOCUMENT_REVIEW_LIMIT],
+            sorted(book.tags, key=lambda tag: tag.name),
+            len(ratings),
+            sum(ratings) / len(ratings) if ratings else None,
+        )
+
+    async def rebuild(self, book_uid: str, session: AsyncSession) -> None:
+        """Rebuild a document inside the caller's transaction; the caller commits"""
+
+        if not self.enabled:
+            return
+
+        # Serialize rebuilds of the same book: each one then reads the rows
+        # committed by the one before it, so the newest document is written last
+        await session.exec(select(Book.uid).where(Book.uid == book_uid).with_for_update())
+
+        document = await self.build_document(book_uid, session)
+
+        if document is None:
+            await session.exec(
+                delete(BookDocument).where(BookDocument.book_uid == book_uid)
+            )
+            return
+
+        statement = pg.insert(BookDocument).values(
+            book_uid=book_uid, document=document, updated_at=datetime.now()
+        )
+
+        await session.exec(
+            statement.on_conflict_do_update(
+                index_elements=[BookDocument.book_uid],
+                set_={
+                    "document": statement.excluded.document,
+                    "updated_at": statement.excluded.updated_at,
+                },
+            )
+        )
+
+    def rebuild_later(self, book_uids: List[str]) -> None:
+        """Queue a rebuild for changes that touch too many books to do inline"""
+
+        if not self.enabled or not book_uids:
+            return
+
+        from src.celery_tasks import rebuild_book_documents
+
+        rebuild_book_documents.delay([str(book_uid) for book_uid in book_uids])
+
+    # In-process only: a result published across workers would outlive the
+    # write that replaced it and be cached under the new surrogate version
+    @single_flight()
+    async def get_document_json(
+        self, book_uid: str, session: AsyncSession
+    ) -> Optional[str]:
+        """Fetch a document as the JSON text stored in Postgres"""
+
+        result = await session.exec(
+            select(cast(BookDocument.document, TEXT)).where(
+                BookDocument.book_uid == book_uid
+            )
+        )
+
+        return result.first()
+
+    async def find_drift(
+        self, after: Optional[str], batch_size: int, session: AsyncSession
+    ):
+        """Compare one page of books against their stored documents.
+
+        Returns the uids that are missing, stale or orphaned, and the cursor
+        for the next page (None once every book has been checked).
+        """
+
+        statement = (
+            select(Book.uid, BookDocument.document)
+            .outerjoin(BookDocument, BookDocument.book_uid == Book.uid)
+            .order_by(Book.uid)
+            .limit(batch_size)
+        )
+
+        if after is not None:
+            statement = statement.where(Book.uid > after)
+
+        result = await session.exec(statement)
+
+        rows = result.all()
+
+        drifted = []
+
+        for book_uid, stored in rows:
+            expected = await self.build_document(book_uid, session)
+
+            if expected != stored:
+                drifted.append(book_uid)
+
+        if drifted:
+            logging.warning("%s book documents drifted: %s", len(drifted), drifted)
+
+        next_cursor = rows[-1][0] if len(rows) == batch_size else None
+
+        return drifted, next_cursor
+
+
+book_document_service = BookDocumentService()
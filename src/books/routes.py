@@ -1,41 +1,61 @@
 from typing import List
 
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, Response, status
+from fastapi.responses import ORJSONResponse
 from fastapi.exceptions import HTTPException
 from sqlmodel.ext.asyncio.session import AsyncSession
 
 from src.auth.dependencies import AccessTokenBearer, RoleChecker
+from src.books.documents import book_document_service
 from src.books.service import BookService
+from src.cache import cache_response
+from src.ratelimit import rate_limit
 from src.db.main import get_session
-
-from .schemas import Book, BookCreateModel, BookDetailModel, BookUpdateModel
+from src.db.bulkhead import db_bulkhead
+from src.db.stats import timed_phase
+from src.serializers import compile_serializer
+
+from .schemas import (
+    Book,
+    BookBulkResultModel,
+    BookBulkUpdateModel,
+    BookCreateModel,
+    BookDocumentModel,
+    BookSelectionModel,
+    BookUpdateModel,
+)
 from src.errors import BookNotFound
 
 book_router = APIRouter()
 book_service = BookService()
 acccess_token_bearer = AccessTokenBearer()
 role_checker = Depends(RoleChecker(["admin", "user"]))
+admin_role_checker = Depends(RoleChecker(["admin"]))
+book_serializer = compile_serializer(Book)
 
 
 @book_router.get("/", response_model=List[Book], dependencies=[role_checker])
+@cache_response(ttl=30, surrogate_keys=["books"])
+@rate_limit(per_minute=120, burst=30, roles={"admin": 600})
 async def get_all_books(
     session: AsyncSession = Depends(get_session),
     _: dict = Depends(acccess_token_bearer),
 ):
     books = await book_service.get_all_books(session)
-    return books
+    return book_serializer.list_response(books)
 
 
 @book_router.get(
     "/user/{user_uid}", response_model=List[Book], dependencies=[role_checker]
 )
+@cache_response(ttl=30, surrogate_keys=["books"])
 async def get_user_book_submissions(
     user_uid: str,
     session: AsyncSession = Depends(get_session),
     _: dict = Depends(acccess_token_bearer),
 ):
     books = await book_service.get_user_books(user_uid, session)
-    return books
+    return book_serializer.list_response(books)
 
 
 @book_router.post(
@@ -54,18 +74,62 @@ async def create_a_book(
     return new_book
 
 
+@book_router.patch(
+    "/bulk", response_model=BookBulkResultModel, dependencies=[admin_role_checker]
+)
+@db_bulkhead("admin")
+async def bulk_update_books(
+    bulk_update_data: BookBulkUpdateModel,
+    session: AsyncSession = Depends(get_session),
+    _: dict = Depends(acccess_token_bearer),
+) -> dict:
+    return await book_service.bulk_update_books(
+        bulk_update_data, bulk_update_data.values, session
+    )
+
+
+@book_router.delete(
+    "/bulk", response_model=BookBulkResultModel, dependencies=[admin_role_checker]
+)
+@db_bulkhead("admin")
+async def bulk_delete_books(
+    selection: BookSelectionModel,
+    session: AsyncSession = Depends(get_session),
+    _: dict = Depends(acccess_token_bearer),
+) -> dict:
+    return await book_service.bulk_delete_books(selection, session)
+
+
 @book_router.get(
-    "/{book_uid}", response_model=BookDetailModel, dependencies=[role_checker]
+    "/{book_uid}", response_model=BookDocumentModel, dependencies=[role_checker]
 )
+@cache_response(ttl=60, surrogate_keys=["book:{book_uid}"])
 async def get_book(
     book_uid: str,
     session: AsyncSession = Depends(get_session),
     _: dict = Depends(acccess_token_bearer),
 ) -> dict:
-    book = await book_service.get_book(book_uid, session)
+    document_missing = False
+
+    if book_document_service.enabled:
+        document = await book_document_service.get_document_json(book_uid, session)
+
+        if document is not None:
+            return Response(content=document, media_type="application/json")
+
+        document_missing = True
+
+    book = await book_service.get_book_detail(book_uid, session)
 
     if book:
-        return book
+        # Keep GET read-only: the worker writes the missing document
+        if document_missing:
+            book_document_service.rebuild_later([book_uid])
+
+        with timed_phase("serialization"):
+            return ORJSONResponse(
+                content=book_document_service.document_from_detail(book)
+            )
     else:
         raise BookNotFound()
 
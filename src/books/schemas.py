@@ -1,8 +1,8 @@
 import uuid
 from datetime import date, datetime
-from typing import List
+from typing import List, Optional
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, model_validator
 
 from src.reviews.schemas import ReviewModel
 from src.tags.schemas import TagModel
@@ -25,6 +25,26 @@ class BookDetailModel(Book):
     tags:List[TagModel]
 
 
+class BookDocumentTagModel(BaseModel):
+    uid: uuid.UUID
+    name: str
+    created_at: datetime
+
+
+class BookDocumentModel(Book):
+    """`GET /books/{book_uid}`: the most recent reviews and totals over all of them"""
+
+    reviews: List[ReviewModel]
+    tags: List[BookDocumentTagModel]
+    review_count: int
+    average_rating: Optional[float]
+
+
+class BookPageModel(BaseModel):
+    books: List[Book]
+    next_cursor: Optional[uuid.UUID]
+
+
 class BookCreateModel(BaseModel):
     title: str
     author: str
@@ -40,3 +60,54 @@ class BookUpdateModel(BaseModel):
     publisher: str
     page_count: int
     language: str
+
+
+class BookFilterModel(BaseModel):
+    user_uid: Optional[uuid.UUID] = None
+    author: Optional[str] = None
+    publisher: Optional[str] = None
+    language: Optional[str] = None
+
+
+class BookSelectionModel(BaseModel):
+    uids: Optional[List[uuid.UUID]] = Field(default=None, max_length=5000)
+    filter: Optional[BookFilterModel] = None
+
+    @model_validator(mode="after")
+    def check_selection(self):
+        if (self.uids is None) == (self.filter is None):
+            raise ValueError("Provide either uids or filter")
+
+        if self.filter is not None and not self.filter.model_dump(exclude_none=True):
+            raise ValueError("filter must have at least one criterion")
+
+        return self
+
+
+class BookBulkFieldsModel(BaseModel):
+    title: Optional[str] = None
+    author: Optional[str] = None
+    publisher: Optional[str] = None
+    page_count: Optional[int] = None
+    language: Optional[str] = None
+
+
+class BookBulkUpdateModel(BookSelectionModel):
+    values: BookBulkFieldsModel
+
+    @model_validator(mode="after")
+    def check_values(self):
+        if not self.values.model_dump(exclude_none=True):
+            raise ValueError("values must set at least one field")
+
+        return self
+
+
+class BookBulkItemModel(BaseModel):
+    uid: uuid.UUID
+    status: str
+
+
+class BookBulkResultModel(BaseModel):
+    affected: int
+    results: List[BookBulkItemModel]
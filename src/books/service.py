@@ -1,16 +1,36 @@
-from datetime import datetime
+from datetime import datetime, timedelta
 
-from sqlmodel import desc, select
+from sqlmodel import and_, delete, desc, func, select, update
 from sqlmodel.ext.asyncio.session import AsyncSession
 
-from src.db.models import Book
+from src.cache import book_key, response_cache
+from src.config import Config
+from src.db import fastpath
+from src.db.models import Book, BookDocument, BookTag, Review, Tag
+from src.singleflight import single_flight
+from src.tags.suggest import tag_suggest_index
+from src.tracing import traced_service
 
-from .schemas import BookCreateModel, BookUpdateModel
+from .documents import book_document_service
+from .schemas import (
+    BookBulkFieldsModel,
+    BookCreateModel,
+    BookSelectionModel,
+    BookUpdateModel,
+)
 
 
+@traced_service
 class BookService:
     async def get_all_books(self, session: AsyncSession):
-        statement = select(Book).order_by(desc(Book.created_at))
+        if Config.DB_FAST_PATH:
+            return await fastpath.fetch_books(session)
+
+        statement = (
+            select(Book)
+            .where(Book.deleted_at.is_(None))
+            .order_by(desc(Book.created_at))
+        )
 
         result = await session.exec(statement)
 
@@ -19,7 +39,7 @@ class BookService:
     async def get_user_books(self, user_uid: str, session: AsyncSession):
         statement = (
             select(Book)
-            .where(Book.user_uid == user_uid)
+            .where(Book.user_uid == user_uid, Book.deleted_at.is_(None))
             .order_by(desc(Book.created_at))
         )
 
@@ -28,7 +48,7 @@ class BookService:
         return result.all()
 
     async def get_book(self, book_uid: str, session: AsyncSession):
-        statement = select(Book).where(Book.uid == book_uid)
+        statement = select(Book).where(Book.uid == book_uid, Book.deleted_at.is_(None))
 
         result = await session.exec(statement)
 
@@ -36,6 +56,15 @@ class BookService:
 
         return book if book is not None else None
 
+    @single_flight()
+    async def get_book_detail(self, book_uid: str, session: AsyncSession):
+        """Get a book with its reviews and tags for read-only rendering"""
+
+        if Config.DB_FAST_PATH:
+            return await fastpath.fetch_book_detail(book_uid, session)
+
+        return await self.get_book(book_uid, session)
+
     async def create_book(
         self, book_data: BookCreateModel, user_uid: str, session: AsyncSession
     ):
@@ -51,7 +80,12 @@ class BookService:
 
         session.add(new_book)
 
+        if book_document_service.enabled:
+            await session.flush()
+            await book_document_service.rebuild(new_book.uid, session)
+
         await session.commit()
+        await response_cache.invalidate("books")
 
         return new_book
 
@@ -66,21 +100,177 @@ class BookService:
             for k, v in update_data_dict.items():
                 setattr(book_to_update, k, v)
 
+            await book_document_service.rebuild(book_to_update.uid, session)
+
             await session.commit()
+            await response_cache.invalidate("books", book_key(book_uid))
 
             return book_to_update
         else:
             return None
 
     async def delete_book(self, book_uid: str, session: AsyncSession):
-        book_to_delete = await self.get_book(book_uid, session)
+        """Tombstone a book; purge_deleted_books removes it later"""
 
-        if book_to_delete is not None:
-            await session.delete(book_to_delete)
+        statement = (
+            update(Book)
+            .where(Book.uid == book_uid, Book.deleted_at.is_(None))
+            .values(deleted_at=datetime.now())
+            .returning(Book.uid)
+            .execution_options(synchronize_session=False)
+        )
 
-            await session.commit()
+        result = await session.exec(statement)
+
+        if result.scalar() is None:
+            return None
+
+        await book_document_service.rebuild(book_uid, session)
+
+        await session.commit()
+        await response_cache.invalidate("books", book_key(book_uid))
 
-            return {}
+        return {}
 
+    def _selection_condition(self, selection: BookSelectionModel):
+        if selection.uids is not None:
+            return and_(Book.deleted_at.is_(None), Book.uid.in_(selection.uids))
+
+        criteria = selection.filter.model_dump(exclude_none=True)
+
+        return and_(
+            Book.deleted_at.is_(None),
+            *(getattr(Book, k) == v for k, v in criteria.items()),
+        )
+
+    def _bulk_results(self, selection: BookSelectionModel, affected, status: str):
+        affected = set(affected)
+
+        if selection.uids is None:
+            results = [{"uid": uid, "status": status} for uid in affected]
         else:
-            return None
+            results = [
+                {"uid": uid, "status": status if uid in affected else "not_found"}
+                for uid in dict.fromkeys(selection.uids)
+            ]
+
+        return {"affected": len(affected), "results": results}
+
+    async def bulk_update_books(
+        self,
+        selection: BookSelectionModel,
+        values: BookBulkFieldsModel,
+        session: AsyncSession,
+    ):
+        """Update every selected book with one UPDATE ... RETURNING"""
+
+        statement = (
+            update(Book)
+            .where(self._selection_condition(selection))
+            .values(**values.model_dump(exclude_none=True), update_at=datetime.now())
+            .returning(Book.uid)
+            .execution_options(synchronize_session=False)
+        )
+
+        result = await session.exec(statement)
+
+        updated_uids = result.scalars().all()
+
+        await session.commit()
+        await response_cache.invalidate_many(
+            ["books", *(book_key(uid) for uid in updated_uids)]
+        )
+
+        book_document_service.rebuild_later(updated_uids)
+
+        return self._bulk_results(selection, updated_uids, "updated")
+
+    async def bulk_delete_books(
+        self, selection: BookSelectionModel, session: AsyncSession
+    ):
+        """Tombstone every selected book with one UPDATE ... RETURNING"""
+
+        statement = (
+            update(Book)
+            .where(self._selection_condition(selection))
+            .values(deleted_at=datetime.now())
+            .returning(Book.uid)
+            .execution_options(synchronize_session=False)
+        )
+
+        result = await session.exec(statement)
+
+        deleted_uids = result.scalars().all()
+
+        if book_document_service.enabled and deleted_uids:
+            await session.exec(
+                delete(BookDocument).where(BookDocument.book_uid.in_(deleted_uids))
+            )
+
+        await session.commit()
+        await response_cache.invalidate_many(
+            ["books", *(book_key(uid) for uid in deleted_uids)]
+        )
+
+        return self._bulk_results(selection, deleted_uids, "deleted")
+
+    async def purge_deleted_books(
+        self, batch_size: int, grace: timedelta, session: AsyncSession
+    ) -> int:
+        """Hard delete a batch of tombstoned books with their reviews and tag links"""
+
+        statement = (
+            select(Book.uid)
+            .where(Book.deleted_at < datetime.now() - grace)
+            .order_by(Book.deleted_at)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        )
+
+        result = await session.exec(statement)
+
+        batch = result.all()
+
+        if not batch:
+            return 0
+
+        removed_links = (
+            delete(BookTag)
+            .where(BookTag.book_id.in_(batch))
+            .returning(BookTag.tag_id)
+            .cte("removed_links")
+        )
+
+        link_counts = (
+            select(removed_links.c.tag_id, func.count().label("removed"))
+            .group_by(removed_links.c.tag_id)
+            .subquery()
+        )
+
+        result = await session.exec(
+            update(Tag)
+            .where(Tag.uid == link_counts.c.tag_id)
+            .values(book_count=Tag.book_count - link_counts.c.removed)
+            .returning(Tag.uid, link_counts.c.removed)
+            .execution_options(synchronize_session=False)
+        )
+
+        decremented_tags = result.all()
+
+        await session.exec(delete(Review).where(Review.book_uid.in_(batch)))
+
+        await session.exec(
+            delete(Book)
+            .where(Book.uid.in_(batch))
+            .execution_options(synchronize_session=False)
+        )
+
+        await session.commit()
+
+        if decremented_tags:
+            await response_cache.invalidate("tags")
+
+        for tag_uid, removed in decremented_tags:
+            tag_suggest_index.bump(tag_uid, -removed)
+
+        return len(batch)
@@ -0,0 +1,201 @@
+import time
+import uuid
+from collections import defaultdict
+from typing import Iterable, List, Optional, Tuple
+
+import aiosmtplib
+import orjson
+
+from src.config import Config
+from src.db.redis import redis_client, worker_redis
+
+JOB_KEY = "bookly:mail:job:{}"
+FAILED_KEY = "bookly:mail:job:{}:failed"
+DOMAIN_ACTIVE_KEY = "bookly:mail:domain:{}:active"
+DOMAIN_WINDOW_KEY = "bookly:mail:domain:{}:window"
+
+STATUS_FIELDS = ("status", "total", "chunks", "chunks_done", "sent", "failed", "created_at")
+
+# Takes a sending lease on a domain and ARGV[5] messages of its minute budget.
+# KEYS[1] is a sorted set of lease holders scored by expiry, so the lease of a
+# worker that died while sending lapses on its own; KEYS[2] counts the
+# messages sent in the current minute. Returns 0 on success, otherwise the
+# seconds to wait before trying again.
+DOMAIN_ACQUIRE_LUA = """
+redis.call("ZREMRANGEBYSCORE", KEYS[1], "-inf", ARGV[2])
+if redis.call("ZCARD", KEYS[1]) >= tonumber(ARGV[4]) then
+    return 1
+end
+local used = redis.call("INCRBY", KEYS[2], ARGV[5])
+if used == tonumber(ARGV[5]) then
+    redis.call("EXPIRE", KEYS[2], 60)
+end
+if used > tonumber(ARGV[6]) then
+    redis.call("DECRBY", KEYS[2], ARGV[5])
+    return math.max(redis.call("TTL", KEYS[2]), 1)
+end
+redis.call("ZADD", KEYS[1], ARGV[3], ARGV[1])
+redis.call("EXPIRE", KEYS[1], math.ceil(ARGV[3] - ARGV[2]))
+return 0
+"""
+
+domain_acquire = worker_redis.register_script(DOMAIN_ACQUIRE_LUA)
+
+
+def domain_of(address: str) -> str:
+    return address.rpartition("@")[2].lower()
+
+
+def plan_chunks(addresses: Iterable[str], chunk_size: int) -> List[List[str]]:
+    """Drop duplicate addresses and split the rest into single-domain chunks"""
+
+    # A chunk must fit in one minute of its domain's budget
+    chunk_size = max(1, min(chunk_size, Config.MAIL_DOMAIN_PER_MINUTE))
+    by_domain = defaultdict(list)
+    seen = set()
+
+    for address in addresses:
+        address = address.strip()
+
+        if not address or address.lower() in seen:
+            continue
+
+        seen.add(address.lower())
+        by_domain[domain_of(address)].append(address)
+
+    return [
+        recipients[start : start + chunk_size]
+        for recipients in by_domain.values()
+        for start in range(0, len(recipients), chunk_size)
+    ]
+
+
+def permanent_failure(exc: BaseException) -> bool:
+    """Whether the server rejected the message for good (a 5xx reply)"""
+
+    if isinstance(exc, aiosmtplib.SMTPRecipientsRefused):
+        return all(refused.code >= 500 for refused in exc.recipients)
+
+    if isinstance(exc, aiosmtplib.SMTPResponseException):
+        return exc.code >= 500
+
+    return False
+
+
+class BulkMailJobs:
+    """Progress of bulk mail jobs, kept in Redis for MAIL_BULK_JOB_TTL_SECONDS.
+
+    The API creates jobs and reads their status; the chunk tasks record their
+    results with the blocking worker client.
+    """
+
+    async def create(
+        self, chunks: List[List[str]], template_name: str, context: dict
+    ) -> str:
+        job_id = uuid.uuid4().hex
+        key = JOB_KEY.format(job_id)
+
+        async with redis_client.pipeline(transaction=True) as pipe:
+            pipe.hset(
+                key,
+                mapping={
+                    "status": "queued" if chunks else "completed",
+                    "total": sum(len(chunk) for chunk in chunks),
+                    "chunks": len(chunks),
+                    "chunks_done": 0,
+                    "sent": 0,
+                    "failed": 0,
+                    "created_at": time.time(),
+                    "template": template_name,
+                    "context": orjson.dumps(context),
+                },
+            )
+            pipe.expire(key, Config.MAIL_BULK_JOB_TTL_SECONDS)
+            await pipe.execute()
+
+        return job_id
+
+    async def status(self, job_id: str) -> Optional[dict]:
+        values = await redis_client.hmget(JOB_KEY.format(job_id), STATUS_FIELDS)
+
+        if values[0] is None:
+            return None
+
+        job = dict(zip(STATUS_FIELDS, values))
+        failed_recipients = await redis_client.lrange(FAILED_KEY.format(job_id), 0, 99)
+
+        return {
+            "job_id": job_id,
+            "status": job["status"].decode(),
+            "total": int(job["total"]),
+            "chunks": int(job["chunks"]),
+            "chunks_done": int(job["chunks_done"]),
+            "sent": int(job["sent"]),
+            "failed": int(job["failed"]),
+            "failed_recipients": [address.decode() for address in failed_recipients],
+            "created_at": float(job["created_at"]),
+        }
+
+    def content(self, job_id: str) -> Tuple[str, dict]:
+        """The job's template name and context"""
+
+        template_name, context = worker_redis.hmget(
+            JOB_KEY.format(job_id), ["template", "context"]
+        )
+
+        return template_name.decode(), orjson.loads(context)
+
+    def record(self, job_id: str, sent: int, failed: List[str], chunk_done: bool) -> None:
+        key = JOB_KEY.format(job_id)
+
+        with worker_redis.pipeline(transaction=True) as pipe:
+            pipe.hset(key, "status", "sending")
+            pipe.hincrby(key, "sent", sent)
+            pipe.hincrby(key, "failed", len(failed))
+
+            if chunk_done:
+                pipe.hincrby(key, "chunks_done", 1)
+
+            if failed:
+                pipe.rpush(FAILED_KEY.format(job_id), *failed)
+                pipe.expire(FAILED_KEY.format(job_id), Config.MAIL_BULK_JOB_TTL_SECONDS)
+
+            pipe.execute()
+
+    def finish(self, job_id: str) -> None:
+        key = JOB_KEY.format(job_id)
+        failed = int(worker_redis.hget(key, "failed") or 0)
+
+        worker_redis.hset(key, "status", "completed_with_errors" if failed else "completed")
+
+    def fail(self, job_id: str) -> None:
+        """Mark a job whose chunks did not all finish, so it never stays "sending" """
+
+        worker_redis.hset(JOB_KEY.format(job_id), "status", "failed")
+
+    def acquire_domain(self, domain: str, count: int, holder: str) -> int:
+        """Take a sending lease for `holder` and `count` messages of the domain's
+        minute budget.
+
+        Returns 0 on success, otherwise the seconds to wait before trying again.
+        """
+
+        now = time.time()
+
+        return domain_acquire(
+            keys=[DOMAIN_ACTIVE_KEY.format(domain), DOMAIN_WINDOW_KEY.format(domain)],
+            args=[
+                holder,
+                now,
+                now + Config.MAIL_SEND_TIMEOUT_SECONDS * 2,
+                Config.MAIL_DOMAIN_CONCURRENCY,
+                count,
+                Config.MAIL_DOMAIN_PER_MINUTE,
+            ],
+        )
+
+    def release_domain(self, domain: str, holder: str) -> None:
+        worker_redis.zrem(DOMAIN_ACTIVE_KEY.format(domain), holder)
+
+
+bulk_mail_jobs = BulkMailJobs()
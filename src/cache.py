@@ -0,0 +1,201 @@
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from typing import Iterable, List, Optional, Sequence, Tuple
+from urllib.parse import parse_qsl, urlencode
+
+import orjson
+from sqlmodel import select
+
+from src.auth.utils import decode_token
+from src.config import Config
+from src.db.main import standalone_session
+from src.db.models import User
+from src.db.redis import redis_client, token_in_blocklist
+from src.routing import route_policy
+
+logger = logging.getLogger("bookly.cache")
+
+ENTRY_KEY = "bookly:cache:{}"
+VERSION_KEY = "bookly:cache:surrogate:{}"
+
+
+class CachePolicy:
+    """How a GET route's responses are cached.
+
+    `surrogate_keys` are templates filled from the path parameters, e.g.
+    "book:{book_uid}"; services invalidate them after a write. `vary` names
+    token claims (`role`, `user`) that split the cache between callers.
+    """
+
+    def __init__(
+        self,
+        ttl: int,
+        surrogate_keys: Sequence[str] = (),
+        vary: Sequence[str] = ("role",),
+    ) -> None:
+        self.ttl = ttl
+        self.surrogate_keys = tuple(surrogate_keys)
+        self.vary = tuple(vary)
+
+
+def key_part(value) -> str:
+    """Spell a path parameter the same way on reads and invalidations"""
+
+    try:
+        return str(uuid.UUID(str(value)))
+    except ValueError:
+        return str(value).lower()
+
+
+def book_key(book_uid) -> str:
+    """Surrogate key of one book's cached responses ("book:{book_uid}")"""
+
+    return f"book:{key_part(book_uid)}"
+
+
+def cache_response(
+    ttl: int, surrogate_keys: Sequence[str] = (), vary: Sequence[str] = ("role",)
+):
+    """Opt a GET route into the shared response cache"""
+
+    return route_policy("cache", CachePolicy(ttl, surrogate_keys, vary))
+
+
+class ResponseCache:
+    """Redis-backed response cache with versioned surrogate keys.
+
+    Each surrogate key has a version counter that is part of every entry key
+    using it, so invalidating is a single INCR and an in-flight miss that
+    started before the write can only store under the old, unreachable key.
+
+    Hits are served before `RoleChecker` runs, so the caller's account must
+    also be verified. Verification is never revoked, so verified users are
+    remembered per worker and only unverified ones are looked up again.
+    """
+
+    def __init__(self, max_verified_users: int = 10000) -> None:
+        self.max_verified_users = max_verified_users
+        self.verified_users: OrderedDict = OrderedDict()
+
+    async def vary_values(self, authorization: Optional[str], vary: Sequence[str]):
+        """Claims the entry varies on, or None when the token cannot be trusted"""
+
+        scheme, _, token = (authorization or "").partition(" ")
+
+        if scheme.lower() != "bearer" or not token:
+            return None
+
+        token_data = decode_token(token)
+
+        if token_data is None or token_data.get("refresh"):
+            return None
+
+        claims = {
+            "role": token_data["user"].get("role"),
+            "user": token_data["user"].get("user_uid"),
+        }
+        values = [claims.get(name) for name in vary]
+
+        if None in values or await token_in_blocklist(token_data["jti"]):
+            return None
+
+        if not await self.user_verified(claims["user"]):
+            return None
+
+        return values
+
+    async def user_verified(self, user_uid: Optional[str]) -> bool:
+        if user_uid is None:
+            return False
+
+        if user_uid in self.verified_users:
+            self.verified_users.move_to_end(user_uid)
+            return True
+
+        if not await self.load_verified(user_uid):
+            return False
+
+        self.verified_users[user_uid] = True
+
+        if len(self.verified_users) > self.max_verified_users:
+            self.verified_users.popitem(last=False)
+
+        return True
+
+    async def load_verified(self, user_uid: str) -> bool:
+        async with standalone_session() as session:
+            result = await session.exec(
+                select(User.is_verified).where(User.uid == user_uid)
+            )
+
+            return bool(result.first())
+
+    async def entry_key(
+        self,
+        policy: CachePolicy,
+        route_path: str,
+        path_params: dict,
+        query_string: bytes,
+        vary_values: List[str],
+    ) -> str:
+        params = {name: key_part(value) for name, value in path_params.items()}
+        surrogates = [key.format(**params) for key in policy.surrogate_keys]
+        versions = (
+            await redis_client.mget([VERSION_KEY.format(key) for key in surrogates])
+            if surrogates
+            else []
+        )
+        query = urlencode(sorted(parse_qsl(query_string.decode())))
+        parts = [
+            route_path,
+            orjson.dumps(params).decode(),
+            query,
+            *vary_values,
+            *[f"{key}@{int(version or 0)}" for key, version in zip(surrogates, versions)],
+        ]
+
+        return ENTRY_KEY.format("|".join(parts))
+
+    async def get(self, key: str) -> Optional[Tuple[int, list, bytes, float]]:
+        value = await redis_client.get(key)
+
+        if value is None:
+            return None
+
+        size = int.from_bytes(value[:4], "big")
+        meta = orjson.loads(value[4 : 4 + size])
+
+        return meta["status"], meta["headers"], value[4 + size :], meta["stored_at"]
+
+    async def set(self, key: str, status: int, headers: list, body: bytes, ttl: int) -> None:
+        meta = orjson.dumps(
+            {"status": status, "headers": headers, "stored_at": time.time()}
+        )
+
+        await redis_client.set(key, len(meta).to_bytes(4, "big") + meta + body, ex=ttl)
+
+    async def invalidate(self, *surrogate_keys: str) -> None:
+        await self.invalidate_many(surrogate_keys)
+
+    async def invalidate_many(self, surrogate_keys: Iterable[str]) -> None:
+        if not Config.RESPONSE_CACHE_ENABLED:
+            return
+
+        keys = set(surrogate_keys)
+
+        if not keys:
+            return
+
+        try:
+            async with redis_client.pipeline(transaction=False) as pipe:
+                for key in keys:
+                    pipe.incr(VERSION_KEY.format(key))
+                    pipe.expire(VERSION_KEY.format(key), Config.RESPONSE_CACHE_VERSION_TTL)
+                await pipe.execute()
+        except Exception:
+            logger.exception("Could not invalidate cached responses for %s", keys)
+
+
+response_cache = ResponseCache()
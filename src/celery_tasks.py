@@ -1,16 +1,225 @@
-from celery import Celery
-from src.mail import mail, create_message
+import asyncio
+import logging
+import uuid
+from datetime import timedelta
+
+from celery import Celery, chord
+from celery.signals import (
+    worker_init,
+    worker_process_init,
+    worker_process_shutdown,
+    worker_shutdown,
+)
+from src.mail import create_message, mail_sender, render_email, warm_templates
 from asgiref.sync import async_to_sync
 
+from src.books.documents import book_document_service
+from src.bulk_mail import bulk_mail_jobs, domain_of, permanent_failure
+from src.books.service import BookService
+from src.config import Config
+from src.db.main import WorkerSession
+from src.metrics import start_worker_metrics_server
+from src.reviews.service import ReviewService
+
 c_app = Celery()
+book_service = BookService()
+review_service = ReviewService()
 
 c_app.config_from_object("src.config")
 
+# Late acks redeliver a task whose worker died mid-way, so they are only used
+# for tasks that are safe to run twice; a redelivered send_email or mail chunk
+# would send the same mail again.
+IDEMPOTENT = {
+    "acks_late": Config.CELERY_ACKS_LATE,
+    "reject_on_worker_lost": Config.CELERY_ACKS_LATE,
+}
+
+
+@c_app.task(ignore_result=True)
+def send_email(recipients: list[str], template_name: str, context: dict):
+    subject, html = render_email(template_name, context)
+    message = create_message(recipients=recipients, subject=subject, body=html)
+
+    mail_sender.send(message, timeout=Config.MAIL_SEND_TIMEOUT_SECONDS)
+
+
+def send_bulk_mail(job_id: str, chunks: list[list[str]]) -> None:
+    """Queue the fan-out of a bulk mail job; the chord is built by a worker"""
+
+    if chunks:
+        dispatch_bulk_mail.delay(job_id, chunks)
+
+
+@c_app.task(ignore_result=True)
+def dispatch_bulk_mail(job_id: str, chunks: list[list[str]]):
+    """Fan the chunks of a bulk mail job out as one chord.
+
+    If a chunk raises, the chord body never runs and its error callback
+    marks the job failed instead.
+    """
+
+    chord(send_mail_chunk.s(job_id, chunk) for chunk in chunks)(
+        finish_bulk_mail.si(job_id).on_error(fail_bulk_mail.si(job_id))
+    )
+
+
+@c_app.task(bind=True)
+def send_mail_chunk(
+    self, job_id: str, recipients: list[str], attempt: int = 0, waited: int = 0
+):
+    """Send one message per recipient, all of the same domain.
+
+    Waiting for the domain's budget does not use up an attempt, but a chunk
+    that waits longer than MAIL_DOMAIN_MAX_WAIT_SECONDS in total is failed.
+    Domain waits back off exponentially up to MAIL_DOMAIN_MAX_BACKOFF_SECONDS.
+    Only the recipients that failed temporarily are retried, with exponential
+    backoff.
+    """
+
+    domain = domain_of(recipients[0])
+    holder = uuid.uuid4().hex
+    wait = bulk_mail_jobs.acquire_domain(domain, len(recipients), holder)
+
+    if wait:
+        # Wait at least until the budget frees up, and about as long again as
+        # this chunk has already waited, so a busy domain is not polled every second
+        wait = max(wait, min(waited, Config.MAIL_DOMAIN_MAX_BACKOFF_SECONDS))
+
+        if waited + wait > Config.MAIL_DOMAIN_MAX_WAIT_SECONDS:
+            logging.warning(
+                "Bulk mail job %s gave up waiting for %s after %ss", job_id, domain, waited
+            )
+            bulk_mail_jobs.record(job_id, 0, recipients, chunk_done=True)
+            return {"sent": 0, "failed": len(recipients)}
+
+        raise self.retry(
+            kwargs={"attempt": attempt, "waited": waited + wait},
+            countdown=wait,
+            max_retries=None,
+        )
+
+    try:
+        subject, html = render_email(*bulk_mail_jobs.content(job_id))
+        messages = [create_message([recipient], subject, html) for recipient in recipients]
+        results = mail_sender.send_many(messages, timeout=Config.MAIL_SEND_TIMEOUT_SECONDS)
+    except Exception as exc:
+        logging.exception("Bulk mail chunk of job %s failed", job_id)
+        results = [exc] * len(recipients)
+    finally:
+        bulk_mail_jobs.release_domain(domain, holder)
+
+    sent, rejected, retryable = 0, [], []
+
+    for recipient, result in zip(recipients, results):
+        if result is None:
+            sent += 1
+        elif permanent_failure(result):
+            rejected.append(recipient)
+        else:
+            retryable.append(recipient)
+
+    if retryable and attempt < Config.MAIL_BULK_MAX_RETRIES:
+        bulk_mail_jobs.record(job_id, sent, rejected, chunk_done=False)
+        raise self.retry(
+            args=[job_id, retryable],
+            kwargs={"attempt": attempt + 1, "waited": waited},
+            countdown=Config.MAIL_BULK_RETRY_BACKOFF_SECONDS * 2**attempt,
+            max_retries=None,
+        )
+
+    bulk_mail_jobs.record(job_id, sent, rejected + retryable, chunk_done=True)
+
+    return {"sent": sent, "failed": len(rejected) + len(retryable)}
+
+
+@c_app.task(ignore_result=True, **IDEMPOTENT)
+def finish_bulk_mail(job_id: str):
+    bulk_mail_jobs.finish(job_id)
+
+
+@c_app.task(ignore_result=True, **IDEMPOTENT)
+def fail_bulk_mail(job_id: str):
+    bulk_mail_jobs.fail(job_id)
+
+
+@worker_shutdown.connect
+@worker_process_shutdown.connect
+def close_mail_connections(**kwargs):
+    mail_sender.stop()
+
+
+@worker_init.connect
+@worker_process_init.connect
+def prepare_email_templates(**kwargs):
+    warm_templates()
+
+
+@worker_init.connect
+def serve_worker_metrics(**kwargs):
+    if Config.CELERY_METRICS_PORT:
+        start_worker_metrics_server(Config.CELERY_METRICS_PORT)
+
+
+async def purge_in_batches(purge) -> int:
+    grace = timedelta(seconds=Config.PURGE_GRACE_SECONDS)
+    purged = 0
+
+    for _ in range(Config.PURGE_MAX_BATCHES):
+        async with WorkerSession() as session:
+            batch_count = await purge(Config.PURGE_BATCH_SIZE, grace, session)
+
+        purged += batch_count
+
+        if batch_count < Config.PURGE_BATCH_SIZE:
+            break
+
+        await asyncio.sleep(Config.PURGE_BATCH_PAUSE_SECONDS)
+
+    return purged
+
+
+@c_app.task(ignore_result=True, **IDEMPOTENT)
+def purge_deleted_records():
+    books = async_to_sync(purge_in_batches)(book_service.purge_deleted_books)
+    reviews = async_to_sync(purge_in_batches)(review_service.purge_deleted_reviews)
+
+    logging.info("Purged %s books and %s reviews", books, reviews)
+
+
+async def rebuild_documents(book_uids: list[str]) -> None:
+    async with WorkerSession() as session:
+        for book_uid in book_uids:
+            await book_document_service.rebuild(book_uid, session)
+
+        await session.commit()
+
+
+@c_app.task(ignore_result=True, **IDEMPOTENT)
+def rebuild_book_documents(book_uids: list[str]):
+    async_to_sync(rebuild_documents)(book_uids)
+
+
+async def check_documents(repair: bool, batch_size: int = 500) -> int:
+    cursor, drifted_total = None, 0
+
+    while True:
+        async with WorkerSession() as session:
+            drifted, cursor = await book_document_service.find_drift(
+                cursor, batch_size, session
+            )
+
+        drifted_total += len(drifted)
+
+        if repair and drifted:
+            await rebuild_documents(drifted)
+
+        if cursor is None:
+            return drifted_total
 
-@c_app.task()
-def send_email(recipients: list[str], subject: str, body: str):
 
-    message = create_message(recipients=recipients, subject=subject, body=body)
+@c_app.task(**IDEMPOTENT)
+def check_book_documents(repair: bool = True):
+    """Detect (and by default repair) book documents that drifted from the tables"""
 
-    async_to_sync(mail.send_message)(message)
-    print("Email sent")
\ No newline at end of file
+    return async_to_sync(check_documents)(repair)
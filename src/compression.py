@@ -0,0 +1,89 @@
+import zlib
+from typing import Dict, Optional
+
+from src.config import Config
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+
+class GzipEncoder:
+    def __init__(self, level: int) -> None:
+        self.compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def chunk(self, data: bytes) -> bytes:
+        return self.compressor.compress(data) + self.compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self.compressor.compress(data) + self.compressor.flush()
+
+
+class BrotliEncoder:
+    def __init__(self, level: int) -> None:
+        self.compressor = brotli.Compressor(quality=level)
+
+    def chunk(self, data: bytes) -> bytes:
+        return self.compressor.process(data) + self.compressor.flush()
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self.compressor.process(data) + self.compressor.finish()
+
+
+class ZstdEncoder:
+    def __init__(self, level: int) -> None:
+        self.compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def chunk(self, data: bytes) -> bytes:
+        return self.compressor.compress(data) + self.compressor.flush(
+            zstandard.COMPRESSOBJ_FLUSH_BLOCK
+        )
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self.compressor.compress(data) + self.compressor.flush()
+
+
+def available_encoders() -> Dict[str, tuple]:
+    """Supported encodings in server preference order, with their level"""
+
+    encoders = {}
+
+    if zstandard is not None:
+        encoders["zstd"] = (ZstdEncoder, Config.COMPRESSION_ZSTD_LEVEL)
+
+    if brotli is not None:
+        encoders["br"] = (BrotliEncoder, Config.COMPRESSION_BROTLI_QUALITY)
+
+    encoders["gzip"] = (GzipEncoder, Config.COMPRESSION_GZIP_LEVEL)
+
+    return encoders
+
+
+def negotiate(accept_encoding: str, encoders: Dict[str, tuple]) -> Optional[str]:
+    """Pick the first server-preferred encoding the client accepts with q > 0"""
+
+    accepted = {}
+
+    for item in accept_encoding.lower().split(","):
+        name, _, params = item.strip().partition(";")
+        q = 1.0
+
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+
+        accepted[name.strip()] = q
+
+    for name in encoders:
+        if accepted.get(name, accepted.get("*", 0.0)) > 0:
+            return name
+
+    return None
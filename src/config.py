@@ -1,3 +1,6 @@
+from typing import Dict, Optional
+
+from kombu import Queue
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -17,7 +20,106 @@ class Settings(BaseSettings):
     MAIL_SSL_TLS: bool = False
     USE_CREDENTIALS: bool = True
     VALIDATE_CERTS: bool = True
+    MAIL_POOL_SIZE: int = 4
+    MAIL_BATCH_SIZE: int = 50
+    MAIL_BATCH_WAIT_MS: int = 0
+    MAIL_CHECK_AFTER_SECONDS: float = 30
+    MAIL_MAX_MESSAGES_PER_CONNECTION: int = 500
+    MAIL_SEND_TIMEOUT_SECONDS: float = 60
+    MAIL_TEMPLATE_CACHE_DIR: Optional[str] = None  # a per-user temp dir by default
+    MAIL_BULK_CHUNK_SIZE: int = 50
+    MAIL_BULK_MAX_RETRIES: int = 3
+    MAIL_BULK_RETRY_BACKOFF_SECONDS: int = 30
+    MAIL_BULK_JOB_TTL_SECONDS: int = 7 * 86400
+    MAIL_DOMAIN_CONCURRENCY: int = 2
+    MAIL_DOMAIN_PER_MINUTE: int = 300
+    MAIL_DOMAIN_MAX_WAIT_SECONDS: int = 3600
+    MAIL_DOMAIN_MAX_BACKOFF_SECONDS: int = 300
     DOMAIN: str
+    TAG_SUGGEST_REFRESH_SECONDS: int = 300
+    TAG_SUGGEST_MAX_INDEX_SIZE: int = 200_000
+    TAG_SUGGEST_MAX_LIMIT: int = 50
+    # Prefixes up to this length match most of the index, so their ranking is
+    # kept instead of being recomputed on every keystroke
+    TAG_SUGGEST_CACHED_PREFIX_LENGTH: int = 2
+    PURGE_INTERVAL_SECONDS: int = 300
+    PURGE_GRACE_SECONDS: int = 3600
+    PURGE_BATCH_SIZE: int = 200
+    PURGE_MAX_BATCHES: int = 50
+    PURGE_BATCH_PAUSE_SECONDS: float = 0.5
+    BOOK_DOCUMENTS_ENABLED: bool = False
+    BOOK_DOCUMENT_REVIEW_LIMIT: int = 50
+    DB_FAST_PATH: bool = False
+    LOG_LEVEL: str = "INFO"
+    ACCESS_LOG_SAMPLE_RATE: float = 1.0
+    ACCESS_LOG_SLOW_MS: float = 500
+    SERVER_TIMING_ENABLED: bool = True
+    SQL_N_PLUS_ONE_MODE: str = "off"  # off | warn | raise
+    SQL_N_PLUS_ONE_THRESHOLD: int = 5
+    SLOW_QUERY_LOG_ENABLED: bool = True
+    SLOW_QUERY_MS: float = 200
+    SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS: int = 600
+    SLOW_QUERY_QUEUE_SIZE: int = 100
+    SLOW_QUERY_MAX_FINGERPRINTS: int = 1000
+    SLOW_QUERY_RETENTION_SECONDS: int = 7 * 86400
+    SLOW_QUERY_SINK: str = "file"  # file | redis
+    SLOW_QUERY_LOG_FILE: str = "logs/slow_queries.jsonl"
+    SLOW_QUERY_STREAM: str = "bookly:slow_queries:stream"
+    SLOW_QUERY_STREAM_MAXLEN: int = 10_000
+    PROFILE_MAX_PER_MINUTE: int = 5
+    PROFILE_INTERVAL_MS: float = 5
+    PROFILE_MAX_SECONDS: float = 30
+    PROFILE_TTL_SECONDS: int = 86400
+    LOOP_MONITOR_ENABLED: bool = True
+    LOOP_MONITOR_INTERVAL_MS: float = 100
+    LOOP_STALL_THRESHOLD_MS: float = 250
+    TRACE_EXPORTER: str = "off"  # off | file | otlp
+    TRACE_FILE: str = "logs/traces.jsonl"
+    TRACE_OTLP_ENDPOINT: str = "http://localhost:4318/v1/traces"
+    TRACE_SERVICE_NAME: str = "bookly"
+    TRACE_EXPORT_INTERVAL_SECONDS: float = 1.0
+    TRACE_EXPORT_BATCH_SIZE: int = 512
+    COMPRESSION_ENABLED: bool = True
+    COMPRESSION_MIN_SIZE: int = 1024
+    COMPRESSION_THREAD_THRESHOLD: int = 256 * 1024
+    COMPRESSION_GZIP_LEVEL: int = 4
+    COMPRESSION_BROTLI_QUALITY: int = 4
+    COMPRESSION_ZSTD_LEVEL: int = 3
+    RESPONSE_CACHE_ENABLED: bool = True
+    RESPONSE_CACHE_MAX_BYTES: int = 1024 * 1024
+    RESPONSE_CACHE_VERSION_TTL: int = 86400
+    SINGLE_FLIGHT_ENABLED: bool = True
+    SINGLE_FLIGHT_LOCK_MS: int = 5000
+    SINGLE_FLIGHT_RESULT_TTL_MS: int = 500
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_PER_MINUTE: int = 300
+    RATE_LIMIT_BURST: int = 60
+    RATE_LIMIT_ROLE_PER_MINUTE: Dict[str, int] = {"admin": 1200}
+    RATE_LIMIT_RESERVE_FRACTION: int = 10
+    RATE_LIMIT_RESERVE_MS: int = 1000
+    RATE_LIMIT_TRUST_FORWARDED: bool = False
+    ADMISSION_ENABLED: bool = True
+    ADMISSION_INITIAL_LIMIT: float = 50
+    ADMISSION_MIN_LIMIT: float = 5
+    ADMISSION_MAX_LIMIT: float = 500
+    ADMISSION_TARGET_LATENCY_MS: int = 250
+    ADMISSION_BACKOFF: float = 0.9
+    ADMISSION_DECREASE_INTERVAL_SECONDS: float = 1.0
+    ADMISSION_QUEUE_SIZE: int = 100
+    ADMISSION_QUEUE_TIMEOUT_MS: int = 500
+    ADMISSION_CRITICAL_HEADROOM: int = 5
+    ADMISSION_LOW_PRIORITY_SHARE: float = 0.5
+    ADMISSION_RETRY_AFTER_SECONDS: int = 1
+    # Concurrent DB sessions per route group and worker; the default pool
+    # holds 5 connections plus 10 overflow
+    DB_BULKHEADS: Dict[str, int] = {"default": 8, "auth": 4, "admin": 3}
+    DB_BULKHEAD_TIMEOUT_MS: int = 2000
+    DB_STATEMENT_TIMEOUT_MS: int = 30000
+    CELERY_PREFETCH_MULTIPLIER: int = 1
+    CELERY_ACKS_LATE: bool = True  # for the tasks that are safe to run twice
+    CELERY_CONCURRENCY: Optional[int] = None  # defaults to the number of CPUs
+    CELERY_RESULT_EXPIRES: int = 3600
+    CELERY_METRICS_PORT: Optional[int] = None
     model_config = SettingsConfigDict(env_file=".env", extra="ignore")
 
 
@@ -26,4 +128,42 @@ Config = Settings()
 
 broker_url = Config.REDIS_URL
 result_backend = Config.REDIS_URL
-broker_connection_retry_on_startup = True
\ No newline at end of file
+result_expires = Config.CELERY_RESULT_EXPIRES
+broker_connection_retry_on_startup = True
+
+# Verification and password reset mail has its own queue (and should have its
+# own worker: see runworker.sh) so a bulk campaign never sits in front of it.
+# A worker consuming several queues drains them in the order given to -Q.
+# Tasks without a route go to "default", never in front of transactional mail.
+task_queues = (
+    Queue("transactional"),
+    Queue("bulk"),
+    Queue("maintenance"),
+    Queue("default"),
+)
+task_default_queue = "default"
+task_routes = {
+    "src.celery_tasks.send_email": {"queue": "transactional", "priority": 0},
+    "src.celery_tasks.dispatch_bulk_mail": {"queue": "bulk", "priority": 3},
+    "src.celery_tasks.send_mail_chunk": {"queue": "bulk", "priority": 6},
+    "src.celery_tasks.finish_bulk_mail": {"queue": "bulk", "priority": 3},
+    "src.celery_tasks.fail_bulk_mail": {"queue": "bulk", "priority": 3},
+    "src.celery_tasks.purge_deleted_records": {"queue": "maintenance"},
+    "src.celery_tasks.rebuild_book_documents": {"queue": "maintenance"},
+    "src.celery_tasks.check_book_documents": {"queue": "maintenance"},
+}
+# With Redis, 0 is the highest priority
+task_default_priority = 5
+broker_transport_options = {
+    "priority_steps": list(range(10)),
+    "sep": ":",
+    "queue_order_strategy": "priority",
+}
+worker_prefetch_multiplier = Config.CELERY_PREFETCH_MULTIPLIER
+worker_concurrency = Config.CELERY_CONCURRENCY
+beat_schedule = {
+    "purge-deleted-records": {
+        "task": "src.celery_tasks.purge_deleted_records",
+        "schedule": Config.PURGE_INTERVAL_SECONDS,
+    },
+}
@@ -0,0 +1,72 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Dict
+
+from src.config import Config
+from src.errors import DatabaseBusy
+from src.metrics import (
+    DB_BULKHEAD_IN_USE,
+    DB_BULKHEAD_LIMIT,
+    DB_BULKHEAD_REJECTED,
+    DB_BULKHEAD_WAIT,
+)
+from src.routing import route_policy
+
+DEFAULT_GROUP = "default"
+
+
+def db_bulkhead(group: str):
+    """Run a route's DB session under the budget of `group` in DB_BULKHEADS"""
+
+    if group not in Config.DB_BULKHEADS:
+        raise ValueError(f"No DB_BULKHEADS budget for {group!r}")
+
+    return route_policy("bulkhead", group)
+
+
+class Bulkhead:
+    """A concurrency budget for the DB connections of one route group.
+
+    The budgets are per worker; keep their sum at or below the pool size plus
+    overflow so one group filling its budget leaves connections for the rest.
+    Every pool connection the app takes goes through one: route sessions, the
+    fast path (on the session's connection), middleware lookups through
+    `standalone_session` and slow-query EXPLAINs.
+    """
+
+    def __init__(self, group: str, limit: int, timeout: float) -> None:
+        self.group = group
+        self.limit = limit
+        self.timeout = timeout
+        self.in_use = 0
+        self.semaphore = asyncio.Semaphore(limit)
+        DB_BULKHEAD_LIMIT.labels(group).set(limit)
+
+    @asynccontextmanager
+    async def acquire(self):
+        start = time.perf_counter()
+
+        try:
+            await asyncio.wait_for(self.semaphore.acquire(), self.timeout)
+        except asyncio.TimeoutError:
+            DB_BULKHEAD_REJECTED.labels(self.group).inc()
+            raise DatabaseBusy()
+        finally:
+            DB_BULKHEAD_WAIT.labels(self.group).observe(time.perf_counter() - start)
+
+        self.in_use += 1
+        DB_BULKHEAD_IN_USE.labels(self.group).inc()
+
+        try:
+            yield
+        finally:
+            self.in_use -= 1
+            DB_BULKHEAD_IN_USE.labels(self.group).dec()
+            self.semaphore.release()
+
+
+bulkheads: Dict[str, Bulkhead] = {
+    group: Bulkhead(group, limit, Config.DB_BULKHEAD_TIMEOUT_MS / 1000)
+    for group, limit in Config.DB_BULKHEADS.items()
+}
@@ -0,0 +1,119 @@
+import asyncio
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.orm import Session
+
+from src.routing import route_policy
+
+# SQLSTATE query_canceled, raised when statement_timeout fires
+QUERY_CANCELED = "57014"
+
+
+class ClientDisconnected(Exception):
+    """The client went away, so the request's remaining queries are skipped"""
+
+
+def statement_timeout(ms: int):
+    """Override DB_STATEMENT_TIMEOUT_MS for the queries of a route"""
+
+    return route_policy("statement_timeout", ms)
+
+
+class QueryGuard:
+    """Tracks whether a request's client is still there while it runs queries.
+
+    When the client disconnects during a query the request task is cancelled,
+    which makes asyncpg send a cancel request to Postgres; queries started
+    after the disconnect are refused with ClientDisconnected.
+    """
+
+    __slots__ = ("task", "running", "disconnected", "finished", "cancelled")
+
+    def __init__(self, task: asyncio.Task) -> None:
+        self.task = task
+        self.running = 0
+        self.disconnected = False
+        self.finished = False
+        self.cancelled = False
+
+    def disconnect(self) -> None:
+        if self.finished:
+            return
+
+        self.disconnected = True
+
+        if self.running and not self.cancelled:
+            self.cancelled = True
+            self.task.cancel()
+
+
+query_guard: ContextVar[Optional[QueryGuard]] = ContextVar("query_guard", default=None)
+
+
+@contextmanager
+def guarded_query():
+    """Register a statement SQLAlchemy does not see (the raw asyncpg fast path)"""
+
+    guard = query_guard.get()
+
+    if guard is None:
+        yield
+        return
+
+    if guard.disconnected and not guard.finished:
+        raise ClientDisconnected()
+
+    guard.running += 1
+
+    try:
+        yield
+    finally:
+        guard.running -= 1
+
+
+def install_query_guards(engine: AsyncEngine) -> None:
+    """Check the request's QueryGuard around every statement run on `engine`"""
+
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        guard = query_guard.get()
+
+        if guard is None:
+            return
+
+        if guard.disconnected and not guard.finished:
+            raise ClientDisconnected()
+
+        guard.running += 1
+        conn.info["guarded_query"] = guard
+
+    def query_done(conn) -> None:
+        guard = conn.info.pop("guarded_query", None)
+
+        if guard is not None:
+            guard.running -= 1
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        query_done(conn)
+
+    @event.listens_for(sync_engine, "handle_error")
+    def handle_error(exception_context):
+        if exception_context.connection is not None:
+            query_done(exception_context.connection)
+
+
+@event.listens_for(Session, "after_begin")
+def set_statement_timeout(session, transaction, connection):
+    """Apply the session's deadline to each transaction it begins"""
+
+    timeout = session.info.get("statement_timeout_ms")
+
+    if timeout:
+        connection.exec_driver_sql(f"SET LOCAL statement_timeout = {int(timeout)}")
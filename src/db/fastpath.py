@@ -0,0 +1,221 @@
+import time
+import uuid
+from contextlib import asynccontextmanager
+from typing import List, Optional
+
+import asyncpg
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from .bulkhead import DEFAULT_GROUP, bulkheads
+from .main import async_engine
+from src.errors import QueryTimeout
+from src.tracing import start_span
+
+from .deadlines import QUERY_CANCELED, guarded_query
+from .stats import record_query
+
+# Each query runs through asyncpg's per-connection statement cache, so after
+# the first call on a pooled connection it executes as a prepared statement.
+# uids are selected as text: the JSON output is the same and orjson does not
+# have to deal with asyncpg's own UUID type.
+
+BOOK_COLUMNS = (
+    "uid::text, title, author, publisher, published_date, page_count, language, "
+    "created_at, update_at"
+)
+
+BOOK_LIST_SQL = f"""
+SELECT {BOOK_COLUMNS} FROM books
+WHERE deleted_at IS NULL
+ORDER BY created_at DESC
+"""
+
+BOOK_DETAIL_SQL = f"""
+SELECT {BOOK_COLUMNS} FROM books
+WHERE uid = $1 AND deleted_at IS NULL
+"""
+
+BOOK_REVIEWS_SQL = """
+SELECT uid::text, rating, review_text, user_uid::text, book_uid::text,
+       created_at, update_at
+FROM reviews
+WHERE book_uid = $1 AND deleted_at IS NULL
+ORDER BY created_at
+"""
+
+BOOK_TAGS_SQL = """
+SELECT tags.uid::text, tags.name, tags.book_count, tags.created_at
+FROM tags JOIN booktag ON booktag.tag_id = tags.uid
+WHERE booktag.book_id = $1
+ORDER BY tags.name
+"""
+
+TAG_LIST_SQL = {
+    "recent": """
+SELECT uid::text, name, book_count, created_at FROM tags
+ORDER BY created_at DESC
+""",
+    "popular": """
+SELECT uid::text, name, book_count, created_at FROM tags
+ORDER BY book_count DESC, created_at DESC
+""",
+}
+
+
+class BookRecord:
+    __slots__ = (
+        "uid",
+        "title",
+        "author",
+        "publisher",
+        "published_date",
+        "page_count",
+        "language",
+        "created_at",
+        "update_at",
+        "reviews",
+        "tags",
+    )
+
+    def __init__(
+        self,
+        uid,
+        title,
+        author,
+        publisher,
+        published_date,
+        page_count,
+        language,
+        created_at,
+        update_at,
+    ):
+        self.uid = uid
+        self.title = title
+        self.author = author
+        self.publisher = publisher
+        self.published_date = published_date
+        self.page_count = page_count
+        self.language = language
+        self.created_at = created_at
+        self.update_at = update_at
+        self.reviews = ()
+        self.tags = ()
+
+
+class ReviewRecord:
+    __slots__ = (
+        "uid",
+        "rating",
+        "review_text",
+        "user_uid",
+        "book_uid",
+        "created_at",
+        "update_at",
+    )
+
+    def __init__(
+        self, uid, rating, review_text, user_uid, book_uid, created_at, update_at
+    ):
+        self.uid = uid
+        self.rating = rating
+        self.review_text = review_text
+        self.user_uid = user_uid
+        self.book_uid = book_uid
+        self.created_at = created_at
+        self.update_at = update_at
+
+
+class TagRecord:
+    __slots__ = ("uid", "name", "book_count", "created_at")
+
+    def __init__(self, uid, name, book_count, created_at):
+        self.uid = uid
+        self.name = name
+        self.book_count = book_count
+        self.created_at = created_at
+
+
+@asynccontextmanager
+async def raw_connection(
+    session: Optional[AsyncSession] = None, group: str = DEFAULT_GROUP
+):
+    """Borrow the asyncpg connection of `session`, or one from the `async_engine` pool.
+
+    Request code passes its session, so the fast path runs on the connection
+    the request already holds: under its route's bulkhead and inside the
+    transaction `set_statement_timeout` gave the route's deadline. A pooled
+    connection is taken under the bulkhead of `group`.
+    """
+
+    if session is not None:
+        conn = await session.connection()
+        fairy = await conn.get_raw_connection()
+
+        yield fairy.driver_connection
+        return
+
+    async with bulkheads[group].acquire(), async_engine.connect() as conn:
+        fairy = await conn.get_raw_connection()
+
+        yield fairy.driver_connection
+
+
+async def timed(query, sql: str, *args):
+    """Run `conn.fetch`/`conn.fetchrow` and count it in the request's SQL stats"""
+
+    query_span = start_span("sql", kind="client", statement=sql)
+    start = time.perf_counter()
+
+    try:
+        with guarded_query():
+            result = await query(sql, *args)
+    except asyncpg.PostgresError as exc:
+        if exc.sqlstate == QUERY_CANCELED:
+            raise QueryTimeout() from exc
+
+        raise
+    finally:
+        if query_span is not None:
+            query_span.end()
+
+    record_query(sql, (time.perf_counter() - start) * 1000, args)
+
+    return result
+
+
+async def fetch_books(session: AsyncSession) -> List[BookRecord]:
+    async with raw_connection(session) as conn:
+        rows = await timed(conn.fetch, BOOK_LIST_SQL)
+
+    return [BookRecord(*row) for row in rows]
+
+
+async def fetch_book_detail(
+    book_uid: str, session: AsyncSession
+) -> Optional[BookRecord]:
+    try:
+        book_uid = uuid.UUID(str(book_uid))
+    except ValueError:
+        return None
+
+    async with raw_connection(session) as conn:
+        row = await timed(conn.fetchrow, BOOK_DETAIL_SQL, book_uid)
+
+        if row is None:
+            return None
+
+        book = BookRecord(*row)
+        reviews = await timed(conn.fetch, BOOK_REVIEWS_SQL, book_uid)
+        tags = await timed(conn.fetch, BOOK_TAGS_SQL, book_uid)
+
+        book.reviews = [ReviewRecord(*r) for r in reviews]
+        book.tags = [TagRecord(*r) for r in tags]
+
+    return book
+
+
+async def fetch_tags(session: AsyncSession, sort: str = "recent") -> List[TagRecord]:
+    async with raw_connection(session) as conn:
+        rows = await timed(conn.fetch, TAG_LIST_SQL[sort])
+
+    return [TagRecord(*row) for row in rows]
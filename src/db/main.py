@@ -1,11 +1,34 @@
+from contextlib import asynccontextmanager
+
+from fastapi import Request
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.ext.asyncio import AsyncEngine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
 from sqlmodel import SQLModel, create_engine
 from sqlmodel.ext.asyncio.session import AsyncSession
 
 from src.config import Config
+from src.errors import QueryTimeout
+from src.metrics import instrument_pool
+from src.routing import get_policy
+
+from .bulkhead import DEFAULT_GROUP, bulkheads
+from .deadlines import QUERY_CANCELED, install_query_guards
+from .stats import instrument_queries
 
 async_engine = AsyncEngine(create_engine(url=Config.DATABASE_URL))
+instrument_pool(async_engine)
+install_query_guards(async_engine)
+instrument_queries(async_engine)
+
+# Celery tasks run each coroutine on a fresh event loop, so pooled asyncpg
+# connections cannot be shared between them.
+worker_engine = AsyncEngine(create_engine(url=Config.DATABASE_URL, poolclass=NullPool))
+
+WorkerSession = sessionmaker(
+    bind=worker_engine, class_=AsyncSession, expire_on_commit=False
+)
 
 
 async def init_db() -> None:
@@ -13,10 +36,31 @@ async def init_db() -> None:
         await conn.run_sync(SQLModel.metadata.create_all)
 
 
-async def get_session() -> AsyncSession:
+async def get_session(request: Request) -> AsyncSession:
     Session = sessionmaker(
         bind=async_engine, class_=AsyncSession, expire_on_commit=False
     )
+    route = request.scope.get("route")
+    group = get_policy(route, "bulkhead") or DEFAULT_GROUP
+    timeout = get_policy(route, "statement_timeout") or Config.DB_STATEMENT_TIMEOUT_MS
+
+    async with bulkheads[group].acquire(), Session() as session:
+        session.info["statement_timeout_ms"] = timeout
+
+        try:
+            yield session
+        except DBAPIError as exc:
+            if getattr(exc.orig, "sqlstate", None) == QUERY_CANCELED:
+                raise QueryTimeout() from exc
+
+            raise
+
+
+@asynccontextmanager
+async def standalone_session(group: str = DEFAULT_GROUP):
+    """A session for code outside a route (middleware) under `group`'s bulkhead"""
 
-    async with Session() as session:
+    async with bulkheads[group].acquire(), AsyncSession(
+        async_engine, expire_on_commit=False
+    ) as session:
         yield session
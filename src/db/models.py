@@ -3,7 +3,10 @@ from datetime import date, datetime
 from typing import List, Optional
 
 import sqlalchemy.dialects.postgresql as pg
-from sqlmodel import Column, Field, Relationship, SQLModel
+from sqlmodel import Column, Field, ForeignKey, Index, Relationship, SQLModel, text
+
+LIVE_ROWS = text("deleted_at IS NULL")
+TOMBSTONED_ROWS = text("deleted_at IS NOT NULL")
 
 
 class User(SQLModel, table=True):
@@ -25,10 +28,18 @@ class User(SQLModel, table=True):
     created_at: datetime = Field(sa_column=Column(pg.TIMESTAMP, default=datetime.now))
     update_at: datetime = Field(sa_column=Column(pg.TIMESTAMP, default=datetime.now))
     books: List["Book"] = Relationship(
-        back_populates="user", sa_relationship_kwargs={"lazy": "selectin"}
+        back_populates="user",
+        sa_relationship_kwargs={
+            "lazy": "selectin",
+            "primaryjoin": "and_(User.uid == Book.user_uid, Book.deleted_at == None)",
+        },
     )
     reviews: List["Review"] = Relationship(
-        back_populates="user", sa_relationship_kwargs={"lazy": "selectin"}
+        back_populates="user",
+        sa_relationship_kwargs={
+            "lazy": "selectin",
+            "primaryjoin": "and_(User.uid == Review.user_uid, Review.deleted_at == None)",
+        },
     )
 
     def __repr__(self):
@@ -36,6 +47,7 @@ class User(SQLModel, table=True):
 
 
 class BookTag(SQLModel, table=True):
+    __table_args__ = (Index("ix_booktag_tag_id_book_id", "tag_id", "book_id"),)
     book_id: uuid.UUID = Field(default=None, foreign_key="books.uid", primary_key=True)
     tag_id: uuid.UUID = Field(default=None, foreign_key="tags.uid", primary_key=True)
 
@@ -46,11 +58,19 @@ class Tag(SQLModel, table=True):
         sa_column=Column(pg.UUID, nullable=False, primary_key=True, default=uuid.uuid4)
     )
     name: str = Field(sa_column=Column(pg.VARCHAR, nullable=False))
+    book_count: int = Field(
+        default=0,
+        sa_column=Column(pg.INTEGER, nullable=False, server_default="0", index=True),
+    )
     created_at: datetime = Field(sa_column=Column(pg.TIMESTAMP, default=datetime.now))
     books: List["Book"] = Relationship(
         link_model=BookTag,
         back_populates="tags",
-        sa_relationship_kwargs={"lazy": "selectin"},
+        sa_relationship_kwargs={
+            "lazy": "selectin",
+            "primaryjoin": "Tag.uid == BookTag.tag_id",
+            "secondaryjoin": "and_(BookTag.book_id == Book.uid, Book.deleted_at == None)",
+        },
     )
 
     def __repr__(self) -> str:
@@ -59,6 +79,16 @@ class Tag(SQLModel, table=True):
 
 class Book(SQLModel, table=True):
     __tablename__ = "books"
+    __table_args__ = (
+        Index("ix_books_live_created_at", "created_at", postgresql_where=LIVE_ROWS),
+        Index(
+            "ix_books_live_user_uid",
+            "user_uid",
+            "created_at",
+            postgresql_where=LIVE_ROWS,
+        ),
+        Index("ix_books_deleted_at", "deleted_at", postgresql_where=TOMBSTONED_ROWS),
+    )
     uid: uuid.UUID = Field(
         sa_column=Column(pg.UUID, nullable=False, primary_key=True, default=uuid.uuid4)
     )
@@ -71,14 +101,22 @@ class Book(SQLModel, table=True):
     user_uid: Optional[uuid.UUID] = Field(default=None, foreign_key="users.uid")
     created_at: datetime = Field(sa_column=Column(pg.TIMESTAMP, default=datetime.now))
     update_at: datetime = Field(sa_column=Column(pg.TIMESTAMP, default=datetime.now))
+    deleted_at: Optional[datetime] = Field(
+        default=None, sa_column=Column(pg.TIMESTAMP, nullable=True)
+    )
     user: Optional[User] = Relationship(back_populates="books")
     reviews: List["Review"] = Relationship(
-        back_populates="book", sa_relationship_kwargs={"lazy": "selectin"}
+        back_populates="book",
+        sa_relationship_kwargs={
+            "lazy": "selectin",
+            "primaryjoin": "and_(Book.uid == Review.book_uid, Review.deleted_at == None)",
+            "order_by": "Review.created_at",
+        },
     )
     tags: List[Tag] = Relationship(
         link_model=BookTag,
         back_populates="books",
-        sa_relationship_kwargs={"lazy": "selectin"},
+        sa_relationship_kwargs={"lazy": "selectin", "order_by": "Tag.name"},
     )
 
     def __repr__(self):
@@ -87,6 +125,11 @@ class Book(SQLModel, table=True):
 
 class Review(SQLModel, table=True):
     __tablename__ = "reviews"
+    __table_args__ = (
+        Index("ix_reviews_live_book_uid", "book_uid", postgresql_where=LIVE_ROWS),
+        Index("ix_reviews_live_created_at", "created_at", postgresql_where=LIVE_ROWS),
+        Index("ix_reviews_deleted_at", "deleted_at", postgresql_where=TOMBSTONED_ROWS),
+    )
     uid: uuid.UUID = Field(
         sa_column=Column(pg.UUID, nullable=False, primary_key=True, default=uuid.uuid4)
     )
@@ -96,8 +139,28 @@ class Review(SQLModel, table=True):
     book_uid: Optional[uuid.UUID] = Field(default=None, foreign_key="books.uid")
     created_at: datetime = Field(sa_column=Column(pg.TIMESTAMP, default=datetime.now))
     update_at: datetime = Field(sa_column=Column(pg.TIMESTAMP, default=datetime.now))
+    deleted_at: Optional[datetime] = Field(
+        default=None, sa_column=Column(pg.TIMESTAMP, nullable=True)
+    )
     user: Optional[User] = Relationship(back_populates="reviews")
     book: Optional[Book] = Relationship(back_populates="reviews")
 
     def __repr__(self):
         return f"<Review for book {self.book_uid} by user {self.user_uid}>"
+
+
+class BookDocument(SQLModel, table=True):
+    __tablename__ = "book_documents"
+    book_uid: uuid.UUID = Field(
+        sa_column=Column(
+            pg.UUID,
+            ForeignKey("books.uid", ondelete="CASCADE"),
+            nullable=False,
+            primary_key=True,
+        )
+    )
+    document: dict = Field(sa_column=Column(pg.JSONB, nullable=False))
+    updated_at: datetime = Field(sa_column=Column(pg.TIMESTAMP, default=datetime.now))
+
+    def __repr__(self):
+        return f"<BookDocument for book {self.book_uid}>"
@@ -1,16 +1,25 @@
+import redis
 import redis.asyncio as aioredis
 
 from src.config import Config
+from src.metrics import REDIS_LATENCY
+from src.tracing import span
 
 JTI_EXPIRY = 3600
 
-token_blocklist = aioredis.from_url(Config.REDIS_URL)
+redis_client = aioredis.from_url(Config.REDIS_URL)
+token_blocklist = redis_client
+
+# Celery tasks run outside any event loop, so they get a blocking client
+worker_redis = redis.Redis.from_url(Config.REDIS_URL)
 
 async def add_jti_to_blocklist(jti: str) -> None:
-    await token_blocklist.set(name=jti, value="", ex=JTI_EXPIRY)
+    with REDIS_LATENCY.labels("blocklist_add").time(), span("redis SET", kind="client"):
+        await token_blocklist.set(name=jti, value="", ex=JTI_EXPIRY)
 
 
 async def token_in_blocklist(jti: str) -> bool:
-    jti = await token_blocklist.get(jti)
+    with REDIS_LATENCY.labels("blocklist_check").time(), span("redis GET", kind="client"):
+        jti = await token_blocklist.get(jti)
 
     return jti is not None
\ No newline at end of file
@@ -0,0 +1,288 @@
+import asyncio
+import contextvars
+import hashlib
+import logging
+import re
+import sys
+import time
+from datetime import datetime, timezone
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+from typing import Any, List, Optional
+
+import orjson
+from greenlet import getcurrent
+
+from src.config import Config
+
+from .redis import redis_client
+
+logger = logging.getLogger("bookly.sql")
+
+SERVICE_MODULE = re.compile(r"[/\\]src[/\\](\w+)[/\\]service\.py$")
+EXPLAINABLE = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE")
+
+STATS_KEY = "bookly:slow_queries:total_ms"
+COUNTS_KEY = "bookly:slow_queries:count"
+SAMPLES_KEY = "bookly:slow_queries:samples"
+EXPLAINED_KEY = "bookly:slow_queries:explained:{}"
+
+# Adds ARGV[2] ms and one call to fingerprint ARGV[1]. Only the ARGV[3]
+# fingerprints with the most total time are kept; the rest are dropped from
+# all three keys. Every key lapses ARGV[4] seconds after the last slow query.
+RECORD_LUA = """
+redis.call("ZINCRBY", KEYS[1], ARGV[2], ARGV[1])
+redis.call("HINCRBY", KEYS[2], ARGV[1], 1)
+local excess = redis.call("ZCARD", KEYS[1]) - tonumber(ARGV[3])
+if excess > 0 then
+    local evicted = redis.call("ZRANGE", KEYS[1], 0, excess - 1)
+    redis.call("ZREMRANGEBYRANK", KEYS[1], 0, excess - 1)
+    redis.call("HDEL", KEYS[2], unpack(evicted))
+    redis.call("HDEL", KEYS[3], unpack(evicted))
+end
+for _, key in ipairs(KEYS) do
+    redis.call("EXPIRE", key, ARGV[4])
+end
+return redis.call("ZSCORE", KEYS[1], ARGV[1]) and 1 or 0
+"""
+
+# Stores a sample only for a fingerprint that is still ranked
+SAMPLE_LUA = """
+if redis.call("ZSCORE", KEYS[1], ARGV[1]) then
+    redis.call("HSET", KEYS[2], ARGV[1], ARGV[2])
+    redis.call("EXPIRE", KEYS[2], ARGV[3])
+end
+"""
+
+record_slow_query = redis_client.register_script(RECORD_LUA)
+store_sample = redis_client.register_script(SAMPLE_LUA)
+
+
+def fingerprint(statement: str) -> str:
+    """Normalize literals, placeholders and IN lists so query shapes compare equal"""
+
+    normalized = re.sub(r"'(?:[^']|'')*'", "?", statement)
+    normalized = re.sub(r"\$\d+|\b\d+\b", "?", normalized)
+    normalized = re.sub(r"\(\s*\?(?:\s*,\s*\?)+\s*\)", "(?...)", normalized)
+    normalized = " ".join(normalized.split())
+
+    return hashlib.sha1(normalized.encode()).hexdigest()[:16]
+
+
+def parameter_shapes(parameters) -> List[str]:
+    """Type names of the bound parameters; the values themselves are not kept"""
+
+    if isinstance(parameters, dict):
+        return [f"{key}:{type(value).__name__}" for key, value in parameters.items()]
+
+    return [type(value).__name__ for value in parameters or ()]
+
+
+def service_caller() -> Optional[str]:
+    """Find the `src/<feature>/service.py` frame that issued the current statement.
+
+    Cursor events run in the greenlet SQLAlchemy spawns for the sync driver
+    call, so the walk continues into the parent greenlet that is suspended
+    in the awaiting coroutine chain.
+    """
+
+    frame = sys._getframe()
+    glet = getcurrent()
+
+    while glet is not None:
+        while frame is not None:
+            match = SERVICE_MODULE.search(frame.f_code.co_filename)
+
+            if match:
+                return f"{match.group(1)}/service.py:{frame.f_lineno} {frame.f_code.co_name}"
+
+            frame = frame.f_back
+
+        glet = glet.parent
+        frame = glet.gr_frame if glet is not None else None
+
+    return None
+
+
+class SlowQueryLog:
+    """Capture slow service-layer statements with their EXPLAIN plan.
+
+    Observing a statement only enqueues it; a background task runs the
+    EXPLAIN on its own connection and writes the entry to the configured
+    sink. Each fingerprint is explained at most once per
+    SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS across all workers. Only the
+    SLOW_QUERY_MAX_FINGERPRINTS costliest fingerprints are kept.
+    """
+
+    def __init__(self) -> None:
+        self.queue: Optional[asyncio.Queue] = None
+        self.worker: Optional[asyncio.Task] = None
+        self.explained_at = {}
+        self.file_handler: Optional[RotatingFileHandler] = None
+
+    def observe(self, statement: str, parameters, elapsed_ms: float) -> None:
+        if not Config.SLOW_QUERY_LOG_ENABLED or elapsed_ms < Config.SLOW_QUERY_MS:
+            return
+
+        origin = service_caller()
+
+        if origin is None:
+            return
+
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+
+        entry = {
+            "fingerprint": fingerprint(statement),
+            "statement": statement,
+            "parameter_shapes": parameter_shapes(parameters),
+            "origin": origin,
+            "elapsed_ms": round(elapsed_ms, 3),
+            "seen_at": datetime.now(timezone.utc).isoformat(),
+        }
+
+        self.enqueue(loop, entry, parameters)
+
+    def enqueue(self, loop: asyncio.AbstractEventLoop, entry: dict, parameters) -> None:
+        if (
+            self.worker is None
+            or self.worker.done()
+            or self.worker.get_loop() is not loop
+        ):
+            self.queue = asyncio.Queue(maxsize=Config.SLOW_QUERY_QUEUE_SIZE)
+            # A fresh context keeps the worker out of the current request's stats
+            self.worker = loop.create_task(
+                self.drain(self.queue), context=contextvars.Context()
+            )
+
+        try:
+            self.queue.put_nowait((entry, parameters))
+        except asyncio.QueueFull:
+            pass
+
+    async def drain(self, queue: asyncio.Queue) -> None:
+        while True:
+            entry, parameters = await queue.get()
+
+            try:
+                await self.process(entry, parameters)
+            except Exception:
+                logger.exception("Could not record slow query")
+
+    async def process(self, entry: dict, parameters) -> None:
+        fp = entry["fingerprint"]
+
+        ranked = await record_slow_query(
+            keys=[STATS_KEY, COUNTS_KEY, SAMPLES_KEY],
+            args=[
+                fp,
+                entry["elapsed_ms"],
+                Config.SLOW_QUERY_MAX_FINGERPRINTS,
+                Config.SLOW_QUERY_RETENTION_SECONDS,
+            ],
+        )
+
+        if not ranked or not await self.should_explain(fp):
+            return
+
+        entry["plan"] = await self.explain(entry["statement"], parameters)
+
+        await store_sample(
+            keys=[STATS_KEY, SAMPLES_KEY],
+            args=[fp, orjson.dumps(entry), Config.SLOW_QUERY_RETENTION_SECONDS],
+        )
+        await self.write(entry)
+
+    async def should_explain(self, fp: str) -> bool:
+        now = time.monotonic()
+        interval = Config.SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS
+
+        if now - self.explained_at.get(fp, -interval) < interval:
+            return False
+
+        # Kept in the order explained, so the oldest entries are dropped first
+        self.explained_at.pop(fp, None)
+        self.explained_at[fp] = now
+
+        while len(self.explained_at) > Config.SLOW_QUERY_MAX_FINGERPRINTS:
+            del self.explained_at[next(iter(self.explained_at))]
+
+        return bool(
+            await redis_client.set(EXPLAINED_KEY.format(fp), 1, nx=True, ex=interval)
+        )
+
+    async def explain(self, statement: str, parameters) -> Any:
+        if not statement.lstrip().upper().startswith(EXPLAINABLE):
+            return None
+
+        if isinstance(parameters, dict):
+            return None
+
+        from .fastpath import raw_connection
+
+        try:
+            # Diagnostics share the admin budget rather than taking a connection
+            # outside every bulkhead
+            async with raw_connection(group="admin") as conn:
+                plan = await conn.fetchval(
+                    f"EXPLAIN (ANALYZE off, FORMAT JSON) {statement}", *parameters
+                )
+        except Exception as exc:
+            return {"error": str(exc)}
+
+        return orjson.loads(plan) if isinstance(plan, str) else plan
+
+    async def write(self, entry: dict) -> None:
+        line = orjson.dumps(entry)
+
+        if Config.SLOW_QUERY_SINK == "redis":
+            await redis_client.xadd(
+                Config.SLOW_QUERY_STREAM,
+                {"entry": line},
+                maxlen=Config.SLOW_QUERY_STREAM_MAXLEN,
+                approximate=True,
+            )
+            return
+
+        await asyncio.to_thread(self.write_file, line.decode())
+
+    def write_file(self, line: str) -> None:
+        if self.file_handler is None:
+            path = Path(Config.SLOW_QUERY_LOG_FILE)
+            path.parent.mkdir(parents=True, exist_ok=True)
+
+            self.file_handler = RotatingFileHandler(
+                path, maxBytes=10 * 1024 * 1024, backupCount=5
+            )
+
+        self.file_handler.emit(logging.makeLogRecord({"msg": line}))
+
+    async def top_offenders(self, limit: int = 20) -> List[dict]:
+        ranked = await redis_client.zrevrange(STATS_KEY, 0, limit - 1, withscores=True)
+
+        if not ranked:
+            return []
+
+        fingerprints = [fp for fp, _ in ranked]
+        counts = await redis_client.hmget(COUNTS_KEY, fingerprints)
+        samples = await redis_client.hmget(SAMPLES_KEY, fingerprints)
+
+        offenders = []
+
+        for (fp, total_ms), count, sample in zip(ranked, counts, samples):
+            count = int(count or 0)
+            offender = orjson.loads(sample) if sample else {}
+            offender.update(
+                fingerprint=fp.decode(),
+                count=count,
+                total_ms=round(total_ms, 3),
+                mean_ms=round(total_ms / count, 3) if count else None,
+            )
+            offenders.append(offender)
+
+        return offenders
+
+
+slow_query_log = SlowQueryLog()
@@ -0,0 +1,157 @@
+import logging
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from src.config import Config
+from src.tracing import start_span
+
+from .slow_queries import slow_query_log
+
+logger = logging.getLogger("bookly.sql")
+
+
+class NPlusOneDetected(Exception):
+    """Raised in `raise` mode when one request repeats a statement too often"""
+
+
+class RequestStats:
+    """Query and phase timings collected for a single request"""
+
+    __slots__ = (
+        "query_count",
+        "db_ms",
+        "slowest_ms",
+        "slowest_statement",
+        "statements",
+        "phases",
+        "flagged",
+    )
+
+    def __init__(self) -> None:
+        self.query_count = 0
+        self.db_ms = 0.0
+        self.slowest_ms = 0.0
+        self.slowest_statement: Optional[str] = None
+        self.statements: Counter = Counter()
+        self.phases: Dict[str, float] = {}
+        self.flagged = set()
+
+    def record_query(self, statement: str, elapsed_ms: float) -> None:
+        self.query_count += 1
+        self.db_ms += elapsed_ms
+
+        if elapsed_ms > self.slowest_ms:
+            self.slowest_ms = elapsed_ms
+            self.slowest_statement = statement
+
+        if Config.SQL_N_PLUS_ONE_MODE != "off":
+            self.statements[statement] += 1
+            self.check_repeats(statement)
+
+    def check_repeats(self, statement: str) -> None:
+        count = self.statements[statement]
+
+        if count < Config.SQL_N_PLUS_ONE_THRESHOLD or statement in self.flagged:
+            return
+
+        self.flagged.add(statement)
+
+        if Config.SQL_N_PLUS_ONE_MODE == "raise":
+            raise NPlusOneDetected(
+                f"Statement executed {count} times in one request: {statement}"
+            )
+
+        logger.warning(
+            "Possible N+1: statement repeated %s times in one request",
+            count,
+            extra={"fields": {"statement": statement, "count": count}},
+        )
+
+    def add_phase(self, name: str, elapsed_ms: float) -> None:
+        self.phases[name] = self.phases.get(name, 0.0) + elapsed_ms
+
+    def server_timing(self) -> str:
+        timings = [f"db;dur={self.db_ms:.1f};desc=\"{self.query_count} queries\""]
+        timings.extend(f"{name};dur={ms:.1f}" for name, ms in self.phases.items())
+
+        return ", ".join(timings)
+
+    def log_fields(self) -> dict:
+        return {
+            "db_queries": self.query_count,
+            "db_ms": round(self.db_ms, 3),
+            "db_slowest_ms": round(self.slowest_ms, 3),
+            "db_slowest_statement": self.slowest_statement,
+            **{f"{name}_ms": round(ms, 3) for name, ms in self.phases.items()},
+        }
+
+
+request_stats: ContextVar[Optional[RequestStats]] = ContextVar(
+    "request_stats", default=None
+)
+
+
+@contextmanager
+def timed_phase(name: str):
+    """Add the time spent in the block to the current request's `name` phase"""
+
+    stats = request_stats.get()
+
+    if stats is None:
+        yield
+        return
+
+    start = time.perf_counter()
+
+    try:
+        yield
+    finally:
+        stats.add_phase(name, (time.perf_counter() - start) * 1000)
+
+
+def record_query(statement: str, elapsed_ms: float, parameters=None) -> None:
+    slow_query_log.observe(statement, parameters, elapsed_ms)
+
+    stats = request_stats.get()
+
+    if stats is not None:
+        stats.record_query(statement, elapsed_ms)
+
+
+def instrument_queries(engine: AsyncEngine) -> None:
+    """Time every statement run on `engine` into the current request's stats"""
+
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before_cursor_execute(
+        conn, cursor, statement, parameters, context, executemany
+    ):
+        query_span = start_span("sql", kind="client", statement=statement[:1000])
+        conn.info.setdefault("query_start", []).append((time.perf_counter(), query_span))
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        start, query_span = conn.info["query_start"].pop()
+
+        if query_span is not None:
+            query_span.end()
+
+        record_query(statement, (time.perf_counter() - start) * 1000, parameters)
+
+    @event.listens_for(sync_engine, "handle_error")
+    def handle_error(exception_context):
+        conn = exception_context.connection
+
+        if conn is not None and conn.info.get("query_start"):
+            _, query_span = conn.info["query_start"].pop()
+
+            if query_span is not None:
+                query_span.error = str(exception_context.original_exception)
+                query_span.end()
@@ -1,9 +1,12 @@
+import logging
 from typing import Any, Callable
 from fastapi.requests import Request
 from fastapi.responses import JSONResponse
 from fastapi import FastAPI, status
 from sqlalchemy.exc import SQLAlchemyError
 
+logger = logging.getLogger("bookly.errors")
+
 class BooklyException(Exception):
     """This is the base class for all bookly errors"""
 
@@ -76,6 +79,30 @@ class UserNotFound(BooklyException):
     pass
 
 
+class ProfileNotFound(BooklyException):
+    """Profile Not found or expired"""
+
+    pass
+
+
+class MailJobNotFound(BooklyException):
+    """Bulk mail job Not found or expired"""
+
+    pass
+
+
+class DatabaseBusy(BooklyException):
+    """The route group's database budget stayed full"""
+
+    pass
+
+
+class QueryTimeout(BooklyException):
+    """A query ran past the route's statement timeout"""
+
+    pass
+
+
 class AccountNotVerified(Exception):
     """Account not yet verified"""
     pass
@@ -229,6 +256,52 @@ def register_all_errors(app: FastAPI):
         ),
     )
 
+    app.add_exception_handler(
+        ProfileNotFound,
+        create_exception_handler(
+            status_code=status.HTTP_404_NOT_FOUND,
+            initial_detail={
+                "message": "Profile Not Found",
+                "error_code": "profile_not_found",
+            },
+        ),
+    )
+
+    app.add_exception_handler(
+        MailJobNotFound,
+        create_exception_handler(
+            status_code=status.HTTP_404_NOT_FOUND,
+            initial_detail={
+                "message": "Mail Job Not Found",
+                "error_code": "mail_job_not_found",
+            },
+        ),
+    )
+
+    app.add_exception_handler(
+        DatabaseBusy,
+        create_exception_handler(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            initial_detail={
+                "message": "The database is busy",
+                "resolution": "Please try again later",
+                "error_code": "database_busy",
+            },
+        ),
+    )
+
+    app.add_exception_handler(
+        QueryTimeout,
+        create_exception_handler(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            initial_detail={
+                "message": "The request took too long to complete",
+                "resolution": "Please narrow the request or try again later",
+                "error_code": "query_timeout",
+            },
+        ),
+    )
+
     @app.exception_handler(500)
     async def internal_server_error(request, exc):
 
@@ -243,7 +316,12 @@ def register_all_errors(app: FastAPI):
 
     @app.exception_handler(SQLAlchemyError)
     async def database__error(request, exc):
-        print(str(exc))
+        logger.error(
+            "Database error on %s %s",
+            request.method,
+            request.url.path,
+            exc_info=exc,
+        )
         return JSONResponse(
             content={
                 "message": "Oops! Something went wrong",
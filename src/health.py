@@ -0,0 +1,11 @@
+from fastapi import APIRouter
+
+from src.admission import admission_controller, admission_priority
+
+health_router = APIRouter()
+
+
+@health_router.get("/health", include_in_schema=False)
+@admission_priority("critical")
+async def health_check():
+    return {"status": "ok", "admission": admission_controller.snapshot()}
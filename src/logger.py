@@ -0,0 +1,70 @@
+import atexit
+import logging
+import queue
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+import orjson
+
+from src.config import Config
+
+_listener = None
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line; structured fields come from `extra={"fields": ...}`"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+
+        entry.update(getattr(record, "fields", None) or {})
+
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+
+        return orjson.dumps(entry, default=str).decode()
+
+
+class DeferredQueueHandler(QueueHandler):
+    """Hands records to the listener thread without formatting them first"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+
+        record.msg = record.getMessage()
+        record.args = None
+
+        return record
+
+
+def setup_logging() -> None:
+    """Route the `bookly` loggers through a queue drained by a background thread"""
+
+    global _listener
+
+    if _listener is not None:
+        return
+
+    log_queue = queue.SimpleQueue()
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(JSONFormatter())
+
+    _listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+    root = logging.getLogger("bookly")
+    root.setLevel(Config.LOG_LEVEL)
+    root.addHandler(DeferredQueueHandler(log_queue))
+    root.propagate = False
@@ -0,0 +1,102 @@
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Optional
+
+from src.config import Config
+from src.metrics import LOOP_LAG, LOOP_STALLS
+
+logger = logging.getLogger("bookly.loop")
+
+
+class LoopMonitor:
+    """Measure event loop lag and capture the stack of whatever blocks it.
+
+    A heartbeat task sleeps for `interval` and records how late it woke up.
+    A watchdog thread checks the heartbeat; when it is older than
+    `stall_threshold` the loop thread is stuck in one callback, so its
+    current stack is logged once for that stall.
+    """
+
+    def __init__(self, interval: float, stall_threshold: float) -> None:
+        self.interval = interval
+        self.stall_threshold = stall_threshold
+        self.last_beat = time.monotonic()
+        self.recent_stalls = deque(maxlen=20)
+        self.task: Optional[asyncio.Task] = None
+        self.thread: Optional[threading.Thread] = None
+        self.stopped = threading.Event()
+        self.loop_thread_id: Optional[int] = None
+
+    def start(self) -> None:
+        self.loop_thread_id = threading.get_ident()
+        self.last_beat = time.monotonic()
+        self.stopped.clear()
+
+        self.task = asyncio.get_running_loop().create_task(self.heartbeat())
+        self.thread = threading.Thread(
+            target=self.watch, name="bookly-loop-watchdog", daemon=True
+        )
+        self.thread.start()
+
+    async def stop(self) -> None:
+        self.stopped.set()
+
+        if self.task is not None:
+            self.task.cancel()
+
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+
+        if self.thread is not None:
+            self.thread.join()
+
+    async def heartbeat(self) -> None:
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+
+            now = time.monotonic()
+            self.last_beat = now
+            LOOP_LAG.observe(max(now - expected, 0.0))
+
+    def watch(self) -> None:
+        captured_beat = None
+
+        while not self.stopped.wait(self.stall_threshold / 2):
+            beat = self.last_beat
+            blocked_for = time.monotonic() - beat - self.interval
+
+            if blocked_for < self.stall_threshold or beat == captured_beat:
+                continue
+
+            captured_beat = beat
+            self.capture(blocked_for)
+
+    def capture(self, blocked_for: float) -> None:
+        frame = sys._current_frames().get(self.loop_thread_id)
+
+        if frame is None:
+            return
+
+        stack = "".join(traceback.format_stack(frame))
+        LOOP_STALLS.inc()
+        self.recent_stalls.append(stack)
+
+        logger.warning(
+            "Event loop blocked for at least %.0f ms",
+            blocked_for * 1000,
+            extra={"fields": {"blocked_ms": round(blocked_for * 1000, 1), "stack": stack}},
+        )
+
+
+loop_monitor = LoopMonitor(
+    interval=Config.LOOP_MONITOR_INTERVAL_MS / 1000,
+    stall_threshold=Config.LOOP_STALL_THRESHOLD_MS / 1000,
+)
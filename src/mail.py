@@ -1,32 +1,331 @@
-from fastapi_mail import FastMail, ConnectionConfig, MessageSchema, MessageType
-from src.config import Config
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from email.message import EmailMessage
+from email.utils import formataddr
 from pathlib import Path
+from typing import List, Optional, Tuple
+
+import aiosmtplib
+from fastapi_mail import ConnectionConfig
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, select_autoescape
+
+from src.config import Config
 
 BASE_DIR = Path(__file__).resolve().parent
+TEMPLATE_FOLDER = Path(BASE_DIR, "templates", "email")
+
+logger = logging.getLogger("bookly.mail")
 
 
 mail_config = ConnectionConfig(
     MAIL_USERNAME=Config.MAIL_USERNAME,
     MAIL_PASSWORD=Config.MAIL_PASSWORD,
     MAIL_FROM=Config.MAIL_FROM,
-    MAIL_PORT=587,
+    MAIL_PORT=Config.MAIL_PORT,
     MAIL_SERVER=Config.MAIL_SERVER,
     MAIL_FROM_NAME=Config.MAIL_FROM_NAME,
-    MAIL_STARTTLS=True,
-    MAIL_SSL_TLS=False,
-    USE_CREDENTIALS=True,
-    VALIDATE_CERTS=True,
-    # TEMPLATE_FOLDER=Path(BASE_DIR, "templates"),
+    MAIL_STARTTLS=Config.MAIL_STARTTLS,
+    MAIL_SSL_TLS=Config.MAIL_SSL_TLS,
+    USE_CREDENTIALS=Config.USE_CREDENTIALS,
+    VALIDATE_CERTS=Config.VALIDATE_CERTS,
 )
 
+# Templates are compiled once per process and kept in memory (auto_reload is
+# off, so there is no stat per render); the bytecode cache lets new worker
+# processes skip compiling them at all.
+template_env = Environment(
+    loader=FileSystemLoader(TEMPLATE_FOLDER),
+    autoescape=select_autoescape(["html"]),
+    bytecode_cache=FileSystemBytecodeCache(Config.MAIL_TEMPLATE_CACHE_DIR),
+    auto_reload=False,
+)
+
+EMAIL_SUBJECTS = {
+    "verify_email": "Verify Your email",
+    "password_reset": "Reset Your Password",
+    "welcome": "Welcome to our app",
+}
+
+# Rendered with a sample context when a worker starts
+WARM_TEMPLATES = {
+    "verify_email": {"link": "http://localhost/"},
+    "password_reset": {"link": "http://localhost/"},
+}
+
+
+def render_email(template_name: str, context: dict) -> Tuple[str, str]:
+    """Return the subject and HTML body of an email template"""
 
-mail = FastMail(config=mail_config)
+    template = template_env.get_template(f"{template_name}.html")
 
+    return EMAIL_SUBJECTS[template_name], template.render(context)
 
-def create_message(recipients: list[str], subject: str, body: str):
 
-    message = MessageSchema(
-        recipients=recipients, subject=subject, body=body, subtype=MessageType.html
-    )
+def warm_templates() -> None:
+    for template_name, context in WARM_TEMPLATES.items():
+        render_email(template_name, context)
+
+
+def create_message(recipients: list[str], subject: str, body: str) -> EmailMessage:
+    message = EmailMessage()
+    message["From"] = formataddr((mail_config.MAIL_FROM_NAME, mail_config.MAIL_FROM))
+    message["To"] = ", ".join(recipients)
+    message["Subject"] = subject
+    message.set_content(body, subtype="html")
 
     return message
+
+
+class SMTPPool:
+    """Persistent, authenticated SMTP connections for one worker process.
+
+    Connections idle for longer than `check_after` seconds are checked with a
+    NOOP before reuse, and each is retired after `max_messages` so a server
+    that limits messages per session never refuses us halfway through.
+    """
+
+    def __init__(
+        self,
+        config: ConnectionConfig,
+        size: int,
+        check_after: float,
+        max_messages: int,
+    ) -> None:
+        self.config = config
+        self.size = size
+        self.check_after = check_after
+        self.max_messages = max_messages
+        self.idle: deque = deque()
+        self.slots: Optional[asyncio.Semaphore] = None
+
+    async def connect(self) -> aiosmtplib.SMTP:
+        smtp = aiosmtplib.SMTP(
+            hostname=self.config.MAIL_SERVER,
+            port=self.config.MAIL_PORT,
+            use_tls=self.config.MAIL_SSL_TLS,
+            start_tls=self.config.MAIL_STARTTLS,
+            validate_certs=self.config.VALIDATE_CERTS,
+            timeout=self.config.TIMEOUT,
+        )
+        await smtp.connect()
+
+        if self.config.USE_CREDENTIALS:
+            await smtp.login(
+                self.config.MAIL_USERNAME, self.config.MAIL_PASSWORD
+            )
+
+        return smtp
+
+    async def healthy(self, smtp: aiosmtplib.SMTP, last_used: float) -> bool:
+        if not smtp.is_connected:
+            return False
+
+        if time.monotonic() - last_used < self.check_after:
+            return True
+
+        try:
+            await smtp.noop()
+        except (aiosmtplib.SMTPException, OSError):
+            return False
+
+        return True
+
+    @asynccontextmanager
+    async def connection(self):
+        """Yield `[smtp, messages sent on it]`; callers bump the count"""
+
+        if self.slots is None:
+            self.slots = asyncio.Semaphore(self.size)
+
+        async with self.slots:
+            entry = None
+
+            while self.idle:
+                smtp, last_used, sent = self.idle.pop()
+
+                if await self.healthy(smtp, last_used):
+                    entry = [smtp, sent]
+                    break
+
+                smtp.close()
+
+            if entry is None:
+                entry = [await self.connect(), 0]
+
+            try:
+                yield entry
+            except BaseException:
+                entry[0].close()
+                raise
+
+            if entry[1] >= self.max_messages or not entry[0].is_connected:
+                await self.discard(entry[0])
+            else:
+                self.idle.append((entry[0], time.monotonic(), entry[1]))
+
+    async def discard(self, smtp: aiosmtplib.SMTP) -> None:
+        try:
+            await smtp.quit()
+        except (aiosmtplib.SMTPException, OSError):
+            smtp.close()
+
+    async def close(self) -> None:
+        while self.idle:
+            await self.discard(self.idle.pop()[0])
+
+
+class MailSender:
+    """Sends mail for Celery tasks from one long-lived event loop per process.
+
+    Tasks hand their message to the loop thread and wait for it to be sent.
+    Messages queued at the same time (e.g. by a `--pool threads` worker) are
+    sent in batches over one pooled SMTP session.
+    """
+
+    def __init__(self, pool: SMTPPool, batch_size: int, batch_wait: float) -> None:
+        self.pool = pool
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.lock = threading.Lock()
+        self.pid: Optional[int] = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.queue: Optional[asyncio.Queue] = None
+        self.consumers: list = []
+
+    def start(self) -> None:
+        with self.lock:
+            if self.pid == os.getpid():
+                return
+
+            # Forked workers need their own loop, thread and connections
+            self.pid = os.getpid()
+            self.pool.idle.clear()
+            self.pool.slots = None
+            self.loop = asyncio.new_event_loop()
+            ready = threading.Event()
+
+            threading.Thread(
+                target=self.run, args=(ready,), name="bookly-mail", daemon=True
+            ).start()
+            ready.wait()
+
+    def run(self, ready: threading.Event) -> None:
+        asyncio.set_event_loop(self.loop)
+        self.queue = asyncio.Queue()
+
+        self.consumers = [self.loop.create_task(self.consume()) for _ in range(self.pool.size)]
+
+        ready.set()
+        self.loop.run_forever()
+
+    def send(self, message: EmailMessage, timeout: float) -> None:
+        """Send `message` from any thread, raising if it could not be delivered"""
+
+        self.start()
+        asyncio.run_coroutine_threadsafe(self.submit(message), self.loop).result(timeout)
+
+    def send_many(self, messages: List[EmailMessage], timeout: float) -> list:
+        """Send `messages` together; returns None or the exception for each one"""
+
+        self.start()
+
+        return asyncio.run_coroutine_threadsafe(
+            self.submit_many(messages), self.loop
+        ).result(timeout)
+
+    async def submit_many(self, messages: List[EmailMessage]) -> list:
+        return await asyncio.gather(
+            *[self.submit(message) for message in messages], return_exceptions=True
+        )
+
+    async def submit(self, message: EmailMessage) -> None:
+        sent = asyncio.get_running_loop().create_future()
+        self.queue.put_nowait((message, sent))
+        await sent
+
+    async def next_batch(self) -> list:
+        """Wait for one message, then take whatever else is already queued"""
+
+        batch = [await self.queue.get()]
+        deadline = time.monotonic() + self.batch_wait
+
+        while len(batch) < self.batch_size:
+            if not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+                continue
+
+            remaining = deadline - time.monotonic()
+
+            if remaining <= 0:
+                break
+
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+
+        return batch
+
+    async def consume(self) -> None:
+        while True:
+            batch = await self.next_batch()
+
+            try:
+                await self.send_batch(batch)
+            except Exception as exc:
+                logger.exception("Could not send a batch of %d messages", len(batch))
+
+                for _, sent in batch:
+                    if not sent.done():
+                        sent.set_exception(exc)
+
+    async def send_batch(self, batch: list) -> None:
+        async with self.pool.connection() as entry:
+            for message, sent in batch:
+                if sent.done():
+                    continue
+
+                try:
+                    await entry[0].send_message(message)
+                except (aiosmtplib.SMTPRecipientsRefused, aiosmtplib.SMTPDataError) as exc:
+                    # The server refused this message; the session is still usable
+                    sent.set_exception(exc)
+                else:
+                    sent.set_result(None)
+
+                entry[1] += 1
+
+        logger.debug("Sent a batch of %d messages", len(batch))
+
+    def stop(self, timeout: float = 10) -> None:
+        if self.loop is None or self.pid != os.getpid():
+            return
+
+        asyncio.run_coroutine_threadsafe(self.shutdown(), self.loop).result(timeout)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.pid = None
+
+    async def shutdown(self) -> None:
+        for consumer in self.consumers:
+            consumer.cancel()
+
+        await asyncio.gather(*self.consumers, return_exceptions=True)
+        await self.pool.close()
+
+
+smtp_pool = SMTPPool(
+    mail_config,
+    size=Config.MAIL_POOL_SIZE,
+    check_after=Config.MAIL_CHECK_AFTER_SECONDS,
+    max_messages=Config.MAIL_MAX_MESSAGES_PER_CONNECTION,
+)
+mail_sender = MailSender(
+    smtp_pool,
+    batch_size=Config.MAIL_BATCH_SIZE,
+    batch_wait=Config.MAIL_BATCH_WAIT_MS / 1000,
+)
@@ -0,0 +1,277 @@
+import os
+import time
+
+from celery.signals import (
+    after_task_publish,
+    before_task_publish,
+    task_postrun,
+    task_prerun,
+    worker_process_shutdown,
+    worker_shutdown,
+)
+from fastapi import APIRouter, Response
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+    start_http_server,
+)
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from src.routing import route_policy
+from src.tracing import PendingSignals
+
+# With several workers, set PROMETHEUS_MULTIPROC_DIR to an empty directory
+# shared by all of them (and wipe it on deploy); every worker then writes its
+# samples there and /metrics aggregates them.
+MULTIPROCESS = "PROMETHEUS_MULTIPROC_DIR" in os.environ
+
+REQUEST_LATENCY = Histogram(
+    "bookly_http_request_duration_seconds",
+    "Time spent handling HTTP requests",
+    ["method", "route", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "bookly_http_requests_in_flight",
+    "HTTP requests currently being handled",
+    ["method"],
+    multiprocess_mode="livesum",
+)
+RESPONSE_SIZE = Histogram(
+    "bookly_http_response_size_bytes",
+    "Size of HTTP response bodies",
+    ["method", "route"],
+    buckets=(256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304),
+)
+
+DB_POOL_SIZE = Gauge(
+    "bookly_db_pool_size",
+    "Configured size of the database connection pool",
+    multiprocess_mode="livesum",
+)
+DB_POOL_CONNECTIONS = Gauge(
+    "bookly_db_pool_connections",
+    "Open database connections held by the pool",
+    multiprocess_mode="livesum",
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    "bookly_db_pool_checked_out",
+    "Database connections currently checked out of the pool",
+    multiprocess_mode="livesum",
+)
+DB_POOL_CHECKOUTS = Counter(
+    "bookly_db_pool_checkouts_total", "Database connection checkouts"
+)
+
+DB_BULKHEAD_LIMIT = Gauge(
+    "bookly_db_bulkhead_limit",
+    "Concurrent DB sessions allowed per route group",
+    ["group"],
+    multiprocess_mode="livesum",
+)
+DB_BULKHEAD_IN_USE = Gauge(
+    "bookly_db_bulkhead_in_use",
+    "DB sessions currently held per route group",
+    ["group"],
+    multiprocess_mode="livesum",
+)
+DB_BULKHEAD_WAIT = Histogram(
+    "bookly_db_bulkhead_wait_seconds",
+    "Time spent waiting for a route group's DB session budget",
+    ["group"],
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+DB_BULKHEAD_REJECTED = Counter(
+    "bookly_db_bulkhead_rejected_total",
+    "Requests refused because their route group's DB budget stayed full",
+    ["group"],
+)
+
+REDIS_LATENCY = Histogram(
+    "bookly_redis_command_duration_seconds",
+    "Latency of Redis commands issued by the API",
+    ["operation"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25),
+)
+
+CELERY_PUBLISH_LATENCY = Histogram(
+    "bookly_celery_publish_duration_seconds",
+    "Time spent publishing a task to the broker (e.g. send_email.delay)",
+    ["task"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1),
+)
+
+CELERY_TASKS = Counter(
+    "bookly_celery_tasks_total",
+    "Celery tasks run by the worker, by queue and final state",
+    ["queue", "task", "state"],
+)
+CELERY_TASK_DURATION = Histogram(
+    "bookly_celery_task_duration_seconds",
+    "Time a Celery task spent running",
+    ["queue", "task"],
+    buckets=(0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+CELERY_QUEUE_WAIT = Histogram(
+    "bookly_celery_queue_wait_seconds",
+    "Time between publishing a task and a worker starting it",
+    ["queue"],
+    buckets=(0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300),
+)
+
+SINGLE_FLIGHT_CALLS = Counter(
+    "bookly_single_flight_calls_total",
+    "Coalesced service calls by outcome: leader did the work, coalesced/remote "
+    "reused another caller's result in this or another worker",
+    ["name", "outcome"],
+)
+
+ADMISSION_LIMIT = Gauge(
+    "bookly_admission_limit",
+    "Current adaptive concurrency limit of each worker",
+    multiprocess_mode="livesum",
+)
+ADMISSION_IN_FLIGHT = Gauge(
+    "bookly_admission_in_flight",
+    "Requests admitted and still running",
+    multiprocess_mode="livesum",
+)
+ADMISSION_QUEUED = Gauge(
+    "bookly_admission_queued",
+    "Requests waiting for admission",
+    multiprocess_mode="livesum",
+)
+ADMISSION_SHED = Counter(
+    "bookly_admission_shed_total",
+    "Requests answered 503 by the admission controller",
+    ["priority", "reason"],
+)
+
+LOOP_LAG = Histogram(
+    "bookly_event_loop_lag_seconds",
+    "Delay between a scheduled event loop wake-up and when it actually ran",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+LOOP_STALLS = Counter(
+    "bookly_event_loop_stalls_total",
+    "Times a single callback blocked the event loop past the stall threshold",
+)
+
+metrics_router = APIRouter()
+
+
+def collector_registry():
+    if not MULTIPROCESS:
+        return REGISTRY
+
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+
+    return registry
+
+
+@metrics_router.get("/metrics", include_in_schema=False)
+@route_policy("priority", "critical")
+async def get_metrics():
+    return Response(
+        content=generate_latest(collector_registry()), media_type=CONTENT_TYPE_LATEST
+    )
+
+
+def start_worker_metrics_server(port: int) -> None:
+    """Serve /metrics from a Celery worker (prefork needs PROMETHEUS_MULTIPROC_DIR)"""
+
+    start_http_server(port, registry=collector_registry())
+
+
+@worker_shutdown.connect
+@worker_process_shutdown.connect
+def mark_process_dead(**kwargs) -> None:
+    """Drop this process's live gauge files from PROMETHEUS_MULTIPROC_DIR on exit"""
+
+    if MULTIPROCESS:
+        multiprocess.mark_process_dead(os.getpid())
+
+
+def instrument_pool(engine: AsyncEngine) -> None:
+    """Track connection pool usage through SQLAlchemy pool events"""
+
+    sync_engine = engine.sync_engine
+    size = getattr(sync_engine.pool, "size", None)
+
+    if size is not None:
+        DB_POOL_SIZE.set(size())
+
+    @event.listens_for(sync_engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        DB_POOL_CONNECTIONS.inc()
+
+    @event.listens_for(sync_engine, "close")
+    def on_close(dbapi_connection, connection_record):
+        DB_POOL_CONNECTIONS.dec()
+
+    @event.listens_for(sync_engine, "checkout")
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        DB_POOL_CHECKED_OUT.inc()
+        DB_POOL_CHECKOUTS.inc()
+
+    @event.listens_for(sync_engine, "checkin")
+    def on_checkin(dbapi_connection, connection_record):
+        DB_POOL_CHECKED_OUT.dec()
+
+
+@before_task_publish.connect
+def on_before_task_publish(sender=None, headers=None, **kwargs):
+    if headers and "id" in headers:
+        headers["published_at"] = time.time()
+
+
+@after_task_publish.connect
+def on_after_task_publish(sender=None, headers=None, **kwargs):
+    # Both publish signals get the same headers dict, so the start time rides
+    # along with the message instead of sitting in a module-level dict
+    published_at = (headers or {}).get("published_at")
+
+    if published_at is not None:
+        CELERY_PUBLISH_LATENCY.labels(sender).observe(
+            max(0.0, time.time() - published_at)
+        )
+
+
+_task_started = PendingSignals()
+
+
+def task_queue(task) -> str:
+    return (task.request.delivery_info or {}).get("routing_key") or "unknown"
+
+
+@task_prerun.connect
+def on_task_prerun(task_id=None, task=None, **kwargs):
+    _task_started[task_id] = time.perf_counter()
+    published_at = task.request.get("published_at")
+
+    # Retries and countdowns wait on purpose, so only first runs are counted
+    if published_at and not task.request.eta and not task.request.retries:
+        CELERY_QUEUE_WAIT.labels(task_queue(task)).observe(
+            max(0.0, time.time() - published_at)
+        )
+
+
+@task_postrun.connect
+def on_task_postrun(task_id=None, task=None, state=None, **kwargs):
+    started = _task_started.pop(task_id, None)
+    queue = task_queue(task)
+
+    CELERY_TASKS.labels(queue, task.name, state or "UNKNOWN").inc()
+
+    if started is not None:
+        CELERY_TASK_DURATION.labels(queue, task.name).observe(
+            time.perf_counter() - started
+        )
@@ -1,28 +1,755 @@
-from fastapi import FastAPI, status
-from fastapi.requests import Request
-from fastapi.responses import JSONResponse
+import asyncio
+import logging
+import random
+import time
+from urllib.parse import parse_qs
+
+import anyio
+from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
-import time
-import logging
+from fastapi.responses import ORJSONResponse
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.routing import Router
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.admission import Overloaded, admission_controller
+from src.admin.profiling import RequestProfiler, is_admin, new_profile_id, profile_store
+from src.cache import response_cache
+from src.compression import available_encoders, negotiate
+from src.config import Config
+from src.db.deadlines import ClientDisconnected, QueryGuard, query_guard
+from src.db.stats import RequestStats, request_stats
+from src.ratelimit import default_policy, rate_limit_headers, rate_limiter
+from src.routing import get_policy, match_route
+from src.tracing import span
+from src.metrics import REQUEST_LATENCY, REQUESTS_IN_FLIGHT, RESPONSE_SIZE
 
 logger = logging.getLogger("uvicorn.access")
 logger.disabled = True
 
+access_logger = logging.getLogger("bookly.access")
+
+
+class AccessLogMiddleware:
+    """Structured access log written from a pure ASGI wrapper.
+
+    Successful responses are sampled at `sample_rate`; errors and requests
+    slower than `slow_ms` are always logged.
+    """
+
+    def __init__(self, app: ASGIApp, sample_rate: float, slow_ms: float) -> None:
+        self.app = app
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter_ns()
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration_ms = (time.perf_counter_ns() - start) / 1_000_000
+
+            if (
+                status_code >= 400
+                or duration_ms >= self.slow_ms
+                or random.random() < self.sample_rate
+            ):
+                self.log(scope, status_code, duration_ms)
+
+    def log(self, scope: Scope, status_code: int, duration_ms: float) -> None:
+        client = scope.get("client") or ("-", 0)
+        stats = request_stats.get()
+
+        access_logger.info(
+            "%s %s %s",
+            scope["method"],
+            scope["path"],
+            status_code,
+            extra={
+                "fields": {
+                    "client": f"{client[0]}:{client[1]}",
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "status": status_code,
+                    "duration_ms": round(duration_ms, 3),
+                    "slow": duration_ms >= self.slow_ms,
+                    **(stats.log_fields() if stats is not None else {}),
+                }
+            },
+        )
+
+
+class RequestStatsMiddleware:
+    """Collect per-request SQL and phase timings and report them in `Server-Timing`.
+
+    The stats live in a context variable that the engine's cursor events and
+    `timed_phase` blocks write to; middleware running inside this one (the
+    access log) can read them back.
+    """
+
+    def __init__(self, app: ASGIApp, server_timing: bool) -> None:
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = request_stats.set(stats)
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start" and self.server_timing:
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", stats.server_timing())
+
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            request_stats.reset(token)
+
+
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+    "text/",
+)
+
+
+class CompressionMiddleware:
+    """Compress responses with the best encoding the client accepts.
+
+    Bodies sent in one message are compressed whole once they reach
+    `minimum_size`; streamed bodies are compressed chunk by chunk and flushed
+    as they go, so nothing is buffered. Chunks of at least `thread_threshold`
+    bytes are compressed in a worker thread to keep the event loop free.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int, thread_threshold: int) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.thread_threshold = thread_threshold
+        self.encoders = available_encoders()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        accept_encoding = Headers(scope=scope).get("accept-encoding", "")
+        encoding = negotiate(accept_encoding, self.encoders)
+
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        encoder_class, level = self.encoders[encoding]
+        start_message = None
+        encoder = None
+        passthrough = False
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal start_message, encoder, passthrough
+
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                content_type = headers.get("content-type", "")
+
+                if "content-encoding" in headers or not content_type.startswith(
+                    COMPRESSIBLE_TYPES
+                ):
+                    passthrough = True
+                    await send(message)
+                else:
+                    start_message = message
+
+                return
+
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if encoder is None:
+                headers = MutableHeaders(scope=start_message)
+                headers.add_vary_header("Accept-Encoding")
+
+                if not more_body and len(body) < self.minimum_size:
+                    passthrough = True
+                    await send(start_message)
+                    await send(message)
+                    return
+
+                encoder = encoder_class(level)
+                headers["Content-Encoding"] = encoding
+
+                if not more_body:
+                    body = await self.compress(encoder.finish, body)
+                    headers["Content-Length"] = str(len(body))
+                    await send(start_message)
+                    await send({"type": "http.response.body", "body": body})
+                    return
+
+                del headers["Content-Length"]
+                await send(start_message)
+
+            compress = encoder.chunk if more_body else encoder.finish
+            await send(
+                {
+                    "type": "http.response.body",
+                    "body": await self.compress(compress, body),
+                    "more_body": more_body,
+                }
+            )
+
+        await self.app(scope, receive, send_wrapper)
+
+    async def compress(self, compress, data: bytes) -> bytes:
+        if len(data) >= self.thread_threshold:
+            return await anyio.to_thread.run_sync(compress, data)
+
+        return compress(data)
+
+
+class TracingMiddleware:
+    """Open the server span for a request, continuing an incoming `traceparent`"""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        traceparent = Headers(scope=scope).get("traceparent")
+
+        with span(scope["method"], kind="server", traceparent=traceparent) as request_span:
+            if request_span is None:
+                await self.app(scope, receive, send)
+                return
+
+            async def send_wrapper(message: Message) -> None:
+                if message["type"] == "http.response.start":
+                    request_span.attributes["http.status_code"] = message["status"]
+                    MutableHeaders(scope=message).append(
+                        "traceparent", request_span.traceparent
+                    )
+
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                route = getattr(scope.get("route"), "path", scope["path"])
+                request_span.name = f"{scope['method']} {route}"
+                request_span.attributes["http.method"] = scope["method"]
+                request_span.attributes["http.route"] = route
+
+
+class QueryCancellationMiddleware:
+    """Cancel the database work of reads whose client has disconnected.
+
+    Only GET and HEAD are covered: cancelling a write halfway through could
+    skip work that has to follow its commit, such as sending an email.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] not in ("GET", "HEAD"):
+            await self.app(scope, receive, send)
+            return
+
+        guard = QueryGuard(asyncio.current_task())
+        messages: asyncio.Queue = asyncio.Queue()
+
+        async def listen() -> None:
+            while True:
+                message = await receive()
+                messages.put_nowait(message)
+
+                if message["type"] == "http.disconnect":
+                    guard.disconnect()
+                    return
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.body" and not message.get(
+                "more_body", False
+            ):
+                guard.finished = True
+
+            await send(message)
+
+        listener = asyncio.create_task(listen())
+        token = query_guard.set(guard)
+
+        try:
+            await self.app(scope, messages.get, send_wrapper)
+        except (asyncio.CancelledError, ClientDisconnected):
+            if not guard.disconnected:
+                raise
+
+            if guard.cancelled:
+                asyncio.current_task().uncancel()
+
+            access_logger.info(
+                "Client disconnected, cancelled queries for %s %s",
+                scope["method"],
+                scope["path"],
+            )
+        finally:
+            query_guard.reset(token)
+            listener.cancel()
+
+
+# Set on the scope of a request being profiled
+PROFILE_SCOPE_KEY = "bookly.profile_id"
+
+
+class ProfilingMiddleware:
+    """Profile a single request when an admin asks for it.
+
+    Sending `X-Profile: 1` or `?profile=1` with an admin access token runs the
+    request under the sampling profiler and stores the folded stacks; the id
+    comes back in `X-Profile-Id`. Non-admin flags are ignored, and profiles are
+    capped per minute across workers and to one at a time per worker. It sits
+    outside the response cache, which is skipped for a profiled request.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+        self.active = False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self.requested(scope):
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+
+        if not await is_admin(headers.get("authorization")):
+            await self.app(scope, receive, send)
+            return
+
+        if self.active:
+            await self.app(scope, receive, self.with_header(send, "X-Profile-Status", "busy"))
+            return
+
+        self.active = True
+
+        try:
+            await self.profile(scope, receive, send)
+        finally:
+            self.active = False
+
+    async def profile(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            acquired = await profile_store.acquire_slot()
+        except Exception:
+            access_logger.exception("Profile quota unavailable, not profiling")
+            acquired = False
+
+        if not acquired:
+            await self.app(
+                scope, receive, self.with_header(send, "X-Profile-Status", "rate-limited")
+            )
+            return
+
+        profile_id = new_profile_id()
+        scope[PROFILE_SCOPE_KEY] = profile_id
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                MutableHeaders(scope=message).append("X-Profile-Id", profile_id)
+
+            await send(message)
+
+        profiler = RequestProfiler(
+            interval=Config.PROFILE_INTERVAL_MS / 1000,
+            max_seconds=Config.PROFILE_MAX_SECONDS,
+        )
+        start = time.perf_counter()
+        profiler.start()
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            profiler.stop()
+
+            try:
+                await profile_store.save(
+                    profile_id,
+                    {
+                        "uid": profile_id,
+                        "method": scope["method"],
+                        "path": scope["path"],
+                        "status": status_code,
+                        "duration_ms": round((time.perf_counter() - start) * 1000, 3),
+                        "samples": sum(profiler.stacks.values()),
+                        "created_at": time.time(),
+                    },
+                    profiler.folded(),
+                )
+            except Exception:
+                access_logger.exception("Could not store profile %s", profile_id)
+
+    @staticmethod
+    def requested(scope: Scope) -> bool:
+        for name, value in scope["headers"]:
+            if name == b"x-profile":
+                return value == b"1"
+
+        query = scope.get("query_string", b"")
+
+        return b"profile=" in query and parse_qs(query.decode()).get("profile") == ["1"]
+
+    @staticmethod
+    def with_header(send: Send, name: str, value: str) -> Send:
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).append(name, value)
+
+            await send(message)
+
+        return send_wrapper
+
+
+class ResponseCacheMiddleware:
+    """Serve opted-in GET routes from the shared Redis response cache.
+
+    The lookup happens before routing, so a hit skips dependencies, the DB
+    session and serialization. On a hit the access token is checked
+    (signature, expiry, blocklist) and the account must be verified; the vary
+    claims come from the token.
+    """
+
+    def __init__(self, app: ASGIApp, router: Router, max_bytes: int) -> None:
+        self.app = app
+        self.router = router
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] not in ("GET", "HEAD"):
+            await self.app(scope, receive, send)
+            return
+
+        route, path_params = match_route(self.router, scope)
+        policy = get_policy(route, "cache")
+
+        if policy is None or PROFILE_SCOPE_KEY in scope:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            vary_values = await response_cache.vary_values(
+                Headers(scope=scope).get("authorization"), policy.vary
+            )
+
+            if vary_values is None:
+                await self.app(scope, receive, send)
+                return
+
+            key = await response_cache.entry_key(
+                policy, route.path, path_params, scope["query_string"], vary_values
+            )
+            cached = await response_cache.get(key)
+        except Exception:
+            access_logger.exception("Response cache lookup failed")
+            await self.app(scope, receive, send)
+            return
+
+        cache_control = f"private, max-age={policy.ttl}"
+
+        if cached is not None:
+            scope["route"] = route
+            await self.send_cached(scope, send, cached, cache_control)
+            return
+
+        await self.app(scope, receive, self.storing(scope, send, key, policy, cache_control))
+
+    async def send_cached(self, scope: Scope, send: Send, cached, cache_control: str) -> None:
+        status_code, headers, body, stored_at = cached
+
+        response_headers = MutableHeaders(
+            raw=[(name.encode("latin-1"), value.encode("latin-1")) for name, value in headers]
+        )
+        response_headers["Cache-Control"] = cache_control
+        response_headers["Age"] = str(max(int(time.time() - stored_at), 0))
+        response_headers["X-Cache"] = "HIT"
+
+        await send(
+            {
+                "type": "http.response.start",
+                "status": status_code,
+                "headers": response_headers.raw,
+            }
+        )
+        await send(
+            {
+                "type": "http.response.body",
+                "body": b"" if scope["method"] == "HEAD" else body,
+            }
+        )
+
+    def storing(self, scope: Scope, send: Send, key: str, policy, cache_control: str) -> Send:
+        start_message = None
+        chunks = []
+        size = 0
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal start_message, size
+
+            if message["type"] == "http.response.start":
+                start_message = message
+                headers = MutableHeaders(scope=message)
+
+                if message["status"] == 200:
+                    headers["Cache-Control"] = cache_control
+                    headers["X-Cache"] = "MISS"
+            elif message["type"] == "http.response.body" and start_message is not None:
+                chunks.append(message.get("body", b""))
+                size += len(chunks[-1])
+
+                if (
+                    not message.get("more_body", False)
+                    and start_message["status"] == 200
+                    and scope["method"] == "GET"
+                    and size <= self.max_bytes
+                ):
+                    headers = [
+                        (name.decode("latin-1"), value.decode("latin-1"))
+                        for name, value in start_message["headers"]
+                        if name not in (b"cache-control", b"x-cache")
+                        and not name.startswith(b"x-profile-")
+                    ]
+
+                    try:
+                        await response_cache.set(
+                            key, 200, headers, b"".join(chunks), policy.ttl
+                        )
+                    except Exception:
+                        access_logger.exception("Could not store cached response")
+
+            await send(message)
+
+        return send_wrapper
+
+
+class RateLimitMiddleware:
+    """Apply the route's rate limit (or the default one) before routing"""
+
+    def __init__(self, app: ASGIApp, router: Router) -> None:
+        self.app = app
+        self.router = router
+        self.default_policy = default_policy()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        route, _ = match_route(self.router, scope)
+        policy = get_policy(route, "rate_limit")
+
+        if policy is None:
+            policy = self.default_policy
+            route_key = policy.scope
+        else:
+            route_key = f"{scope['method']}:{route.path}"
+
+        identity, role = rate_limiter.identity(
+            policy, scope, Headers(scope=scope).get("authorization")
+        )
+
+        try:
+            decision = await rate_limiter.check(policy, route_key, identity, role)
+        except Exception:
+            access_logger.exception("Rate limiter unavailable, letting request through")
+            await self.app(scope, receive, send)
+            return
+
+        headers = rate_limit_headers(decision)
+
+        if not decision.allowed:
+            response = ORJSONResponse(
+                {
+                    "message": "Too many requests",
+                    "resolution": "Please retry after the time in Retry-After",
+                    "error_code": "rate_limited",
+                },
+                status_code=429,
+                headers=dict(headers),
+            )
+            await response(scope, receive, send)
+            return
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                response_headers = MutableHeaders(scope=message)
+
+                for name, value in headers:
+                    response_headers[name] = value
+
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+
+class AdmissionMiddleware:
+    """Admit requests through the adaptive concurrency limit or shed them with a 503"""
+
+    def __init__(self, app: ASGIApp, router: Router) -> None:
+        self.app = app
+        self.router = router
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        route, _ = match_route(self.router, scope)
+        priority = get_policy(route, "priority") or "normal"
+
+        try:
+            await admission_controller.acquire(priority)
+        except Overloaded:
+            response = ORJSONResponse(
+                {
+                    "message": "Server is overloaded",
+                    "resolution": "Please retry after the time in Retry-After",
+                    "error_code": "overloaded",
+                },
+                status_code=503,
+                headers={"Retry-After": str(Config.ADMISSION_RETRY_AFTER_SECONDS)},
+            )
+            await response(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        latency = None
+
+        try:
+            await self.app(scope, receive, send)
+            latency = time.perf_counter() - start
+        finally:
+            admission_controller.release(latency)
+
+
+class MetricsMiddleware:
+    """Record Prometheus request metrics labelled by route template.
+
+    The router stores the matched route in the shared scope, so once the app
+    returns `scope["route"].path` gives e.g. `/api/v1/books/{book_uid}`
+    instead of one label per book.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        start = time.perf_counter()
+        status_code = 500
+        body_size = 0
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code, body_size
+
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body":
+                body_size += len(message.get("body", b""))
+
+            await send(message)
+
+        in_flight = REQUESTS_IN_FLIGHT.labels(method)
+        in_flight.inc()
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            in_flight.dec()
+
+            route = scope.get("route")
+            template = getattr(route, "path", "unmatched")
+
+            REQUEST_LATENCY.labels(method, template, status_code).observe(
+                time.perf_counter() - start
+            )
+            RESPONSE_SIZE.labels(method, template).observe(body_size)
+
 
 def register_middleware(app: FastAPI):
 
-    @app.middleware("http")
-    async def custom_logging(request: Request, call_next):
-        start_time = time.time()
+    app.add_middleware(QueryCancellationMiddleware)
 
-        response = await call_next(request)
-        processing_time = time.time() - start_time
+    if Config.RESPONSE_CACHE_ENABLED:
+        app.add_middleware(
+            ResponseCacheMiddleware,
+            router=app.router,
+            max_bytes=Config.RESPONSE_CACHE_MAX_BYTES,
+        )
+
+    app.add_middleware(ProfilingMiddleware)
+
+    if Config.RATE_LIMIT_ENABLED:
+        app.add_middleware(RateLimitMiddleware, router=app.router)
+
+    if Config.ADMISSION_ENABLED:
+        app.add_middleware(AdmissionMiddleware, router=app.router)
+
+    app.add_middleware(MetricsMiddleware)
+
+    app.add_middleware(
+        AccessLogMiddleware,
+        sample_rate=Config.ACCESS_LOG_SAMPLE_RATE,
+        slow_ms=Config.ACCESS_LOG_SLOW_MS,
+    )
+
+    app.add_middleware(
+        RequestStatsMiddleware, server_timing=Config.SERVER_TIMING_ENABLED
+    )
 
-        message = f"{request.client.host}:{request.client.port} - {request.method} - {request.url.path} - {response.status_code} completed after {processing_time}s"
+    app.add_middleware(TracingMiddleware)
 
-        print(message)
-        return response
+    if Config.COMPRESSION_ENABLED:
+        app.add_middleware(
+            CompressionMiddleware,
+            minimum_size=Config.COMPRESSION_MIN_SIZE,
+            thread_threshold=Config.COMPRESSION_THREAD_THRESHOLD,
+        )
 
     app.add_middleware(
         CORSMiddleware,
@@ -0,0 +1,205 @@
+import logging
+import math
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Sequence, Tuple
+
+import jwt
+
+from src.config import Config
+from src.db.redis import redis_client
+from src.routing import route_policy
+
+logger = logging.getLogger("bookly.ratelimit")
+
+BUCKET_KEY = "bookly:ratelimit:{}:{}"
+
+# Token bucket refilled continuously at `rate` tokens per second up to `burst`.
+# The caller asks for up to `requested` tokens; while the bucket is more than
+# half full it gets them all (a local reservation), otherwise just one.
+# Returns {granted, tokens left, ms until the next token}.
+TOKEN_BUCKET_LUA = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local requested = tonumber(ARGV[3])
+local time = redis.call("TIME")
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+
+local state = redis.call("HMGET", KEYS[1], "tokens", "ts")
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+
+tokens = math.min(burst, tokens + math.max(0, now - ts) / 1000 * rate)
+
+if tokens < burst / 2 then
+    requested = 1
+end
+
+local granted = math.min(requested, math.floor(tokens))
+tokens = tokens - granted
+
+redis.call("HSET", KEYS[1], "tokens", tostring(tokens), "ts", now)
+redis.call("PEXPIRE", KEYS[1], math.ceil(burst / rate * 1000) + 1000)
+
+local retry_after = 0
+if tokens < 1 then
+    retry_after = math.ceil((1 - tokens) / rate * 1000)
+end
+
+return {granted, tostring(tokens), retry_after}
+"""
+
+token_bucket = redis_client.register_script(TOKEN_BUCKET_LUA)
+
+
+class RateLimitPolicy:
+    """Requests per minute and burst for a route, optionally per role.
+
+    `by` picks the bucket identity: the JWT `user_uid` (falling back to the
+    client IP for anonymous callers) or always the client IP.
+    """
+
+    def __init__(
+        self,
+        per_minute: int,
+        burst: int,
+        roles: Optional[Dict[str, int]] = None,
+        by: str = "user",
+        scope: Optional[str] = None,
+    ) -> None:
+        self.per_minute = per_minute
+        self.burst = burst
+        self.roles = roles or {}
+        self.by = by
+        self.scope = scope
+
+    def limits(self, role: Optional[str]) -> Tuple[int, int]:
+        per_minute = self.roles.get(role, self.per_minute)
+
+        return per_minute, max(1, round(self.burst * per_minute / self.per_minute))
+
+
+def rate_limit(
+    per_minute: int,
+    burst: int,
+    roles: Optional[Dict[str, int]] = None,
+    by: str = "user",
+):
+    """Give a route its own rate limit instead of the default one"""
+
+    return route_policy("rate_limit", RateLimitPolicy(per_minute, burst, roles, by))
+
+
+def default_policy() -> RateLimitPolicy:
+    return RateLimitPolicy(
+        Config.RATE_LIMIT_PER_MINUTE,
+        Config.RATE_LIMIT_BURST,
+        roles=Config.RATE_LIMIT_ROLE_PER_MINUTE,
+        scope="default",
+    )
+
+
+class Decision:
+    __slots__ = ("allowed", "limit", "remaining", "retry_after")
+
+    def __init__(self, allowed: bool, limit: int, remaining: int, retry_after: float) -> None:
+        self.allowed = allowed
+        self.limit = limit
+        self.remaining = remaining
+        self.retry_after = retry_after
+
+
+class RateLimiter:
+    """Token buckets in Redis with per-worker reservations.
+
+    A caller well under its limit is handed a small batch of tokens that this
+    worker spends locally for up to RATE_LIMIT_RESERVE_MS, so most of their
+    requests never touch Redis. Near the limit every request goes to Redis.
+    """
+
+    def __init__(self, max_reservations: int = 10_000) -> None:
+        self.reservations: "OrderedDict[str, list]" = OrderedDict()
+        self.max_reservations = max_reservations
+
+    def identity(self, policy: RateLimitPolicy, scope, authorization: Optional[str]):
+        """Return (bucket identity, role) for the request"""
+
+        role = None
+        identity = None
+        scheme, _, token = (authorization or "").partition(" ")
+
+        if scheme.lower() == "bearer" and token:
+            try:
+                # Only identifies the caller; auth itself happens in the route
+                claims = jwt.decode(
+                    token, key=Config.JWT_SECRET, algorithms=[Config.JWT_ALGORITHM]
+                )
+                role = claims["user"].get("role")
+                identity = f"user:{claims['user']['user_uid']}"
+            except (jwt.PyJWTError, KeyError, TypeError):
+                pass
+
+        if identity is None or policy.by == "ip":
+            identity = f"ip:{client_ip(scope)}"
+
+        return identity, role
+
+    async def check(self, policy: RateLimitPolicy, route_key: str, identity: str, role):
+        per_minute, burst = policy.limits(role)
+        key = BUCKET_KEY.format(route_key, identity)
+        now = time.monotonic()
+
+        reservation = self.reservations.get(key)
+
+        if reservation is not None and reservation[0] > 0 and reservation[1] > now:
+            reservation[0] -= 1
+            return Decision(True, burst, int(reservation[2]) + reservation[0], 0)
+
+        batch = max(1, burst // Config.RATE_LIMIT_RESERVE_FRACTION)
+        granted, tokens, retry_after_ms = await token_bucket(
+            keys=[key], args=[per_minute / 60, burst, batch]
+        )
+        tokens = float(tokens)
+
+        if granted < 1:
+            return Decision(False, burst, 0, retry_after_ms / 1000)
+
+        if granted > 1:
+            self.reserve(key, [granted - 1, now + Config.RATE_LIMIT_RESERVE_MS / 1000, tokens])
+        else:
+            self.reservations.pop(key, None)
+
+        return Decision(True, burst, int(tokens) + granted - 1, 0)
+
+    def reserve(self, key: str, reservation: list) -> None:
+        self.reservations[key] = reservation
+        self.reservations.move_to_end(key)
+
+        while len(self.reservations) > self.max_reservations:
+            self.reservations.popitem(last=False)
+
+
+def client_ip(scope) -> str:
+    if Config.RATE_LIMIT_TRUST_FORWARDED:
+        for name, value in scope["headers"]:
+            if name == b"x-forwarded-for":
+                return value.decode("latin-1").split(",")[0].strip()
+
+    client = scope.get("client")
+
+    return client[0] if client else "unknown"
+
+
+def rate_limit_headers(decision: Decision) -> Sequence[Tuple[str, str]]:
+    headers = [
+        ("X-RateLimit-Limit", str(decision.limit)),
+        ("X-RateLimit-Remaining", str(max(decision.remaining, 0))),
+    ]
+
+    if not decision.allowed:
+        headers.append(("Retry-After", str(max(1, math.ceil(decision.retry_after)))))
+
+    return headers
+
+
+rate_limiter = RateLimiter()
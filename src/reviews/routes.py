@@ -1,7 +1,10 @@
 from fastapi import APIRouter, Depends, status
 from sqlmodel.ext.asyncio.session import AsyncSession
 
+from src.admission import admission_priority
 from src.auth.dependencies import RoleChecker, get_current_user
+from src.db.bulkhead import db_bulkhead
+from src.db.deadlines import statement_timeout
 from src.db.main import get_session
 from src.db.models import User
 
@@ -15,6 +18,9 @@ user_role_checker = Depends(RoleChecker(["user", "admin"]))
 
 
 @review_router.get("/", dependencies=[admin_role_checker])
+@admission_priority("low")
+@db_bulkhead("admin")
+@statement_timeout(15000)
 async def get_all_reviews(session: AsyncSession = Depends(get_session)):
     books = await review_service.get_all_reviews(session)
 
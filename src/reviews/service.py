@@ -1,13 +1,17 @@
 import logging
+from datetime import datetime, timedelta
 
 from fastapi import status
 from fastapi.exceptions import HTTPException
-from sqlmodel import desc, select
+from sqlmodel import delete, desc, select
 from sqlmodel.ext.asyncio.session import AsyncSession
 
 from src.auth.service import UserService
+from src.books.documents import book_document_service
 from src.books.service import BookService
-from src.db.models import Review
+from src.cache import book_key, response_cache
+from src.db.models import Book, Review
+from src.tracing import traced_service
 
 from .schemas import ReviewCreateModel
 
@@ -15,6 +19,7 @@ book_service = BookService()
 user_service = UserService()
 
 
+@traced_service
 class ReviewService:
     async def add_review_to_book(
         self,
@@ -47,7 +52,10 @@ class ReviewService:
 
             session.add(new_review)
 
+            await book_document_service.rebuild(book.uid, session)
+
             await session.commit()
+            await response_cache.invalidate(book_key(book.uid))
 
             return new_review
 
@@ -59,14 +67,21 @@ class ReviewService:
             )
 
     async def get_review(self, review_uid: str, session: AsyncSession):
-        statement = select(Review).where(Review.uid == review_uid)
+        statement = select(Review).where(
+            Review.uid == review_uid, Review.deleted_at.is_(None)
+        )
 
         result = await session.exec(statement)
 
         return result.first()
 
     async def get_all_reviews(self, session: AsyncSession):
-        statement = select(Review).order_by(desc(Review.created_at))
+        statement = (
+            select(Review)
+            .outerjoin(Book, Book.uid == Review.book_uid)
+            .where(Review.deleted_at.is_(None), Book.deleted_at.is_(None))
+            .order_by(desc(Review.created_at))
+        )
 
         result = await session.exec(statement)
 
@@ -85,6 +100,35 @@ class ReviewService:
                 status_code=status.HTTP_403_FORBIDDEN,
             )
 
+        review.deleted_at = datetime.now()
+
         session.add(review)
 
+        await book_document_service.rebuild(review.book_uid, session)
+
+        await session.commit()
+        await response_cache.invalidate(book_key(review.book_uid))
+
+    async def purge_deleted_reviews(
+        self, batch_size: int, grace: timedelta, session: AsyncSession
+    ) -> int:
+        """Hard delete a batch of tombstoned reviews"""
+
+        batch = (
+            select(Review.uid)
+            .where(Review.deleted_at < datetime.now() - grace)
+            .order_by(Review.deleted_at)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+
+        result = await session.exec(
+            delete(Review).where(Review.uid.in_(batch)).returning(Review.uid)
+        )
+
+        purged = len(result.all())
+
         await session.commit()
+
+        return purged
@@ -0,0 +1,40 @@
+from typing import Any, Dict, Optional, Tuple
+
+from starlette.routing import BaseRoute, Match, Router
+from starlette.types import Scope
+
+
+def route_policy(name: str, value: Any):
+    """Attach a policy to a route endpoint for middleware to read before routing.
+
+    Apply it below the router decorator so the router registers the
+    decorated function:
+
+        @book_router.get("/")
+        @route_policy("cache", CachePolicy(ttl=30))
+        async def get_all_books(...): ...
+    """
+
+    def decorator(endpoint):
+        setattr(endpoint, f"__{name}_policy__", value)
+        return endpoint
+
+    return decorator
+
+
+def get_policy(route: Optional[BaseRoute], name: str) -> Any:
+    endpoint = getattr(route, "endpoint", None)
+
+    return getattr(endpoint, f"__{name}_policy__", None)
+
+
+def match_route(router: Router, scope: Scope) -> Tuple[Optional[BaseRoute], Dict[str, Any]]:
+    """Find the route the router will dispatch `scope` to, without dispatching it"""
+
+    for route in router.routes:
+        match, child_scope = route.matches(scope)
+
+        if match == Match.FULL:
+            return route, child_scope.get("path_params", {})
+
+    return None, {}
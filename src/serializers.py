@@ -0,0 +1,89 @@
+import typing
+from functools import cache
+from typing import Any, Callable, Iterable, List, Type
+
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel
+
+from src.db.stats import timed_phase
+
+
+class Serializer:
+    """Precompiled encoder turning ORM objects into JSON-ready dicts for a schema.
+
+    The generated function reads the schema's fields straight off the object
+    and leaves UUID, date and datetime values to orjson, so the response skips
+    the model_validate / jsonable_encoder / json.dumps round trip that
+    `response_model` would otherwise do.
+    """
+
+    def __init__(self, model: Type[BaseModel]) -> None:
+        self.model = model
+        self.encode: Callable[[Any], dict] = self._compile()
+
+    def _compile(self) -> Callable[[Any], dict]:
+        namespace = {}
+        items = []
+
+        for name, field in self.model.model_fields.items():
+            if field.exclude:
+                continue
+
+            nested, many = _nested_model(field.annotation)
+
+            if nested is None:
+                items.append(f"{name!r}: obj.{name}")
+                continue
+
+            namespace[f"encode_{name}"] = compile_serializer(nested).encode
+
+            if many:
+                items.append(f"{name!r}: [encode_{name}(o) for o in obj.{name}]")
+            else:
+                value = f"obj.{name}"
+                items.append(
+                    f"{name!r}: None if {value} is None else encode_{name}({value})"
+                )
+
+        source = "def encode(obj):\n    return {%s}\n" % ", ".join(items)
+
+        exec(compile(source, f"<serializer {self.model.__name__}>", "exec"), namespace)
+
+        return namespace["encode"]
+
+    def encode_many(self, objs: Iterable[Any]) -> List[dict]:
+        encode = self.encode
+
+        return [encode(obj) for obj in objs]
+
+    def response(self, obj: Any, status_code: int = 200) -> ORJSONResponse:
+        with timed_phase("serialization"):
+            return ORJSONResponse(content=self.encode(obj), status_code=status_code)
+
+    def list_response(self, objs: Iterable[Any]) -> ORJSONResponse:
+        with timed_phase("serialization"):
+            return ORJSONResponse(content=self.encode_many(objs))
+
+
+def _nested_model(annotation):
+    """Return (model, is_list) when a field holds nested schema objects"""
+
+    origin = typing.get_origin(annotation)
+    args = [arg for arg in typing.get_args(annotation) if arg is not type(None)]
+
+    if origin in (list, List) and args:
+        nested, _ = _nested_model(args[0])
+        return nested, True
+
+    if origin is typing.Union and len(args) == 1:
+        return _nested_model(args[0])
+
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return annotation, False
+
+    return None, False
+
+
+@cache
+def compile_serializer(model: Type[BaseModel]) -> Serializer:
+    return Serializer(model)
@@ -0,0 +1,170 @@
+import asyncio
+import functools
+import logging
+from typing import Any, Awaitable, Callable, Dict
+
+import orjson
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.config import Config
+from src.db.deadlines import ClientDisconnected
+from src.db.redis import redis_client
+from src.metrics import SINGLE_FLIGHT_CALLS
+
+logger = logging.getLogger("bookly.singleflight")
+
+LOCK_KEY = "bookly:singleflight:lock:{}"
+RESULT_KEY = "bookly:singleflight:result:{}"
+
+
+class LeaderCancelled(Exception):
+    """The caller doing the work was cancelled or its client went away; waiters
+    run the call themselves"""
+
+
+class SingleFlight:
+    """Share one in-flight call between concurrent callers with the same key.
+
+    With `distributed` the leader also takes a Redis lock and publishes its
+    result for a short time, so callers in other workers wait for it instead
+    of repeating the work. Distributed results must be JSON-serializable;
+    None is never published, so a miss is always looked up again.
+    """
+
+    def __init__(self, name: str, distributed: bool = False) -> None:
+        self.name = name
+        self.distributed = distributed
+        self.calls: Dict[str, asyncio.Future] = {}
+
+    async def do(self, key: str, call: Callable[[], Awaitable[Any]]) -> Any:
+        future = self.calls.get(key)
+
+        if future is not None:
+            SINGLE_FLIGHT_CALLS.labels(self.name, "coalesced").inc()
+
+            try:
+                return await asyncio.shield(future)
+            except LeaderCancelled:
+                return await call()
+
+        future = asyncio.get_running_loop().create_future()
+        self.calls[key] = future
+
+        try:
+            if self.distributed:
+                result = await self.do_distributed(key, call)
+            else:
+                SINGLE_FLIGHT_CALLS.labels(self.name, "leader").inc()
+                result = await call()
+        except (asyncio.CancelledError, ClientDisconnected):
+            # Both are about the leader's own request, not the call itself
+            future.set_exception(LeaderCancelled())
+            raise
+        except Exception as exc:
+            future.set_exception(exc)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self.calls[key]
+
+            if future.done() and not future.cancelled():
+                # Mark any exception retrieved in case nobody was waiting for it
+                future.exception()
+
+    async def do_distributed(self, key: str, call: Callable[[], Awaitable[Any]]) -> Any:
+        result_key = RESULT_KEY.format(key)
+        lock_key = LOCK_KEY.format(key)
+
+        try:
+            published = await redis_client.get(result_key)
+
+            if published is not None:
+                SINGLE_FLIGHT_CALLS.labels(self.name, "remote").inc()
+                return orjson.loads(published)
+
+            leader = await redis_client.set(
+                lock_key, 1, nx=True, px=Config.SINGLE_FLIGHT_LOCK_MS
+            )
+        except Exception:
+            logger.exception("Single-flight lock unavailable for %s", self.name)
+            SINGLE_FLIGHT_CALLS.labels(self.name, "leader").inc()
+            return await call()
+
+        if leader:
+            SINGLE_FLIGHT_CALLS.labels(self.name, "leader").inc()
+
+            try:
+                result = await call()
+
+                if result is not None:
+                    await redis_client.set(
+                        result_key,
+                        orjson.dumps(result),
+                        px=Config.SINGLE_FLIGHT_RESULT_TTL_MS,
+                    )
+
+                return result
+            finally:
+                await redis_client.delete(lock_key)
+
+        return await self.wait_for_remote(result_key, lock_key, call)
+
+    async def wait_for_remote(self, result_key: str, lock_key: str, call) -> Any:
+        delay = 0.005
+        waited = 0.0
+
+        while waited * 1000 < Config.SINGLE_FLIGHT_LOCK_MS:
+            await asyncio.sleep(delay)
+            waited += delay
+            delay = min(delay * 2, 0.05)
+
+            published, locked = await redis_client.mget(result_key, lock_key)
+
+            if published is not None:
+                SINGLE_FLIGHT_CALLS.labels(self.name, "remote").inc()
+                return orjson.loads(published)
+
+            if locked is None:
+                break
+
+        # The remote leader failed or took too long: do the work here
+        SINGLE_FLIGHT_CALLS.labels(self.name, "fallback").inc()
+        return await call()
+
+
+def call_key(args, kwargs) -> str:
+    """Key a call by its arguments, ignoring `self` and the DB session"""
+
+    parts = [repr(arg) for arg in args[1:] if not isinstance(arg, AsyncSession)]
+    parts.extend(
+        f"{name}={value!r}"
+        for name, value in sorted(kwargs.items())
+        if not isinstance(value, AsyncSession)
+    )
+
+    return ",".join(parts)
+
+
+def single_flight(distributed: bool = False):
+    """Coalesce concurrent identical calls to an async service method"""
+
+    def decorator(func):
+        flight = SingleFlight(func.__qualname__, distributed=distributed)
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            if not Config.SINGLE_FLIGHT_ENABLED:
+                return await func(*args, **kwargs)
+
+            return await flight.do(
+                f"{func.__qualname__}({call_key(args, kwargs)})",
+                lambda: func(*args, **kwargs),
+            )
+
+        wrapper.flight = flight
+
+        return wrapper
+
+    return decorator
@@ -1,26 +1,53 @@
-from typing import List
+import uuid
+from typing import List, Literal, Optional
 
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, Query, status
+from fastapi.responses import ORJSONResponse
 from sqlmodel.ext.asyncio.session import AsyncSession
 
 
 from src.auth.dependencies import RoleChecker
-from src.books.schemas import Book
+from src.books.schemas import Book, BookPageModel
+from src.cache import cache_response
+from src.config import Config
+from src.db.deadlines import statement_timeout
 from src.db.main import get_session
+from src.serializers import compile_serializer
 
-from .schemas import TagAddModel, TagCreateModel, TagModel
+from .schemas import TagAddModel, TagCreateModel, TagModel, TagSuggestionModel
 from .service import TagService
 
 tags_router = APIRouter()
 tag_service = TagService()
 user_role_checker = Depends(RoleChecker(["user", "admin"]))
+tag_serializer = compile_serializer(TagModel)
+book_serializer = compile_serializer(Book)
 
 
 @tags_router.get("/", response_model=List[TagModel], dependencies=[user_role_checker])
-async def get_all_tags(session: AsyncSession = Depends(get_session)):
-    tags = await tag_service.get_tags(session)
+@cache_response(ttl=60, surrogate_keys=["tags"])
+async def get_all_tags(
+    sort: Literal["recent", "popular"] = "recent",
+    session: AsyncSession = Depends(get_session),
+):
+    tags = await tag_service.get_tags(session, sort=sort)
+
+    return tag_serializer.list_response(tags)
+
+
+@tags_router.get(
+    "/suggest",
+    response_model=List[TagSuggestionModel],
+    dependencies=[user_role_checker],
+)
+async def suggest_tags(
+    prefix: str = Query(min_length=1, max_length=50),
+    limit: int = Query(default=10, ge=1, le=Config.TAG_SUGGEST_MAX_LIMIT),
+    session: AsyncSession = Depends(get_session),
+):
+    suggestions = await tag_service.suggest_tags(prefix, limit, session)
 
-    return tags
+    return suggestions
 
 
 @tags_router.post(
@@ -52,6 +79,38 @@ async def add_tags_to_book(
     return book_with_tag
 
 
+@tags_router.delete(
+    "/book/{book_uid}/tags/{tag_uid}",
+    status_code=status.HTTP_204_NO_CONTENT,
+    dependencies=[user_role_checker],
+)
+async def remove_tag_from_book(
+    book_uid: str, tag_uid: str, session: AsyncSession = Depends(get_session)
+) -> None:
+    await tag_service.remove_tag_from_book(book_uid, tag_uid, session)
+
+
+@tags_router.get(
+    "/{tag_uid}/books", response_model=BookPageModel, dependencies=[user_role_checker]
+)
+@cache_response(ttl=30, surrogate_keys=["tags", "books"])
+@statement_timeout(5000)
+async def get_tag_books(
+    tag_uid: uuid.UUID,
+    limit: int = Query(default=20, ge=1, le=100),
+    after: Optional[uuid.UUID] = None,
+    session: AsyncSession = Depends(get_session),
+):
+    page = await tag_service.get_tag_books(tag_uid, limit, after, session)
+
+    return ORJSONResponse(
+        {
+            "books": book_serializer.encode_many(page["books"]),
+            "next_cursor": page["next_cursor"],
+        }
+    )
+
+
 @tags_router.put(
     "/{tag_uid}", response_model=TagModel, dependencies=[user_role_checker]
 )
@@ -8,6 +8,7 @@ from pydantic import BaseModel
 class TagModel(BaseModel):
     uid: uuid.UUID
     name: str
+    book_count: int
     created_at: datetime
 
 
@@ -17,3 +18,9 @@ class TagCreateModel(BaseModel):
 
 class TagAddModel(BaseModel):
     tags: List[TagCreateModel]
+
+
+class TagSuggestionModel(BaseModel):
+    uid: uuid.UUID
+    name: str
+    book_count: int
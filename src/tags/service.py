@@ -1,12 +1,24 @@
+import uuid
+
 from fastapi import status
 from fastapi.exceptions import HTTPException
-from sqlmodel import desc, select
+from typing import Optional
+
+from sqlalchemy.orm import noload
+from sqlmodel import delete, desc, select, update
 from sqlmodel.ext.asyncio.session import AsyncSession
 
+from src.books.documents import book_document_service
 from src.books.service import BookService
-from src.db.models import Tag
+from src.cache import book_key, response_cache
+from src.config import Config
+from src.db import fastpath
+from src.db.models import Book, BookTag, Tag
+from src.singleflight import single_flight
+from src.tracing import traced_service
 
 from .schemas import TagAddModel, TagCreateModel
+from .suggest import search_tags_in_db, tag_suggest_index
 from src.errors import BookNotFound, TagNotFound, TagAlreadyExists
 
 book_service = BookService()
@@ -17,17 +29,36 @@ server_error = HTTPException(
 )
 
 
+@traced_service
 class TagService:
 
-    async def get_tags(self, session: AsyncSession):
-        """Get all tags"""
+    @single_flight()
+    async def get_tags(self, session: AsyncSession, sort: str = "recent"):
+        """Get all tags, newest or most popular first"""
 
-        statement = select(Tag).order_by(desc(Tag.created_at))
+        if Config.DB_FAST_PATH:
+            return await fastpath.fetch_tags(session, sort)
+
+        if sort == "popular":
+            statement = select(Tag).order_by(desc(Tag.book_count), desc(Tag.created_at))
+        else:
+            statement = select(Tag).order_by(desc(Tag.created_at))
 
         result = await session.exec(statement)
 
         return result.all()
 
+    async def suggest_tags(self, prefix: str, limit: int, session: AsyncSession):
+        """Suggest the most popular tags starting with a prefix"""
+
+        if not tag_suggest_index.ready:
+            await tag_suggest_index.load(session)
+
+        if tag_suggest_index.oversized:
+            return await search_tags_in_db(prefix, limit, session)
+
+        return tag_suggest_index.search(prefix, limit)
+
     async def add_tags_to_book(
         self, book_uid: str, tag_data: TagAddModel, session: AsyncSession
     ):
@@ -38,19 +69,110 @@ class TagService:
         if not book:
             raise BookNotFound()
 
-        for tag_item in tag_data.tags:
-            result = await session.exec(select(Tag).where(Tag.name == tag_item.name))
+        names = list(dict.fromkeys(tag_item.name for tag_item in tag_data.tags))
 
-            tag = result.one_or_none()
-            if not tag:
-                tag = Tag(name=tag_item.name)
+        result = await session.exec(select(Tag).where(Tag.name.in_(names)))
+
+        existing_tags = {tag.name: tag for tag in result.all()}
+        already_linked = {tag.uid for tag in book.tags}
+
+        linked_tags = []
+
+        for name in names:
+            tag = existing_tags.get(name)
+
+            if tag is None:
+                tag = Tag(name=name, book_count=1)
+            elif tag.uid in already_linked:
+                continue
 
             book.tags.append(tag)
+            linked_tags.append(tag)
+
+        incremented = [tag.uid for tag in linked_tags if tag.name in existing_tags]
+
+        if incremented:
+            await session.exec(
+                update(Tag)
+                .where(Tag.uid.in_(incremented))
+                .values(book_count=Tag.book_count + 1)
+            )
+
         session.add(book)
+        await book_document_service.rebuild(book.uid, session)
         await session.commit()
+        await response_cache.invalidate("tags", book_key(book.uid))
+
+        for tag in linked_tags:
+            tag_suggest_index.link(tag.uid, tag.name)
+
         await session.refresh(book)
         return book
 
+    async def remove_tag_from_book(
+        self, book_uid: str, tag_uid: str, session: AsyncSession
+    ):
+        """Remove a tag from a book"""
+
+        statement = (
+            delete(BookTag)
+            .where(BookTag.book_id == book_uid, BookTag.tag_id == tag_uid)
+            .returning(BookTag.tag_id)
+        )
+
+        result = await session.exec(statement)
+
+        if result.scalar() is None:
+            raise TagNotFound()
+
+        await session.exec(
+            update(Tag)
+            .where(Tag.uid == tag_uid)
+            .values(book_count=Tag.book_count - 1)
+        )
+
+        await book_document_service.rebuild(book_uid, session)
+
+        await session.commit()
+        await response_cache.invalidate("tags", book_key(book_uid))
+
+        tag_suggest_index.bump(tag_uid, -1)
+
+    async def get_tag_books(
+        self,
+        tag_uid: uuid.UUID,
+        limit: int,
+        after: Optional[uuid.UUID],
+        session: AsyncSession,
+    ):
+        """Get a page of books carrying a tag, ordered by book uid"""
+
+        statement = (
+            select(Book)
+            .join(BookTag, BookTag.book_id == Book.uid)
+            .where(BookTag.tag_id == tag_uid, Book.deleted_at.is_(None))
+            .order_by(BookTag.book_id)
+            .limit(limit)
+            .options(noload(Book.reviews), noload(Book.tags))
+        )
+
+        if after is not None:
+            statement = statement.where(BookTag.book_id > after)
+
+        result = await session.exec(statement)
+
+        books = result.all()
+
+        if not books:
+            tag_exists = await session.exec(select(Tag.uid).where(Tag.uid == tag_uid))
+
+            if tag_exists.first() is None:
+                raise TagNotFound()
+
+        next_cursor = books[-1].uid if len(books) == limit else None
+
+        return {"books": books, "next_cursor": next_cursor}
+
     async def get_tag_by_uid(self, tag_uid: str, session: AsyncSession):
         """Get tag by uid"""
 
@@ -76,6 +198,9 @@ class TagService:
         session.add(new_tag)
 
         await session.commit()
+        await response_cache.invalidate("tags")
+
+        tag_suggest_index.add(new_tag.uid, new_tag.name)
 
         return new_tag
 
@@ -98,16 +223,44 @@ class TagService:
 
             await session.refresh(tag)
 
+        tag_suggest_index.rename(tag.uid, tag.name)
+
+        result = await session.exec(
+            select(BookTag.book_id).where(BookTag.tag_id == tag.uid)
+        )
+        linked_book_uids = result.all()
+
+        await response_cache.invalidate_many(
+            ["tags", *(book_key(uid) for uid in linked_book_uids)]
+        )
+
+        book_document_service.rebuild_later(linked_book_uids)
+
         return tag
 
     async def delete_tag(self, tag_uid: str, session: AsyncSession):
         """Delete a tag"""
 
-        tag = self.get_tag_by_uid(tag_uid,session)
+        unlinked = await session.exec(
+            delete(BookTag).where(BookTag.tag_id == tag_uid).returning(BookTag.book_id)
+        )
 
-        if not tag:
-            raise TagNotFound()
+        unlinked_book_uids = unlinked.scalars().all()
+
+        result = await session.exec(
+            delete(Tag).where(Tag.uid == tag_uid).returning(Tag.uid)
+        )
+
+        deleted_uid = result.scalar()
 
-        await session.delete(tag)
+        if deleted_uid is None:
+            raise TagNotFound()
 
         await session.commit()
+        await response_cache.invalidate_many(
+            ["tags", *(book_key(uid) for uid in unlinked_book_uids)]
+        )
+
+        tag_suggest_index.remove(deleted_uid)
+
+        book_document_service.rebuild_later(unlinked_book_uids)
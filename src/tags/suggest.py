@@ -0,0 +1,205 @@
+import asyncio
+import heapq
+import time
+import uuid
+from bisect import bisect_left, insort
+from typing import Dict, List, Optional, Tuple
+
+from sqlmodel import desc, func, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.config import Config
+from src.db.models import Tag
+
+
+def normalize_tag_name(name: str) -> str:
+    """Normalize a tag name the same way the database fallback does.
+
+    Keep in step with `lower(trim(name))` in `search_tags_in_db` and the
+    `ix_tags_name_trgm` index expression; Postgres `trim` only strips spaces.
+    """
+
+    return name.strip(" ").lower()
+
+
+class TagSuggestIndex:
+    """In-memory prefix index over normalized tag names.
+
+    Keys are kept in a sorted list so that a prefix lookup is two bisections
+    followed by a top-k selection on popularity (`Tag.book_count`). Short
+    prefixes match most of the index, so their top `TAG_SUGGEST_MAX_LIMIT`
+    are cached until a tag under that prefix changes.
+    """
+
+    def __init__(self) -> None:
+        self._keys: List[Tuple[str, str]] = []
+        self._entries: Dict[str, Tuple[str, str, int]] = {}
+        self._top: Dict[str, List[Tuple[str, str]]] = {}
+        self._lock = asyncio.Lock()
+        self.loaded_at: Optional[float] = None
+        self.oversized = False
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def ready(self) -> bool:
+        if self.loaded_at is None:
+            return False
+
+        return time.monotonic() - self.loaded_at < Config.TAG_SUGGEST_REFRESH_SECONDS
+
+    def build(self, rows) -> None:
+        """Replace the index content with (uid, name, weight) rows"""
+
+        entries = {}
+
+        for uid, name, weight in rows:
+            entries[str(uid)] = (normalize_tag_name(name), name, weight or 0)
+
+        self._entries = entries
+        self._keys = sorted((key, uid) for uid, (key, _, _) in entries.items())
+        self._top = {}
+        self.loaded_at = time.monotonic()
+
+    def add(self, uid, name: str, weight: int = 0) -> None:
+        if self.oversized:
+            return
+
+        uid = str(uid)
+
+        if uid in self._entries:
+            self.remove(uid)
+
+        key = normalize_tag_name(name)
+        self._entries[uid] = (key, name, weight)
+        insort(self._keys, (key, uid))
+        self._invalidate(key)
+
+    def remove(self, uid) -> None:
+        uid = str(uid)
+        entry = self._entries.pop(uid, None)
+
+        if entry is None:
+            return
+
+        position = bisect_left(self._keys, (entry[0], uid))
+
+        if position < len(self._keys) and self._keys[position] == (entry[0], uid):
+            del self._keys[position]
+
+        self._invalidate(entry[0])
+
+    def rename(self, uid, name: str) -> None:
+        entry = self._entries.get(str(uid))
+
+        self.add(uid, name, entry[2] if entry else 0)
+
+    def bump(self, uid, delta: int) -> None:
+        uid = str(uid)
+        entry = self._entries.get(uid)
+
+        if entry is not None:
+            self._entries[uid] = (entry[0], entry[1], max(entry[2] + delta, 0))
+            self._invalidate(entry[0])
+
+    def _invalidate(self, key: str) -> None:
+        for length in range(1, Config.TAG_SUGGEST_CACHED_PREFIX_LENGTH + 1):
+            self._top.pop(key[:length], None)
+
+    def link(self, uid, name: str) -> None:
+        """Record that a book was tagged, indexing the tag if it is new"""
+
+        if str(uid) in self._entries:
+            self.bump(uid, 1)
+        else:
+            self.add(uid, name, 1)
+
+    def search(self, prefix: str, limit: int) -> List[dict]:
+        """Return the `limit` most popular tags whose name starts with `prefix`"""
+
+        prefix = normalize_tag_name(prefix)
+
+        if len(prefix) > Config.TAG_SUGGEST_CACHED_PREFIX_LENGTH:
+            matches = self._rank(prefix, limit)
+        else:
+            matches = self._top.get(prefix)
+
+            if matches is None:
+                matches = self._rank(prefix, Config.TAG_SUGGEST_MAX_LIMIT)
+                self._top[prefix] = matches
+
+            matches = matches[:limit]
+
+        return [
+            {
+                "uid": uuid.UUID(uid),
+                "name": self._entries[uid][1],
+                "book_count": self._entries[uid][2],
+            }
+            for _, uid in matches
+        ]
+
+    def _rank(self, prefix: str, limit: int) -> List[Tuple[str, str]]:
+        start = bisect_left(self._keys, (prefix,))
+        end = bisect_left(self._keys, (prefix + "\U0010ffff",))
+
+        return heapq.nsmallest(
+            limit,
+            (self._keys[i] for i in range(start, end)),
+            key=lambda item: (-self._entries[item[1]][2], item[0]),
+        )
+
+    async def load(self, session: AsyncSession) -> None:
+        """(Re)build the index from the database unless another task just did"""
+
+        async with self._lock:
+            if self.ready:
+                return
+
+            total = (await session.exec(select(func.count()).select_from(Tag))).one()
+
+            if total > Config.TAG_SUGGEST_MAX_INDEX_SIZE:
+                self._entries, self._keys = {}, []
+                self.oversized = True
+                self.loaded_at = time.monotonic()
+                return
+
+            result = await session.exec(tag_popularity_statement())
+
+            self.oversized = False
+            self.build(result.all())
+
+
+def tag_popularity_statement():
+    return select(Tag.uid, Tag.name, Tag.book_count)
+
+
+async def search_tags_in_db(prefix: str, limit: int, session: AsyncSession):
+    """Prefix search served by the `ix_tags_name_trgm` trigram index"""
+
+    name_key = func.lower(func.trim(Tag.name))
+
+    pattern = (
+        normalize_tag_name(prefix)
+        .replace("/", "//")
+        .replace("%", "/%")
+        .replace("_", "/_")
+    ) + "%"
+
+    statement = (
+        tag_popularity_statement()
+        .where(name_key.like(pattern, escape="/"))
+        .order_by(desc(Tag.book_count), name_key)
+        .limit(limit)
+    )
+
+    result = await session.exec(statement)
+
+    return [
+        {"uid": uid, "name": name, "book_count": book_count}
+        for uid, name, book_count in result.all()
+    ]
+
+
+tag_suggest_index = TagSuggestIndex()
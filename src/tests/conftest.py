@@ -1,4 +1,10 @@
-from src.db.main import get_session
+import asyncio
+from contextlib import asynccontextmanager
+
+from sqlmodel import SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.db.main import get_session, worker_engine
 from src.auth.dependencies import AccessTokenBearer, RoleChecker,RefreshTokenBearer
 from src.db.models import Book
 from src import app
@@ -55,4 +61,38 @@ def test_book():
         language="English",
         published_date=datetime.now(),
         update_at=datetime.now()
-    )
\ No newline at end of file
+    )
+
+@pytest.fixture(scope="session")
+def live_session():
+    """Open sessions on the DATABASE_URL database whose writes are rolled back.
+
+    Tests using it are skipped when that database cannot be reached.
+    """
+
+    async def create_tables():
+        async with worker_engine.begin() as conn:
+            await conn.run_sync(SQLModel.metadata.create_all)
+
+    try:
+        asyncio.run(asyncio.wait_for(create_tables(), 5))
+    except Exception as exc:
+        pytest.skip(f"no database at DATABASE_URL: {exc!r}")
+
+    @asynccontextmanager
+    async def session_factory():
+        async with worker_engine.connect() as conn:
+            transaction = await conn.begin()
+            session = AsyncSession(
+                bind=conn,
+                expire_on_commit=False,
+                join_transaction_mode="create_savepoint",
+            )
+
+            try:
+                yield session
+            finally:
+                await session.close()
+                await transaction.rollback()
+
+    return session_factory
@@ -0,0 +1,77 @@
+import asyncio
+from unittest import mock
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src import app
+from src.admission import AdmissionController, Overloaded, admission_controller
+
+
+def make_controller(**overrides):
+    options = dict(
+        initial_limit=2,
+        min_limit=1,
+        max_limit=10,
+        target_latency=0.1,
+        queue_size=2,
+        queue_timeout=0.05,
+    )
+    options.update(overrides)
+    return AdmissionController(**options)
+
+
+def test_limit_grows_on_fast_requests_and_backs_off_on_slow_ones():
+    controller = make_controller()
+
+    async def run():
+        for _ in range(4):
+            await controller.acquire("normal")
+            controller.release(0.01)
+
+    asyncio.run(run())
+    assert controller.limit > 2
+
+    grown = controller.limit
+    controller.adjust(1.0)
+    controller.adjust(1.0)
+    assert controller.limit == pytest.approx(grown * 0.9)
+
+
+def test_waiters_are_admitted_by_priority_and_shed_past_deadline():
+    controller = make_controller(initial_limit=1)
+
+    async def run():
+        await controller.acquire("normal")
+        low = asyncio.create_task(controller.acquire("low"))
+        critical = asyncio.create_task(controller.acquire("critical"))
+        await asyncio.sleep(0)
+
+        # A full queue evicts the low priority waiter for a normal one
+        normal = asyncio.create_task(controller.acquire("normal"))
+        await asyncio.sleep(0)
+        controller.release(1.0)
+
+        with pytest.raises(Overloaded):
+            await low
+
+        await critical
+        with pytest.raises(Overloaded):
+            await normal
+
+        return controller.in_flight
+
+    assert asyncio.run(run()) == 1
+
+
+def test_overloaded_request_gets_503_with_retry_after():
+    client = TestClient(app, base_url="http://localhost")
+
+    with mock.patch.object(admission_controller, "acquire", side_effect=Overloaded()):
+        response = client.get("/api/v1/books/")
+
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
+    assert response.json()["error_code"] == "overloaded"
+
+    assert client.get("/health").json()["status"] == "ok"
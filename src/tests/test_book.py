@@ -1,6 +1,32 @@
-from src.books.schemas import BookCreateModel
+import asyncio
+import uuid
+from datetime import date, datetime
+from decimal import Decimal
+from unittest import mock
+
+import pytest
+from fastapi.testclient import TestClient
+from pydantic import ValidationError
+from sqlalchemy.dialects import postgresql
+
+from src import app
+from src.books import routes as book_routes
+from src.books.documents import book_document_service
+from src.books.service import BookService
+from src.books.schemas import (
+    BookBulkFieldsModel,
+    BookBulkUpdateModel,
+    BookCreateModel,
+    BookDocumentModel,
+    BookSelectionModel,
+)
+from src.cache import response_cache
+from src.config import Config
+from src.db.main import get_session
+from src.db.models import Book, Review, Tag
 
 books_prefix = f"/api/v1/books"
+client = TestClient(app, base_url="http://localhost")
 
 
 def test_get_all_books(test_client,fake_book_service,fake_session):
@@ -44,3 +70,234 @@ def test_update_book_by_uid(test_client, fake_book_service,test_book, fake_sessi
     assert fake_book_service.get_book_called_once()
     assert fake_book_service.get_book_called_once_with(test_book.uid,fake_session)
 
+
+@pytest.mark.parametrize(
+    "selection",
+    [{}, {"filter": {}}, {"uids": [], "filter": {"author": "Test Author"}}],
+)
+def test_bulk_selection_requires_uids_or_filter(selection):
+    with pytest.raises(ValidationError):
+        BookSelectionModel(**selection)
+
+
+def test_bulk_update_requires_values():
+    with pytest.raises(ValidationError):
+        BookBulkUpdateModel(filter={"language": "English"}, values={})
+
+
+
+@pytest.fixture
+def bulk_session():
+    session = mock.Mock(exec=mock.AsyncMock(), commit=mock.AsyncMock())
+
+    with mock.patch.object(response_cache, "invalidate_many", mock.AsyncMock()):
+        yield session
+
+
+def returning(uids):
+    return mock.Mock(scalars=mock.Mock(return_value=mock.Mock(all=mock.Mock(return_value=uids))))
+
+
+def test_bulk_update_reports_each_requested_uid(bulk_session):
+    found, missing = uuid.uuid4(), uuid.uuid4()
+    bulk_session.exec.return_value = returning([found])
+    selection = BookSelectionModel(uids=[found, missing, found])
+
+    with mock.patch.object(book_document_service, "rebuild_later") as rebuild_later:
+        result = asyncio.run(
+            BookService().bulk_update_books(
+                selection, BookBulkFieldsModel(language="French"), bulk_session
+            )
+        )
+
+    (statement,) = compiled_statements(bulk_session)
+
+    assert statement.startswith("UPDATE books SET")
+    assert "language=%(language)s" in statement
+    assert "books.deleted_at IS NULL AND books.uid IN" in statement
+    assert statement.endswith("RETURNING books.uid")
+    assert result == {
+        "affected": 1,
+        "results": [
+            {"uid": found, "status": "updated"},
+            {"uid": missing, "status": "not_found"},
+        ],
+    }
+    rebuild_later.assert_called_once_with([found])
+    response_cache.invalidate_many.assert_awaited_once_with(["books", f"book:{found}"])
+
+
+def test_bulk_delete_by_filter_tombstones_live_books_only(bulk_session):
+    deleted = [uuid.uuid4(), uuid.uuid4()]
+    bulk_session.exec.side_effect = [returning(deleted), mock.Mock()]
+    selection = BookSelectionModel(filter={"author": "Test Author"})
+
+    with mock.patch.object(Config, "BOOK_DOCUMENTS_ENABLED", True):
+        result = asyncio.run(BookService().bulk_delete_books(selection, bulk_session))
+
+    tombstone, drop_documents = compiled_statements(bulk_session)
+
+    assert tombstone.startswith("UPDATE books SET deleted_at=")
+    assert "books.deleted_at IS NULL AND books.author = " in tombstone
+    assert tombstone.endswith("RETURNING books.uid")
+    assert drop_documents.startswith("DELETE FROM book_documents")
+    assert result["affected"] == 2
+    assert sorted(item["uid"] for item in result["results"]) == sorted(deleted)
+    assert {item["status"] for item in result["results"]} == {"deleted"}
+    bulk_session.commit.assert_awaited_once()
+
+
+def make_detailed_book():
+    book = Book(
+        uid=uuid.uuid4(),
+        title="sample title",
+        author="sample author",
+        publisher="sample publisher",
+        published_date=date(2024, 12, 10),
+        page_count=200,
+        language="English",
+        created_at=datetime(2024, 12, 10, 8, 30),
+        update_at=datetime(2024, 12, 11, 8, 30),
+    )
+    book.reviews = [
+        Review(
+            uid=uuid.uuid4(),
+            rating=rating,
+            review_text="Great read",
+            user_uid=uuid.uuid4(),
+            book_uid=book.uid,
+            created_at=datetime(2024, 12, day),
+            update_at=datetime(2024, 12, day),
+        )
+        for day, rating in ((12, 4), (14, 3), (13, 4))
+    ]
+    book.tags = [
+        Tag(uid=uuid.uuid4(), name=name, book_count=3, created_at=datetime(2024, 12, 1))
+        for name in ("mystery", "fiction")
+    ]
+    return book
+
+
+def test_stored_and_fallback_documents_have_the_same_shape():
+    book = make_detailed_book()
+    newest_first = sorted(book.reviews, key=lambda r: r.created_at, reverse=True)
+    results = [
+        mock.Mock(first=mock.Mock(return_value=book)),
+        mock.Mock(all=mock.Mock(return_value=sorted(book.tags, key=lambda t: t.name))),
+        mock.Mock(all=mock.Mock(return_value=newest_first[:2])),
+        mock.Mock(one=mock.Mock(return_value=(3, Decimal("3.6666666666666667")))),
+    ]
+    session = mock.Mock(exec=mock.AsyncMock(side_effect=results))
+
+    with mock.patch.object(Config, "BOOK_DOCUMENT_REVIEW_LIMIT", 2):
+        stored = asyncio.run(book_document_service.build_document(book.uid, session))
+        fallback = book_document_service.document_from_detail(book)
+
+    assert stored == fallback
+    assert set(stored) == set(BookDocumentModel.model_fields)
+    assert stored["review_count"] == 3 and stored["average_rating"] == 3.67
+    assert [tag["name"] for tag in stored["tags"]] == ["fiction", "mystery"]
+    assert "book_count" not in stored["tags"][0]
+
+
+def compiled_statements(session):
+    return [
+        str(call.args[0].compile(dialect=postgresql.dialect()))
+        for call in session.exec.await_args_list
+    ]
+
+
+@pytest.mark.parametrize("document", [{"uid": "book"}, None])
+def test_rebuild_locks_the_book_then_upserts_or_deletes(document):
+    session = mock.Mock(exec=mock.AsyncMock())
+
+    with mock.patch.object(Config, "BOOK_DOCUMENTS_ENABLED", True), mock.patch.object(
+        book_document_service, "build_document", mock.AsyncMock(return_value=document)
+    ):
+        asyncio.run(book_document_service.rebuild(str(uuid.uuid4()), session))
+
+    lock, write = compiled_statements(session)
+
+    assert lock.endswith("FOR UPDATE")
+
+    if document is None:
+        assert write.startswith("DELETE FROM book_documents")
+    else:
+        assert write.startswith("INSERT INTO book_documents")
+        assert "ON CONFLICT (book_uid) DO UPDATE" in write
+
+
+@pytest.fixture
+def authorized_book_routes():
+    session = mock.Mock(exec=mock.AsyncMock(), commit=mock.AsyncMock())
+
+    async def get_test_session():
+        yield session
+
+    overrides = {
+        get_session: get_test_session,
+        book_routes.role_checker.dependency: lambda: True,
+        book_routes.acccess_token_bearer: lambda: {},
+    }
+    saved = {dep: app.dependency_overrides.get(dep) for dep in overrides}
+    app.dependency_overrides.update(overrides)
+
+    yield session
+
+    for dep, override in saved.items():
+        if override is None:
+            app.dependency_overrides.pop(dep, None)
+        else:
+            app.dependency_overrides[dep] = override
+
+
+def test_missing_document_is_served_from_the_orm_and_rebuilt_later(
+    authorized_book_routes,
+):
+    book = make_detailed_book()
+    rebuild = mock.AsyncMock()
+    rebuild_later = mock.Mock()
+
+    with mock.patch.object(Config, "BOOK_DOCUMENTS_ENABLED", True), mock.patch.object(
+        book_document_service, "get_document_json", mock.AsyncMock(return_value=None)
+    ), mock.patch.object(book_document_service, "rebuild", rebuild), mock.patch.object(
+        book_document_service, "rebuild_later", rebuild_later
+    ), mock.patch.object(
+        book_routes.book_service, "get_book_detail", mock.AsyncMock(return_value=book)
+    ):
+        response = client.get(f"{books_prefix}/{book.uid}")
+
+    assert response.status_code == 200
+    assert response.json() == book_document_service.document_from_detail(book)
+    rebuild_later.assert_called_once_with([str(book.uid)])
+    rebuild.assert_not_awaited()
+    authorized_book_routes.commit.assert_not_awaited()
+
+
+def test_unknown_book_is_not_queued_for_rebuild(authorized_book_routes):
+    rebuild_later = mock.Mock()
+
+    with mock.patch.object(Config, "BOOK_DOCUMENTS_ENABLED", True), mock.patch.object(
+        book_document_service, "get_document_json", mock.AsyncMock(return_value=None)
+    ), mock.patch.object(
+        book_document_service, "rebuild_later", rebuild_later
+    ), mock.patch.object(
+        book_routes.book_service, "get_book_detail", mock.AsyncMock(return_value=None)
+    ):
+        response = client.get(f"{books_prefix}/{uuid.uuid4()}")
+
+    assert response.status_code == 404
+    rebuild_later.assert_not_called()
+    authorized_book_routes.commit.assert_not_awaited()
+
+
+def test_fallback_serves_the_document_shape(authorized_book_routes):
+    book = make_detailed_book()
+
+    with mock.patch.object(Config, "BOOK_DOCUMENTS_ENABLED", False), mock.patch.object(
+        book_routes.book_service, "get_book_detail", mock.AsyncMock(return_value=book)
+    ):
+        response = client.get(f"{books_prefix}/{book.uid}")
+
+    assert response.status_code == 200
+    assert response.json() == book_document_service.document_from_detail(book)
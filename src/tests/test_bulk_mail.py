@@ -0,0 +1,114 @@
+from unittest import mock
+
+import aiosmtplib
+import pytest
+from celery.exceptions import Retry
+from fastapi.testclient import TestClient
+
+from src import app, celery_tasks
+from src.bulk_mail import permanent_failure, plan_chunks
+
+
+def test_chunks_are_deduplicated_and_split_by_domain():
+    addresses = ["a@x.com", "A@x.com", "b@x.com", "c@x.com", "d@y.org", " "]
+
+    assert plan_chunks(addresses, chunk_size=2) == [
+        ["a@x.com", "b@x.com"],
+        ["c@x.com"],
+        ["d@y.org"],
+    ]
+
+
+def test_only_temporarily_failed_recipients_are_retried():
+    results = [
+        None,
+        aiosmtplib.SMTPRecipientsRefused(
+            [aiosmtplib.SMTPRecipientRefused(550, "no such user", "b@x.com")]
+        ),
+        aiosmtplib.SMTPServerDisconnected("gone"),
+    ]
+    jobs = mock.Mock(acquire_domain=mock.Mock(return_value=0))
+    jobs.content.return_value = ("welcome", {})
+
+    with mock.patch.object(celery_tasks, "bulk_mail_jobs", jobs), mock.patch.object(
+        celery_tasks.mail_sender, "send_many", return_value=results
+    ), mock.patch.object(celery_tasks.send_mail_chunk, "retry", side_effect=Retry()) as retry:
+        with pytest.raises(Retry):
+            celery_tasks.send_mail_chunk.run("job", ["a@x.com", "b@x.com", "c@x.com"])
+
+    assert permanent_failure(results[1]) and not permanent_failure(results[2])
+    jobs.record.assert_called_once_with("job", 1, ["b@x.com"], chunk_done=False)
+    jobs.release_domain.assert_called_once_with("x.com", mock.ANY)
+    assert retry.call_args.kwargs["args"] == ["job", ["c@x.com"]]
+    assert retry.call_args.kwargs["kwargs"] == {"attempt": 1, "waited": 0}
+
+
+def test_chunk_fails_once_it_has_waited_too_long_for_its_domain():
+    jobs = mock.Mock(acquire_domain=mock.Mock(return_value=30))
+
+    with mock.patch.object(celery_tasks, "bulk_mail_jobs", jobs), mock.patch.object(
+        celery_tasks.send_mail_chunk, "retry", side_effect=Retry()
+    ) as retry, mock.patch.object(celery_tasks.Config, "MAIL_DOMAIN_MAX_WAIT_SECONDS", 60):
+        with pytest.raises(Retry):
+            celery_tasks.send_mail_chunk.run("job", ["a@x.com"], waited=20)
+
+        assert retry.call_args.kwargs["kwargs"] == {"attempt": 0, "waited": 50}
+
+        result = celery_tasks.send_mail_chunk.run("job", ["a@x.com"], waited=50)
+
+    assert result == {"sent": 0, "failed": 1}
+    jobs.record.assert_called_once_with("job", 0, ["a@x.com"], chunk_done=True)
+    jobs.release_domain.assert_not_called()
+
+
+def test_job_status_requires_an_admin():
+    client = TestClient(app, base_url="http://localhost")
+    response = client.get("/api/v1/auth/send_mail/job")
+
+    assert response.status_code in (401, 403)
+
+
+def test_domain_waits_back_off_exponentially():
+    jobs = mock.Mock(acquire_domain=mock.Mock(return_value=1))
+    countdowns = []
+    waited = 0
+
+    with mock.patch.object(celery_tasks, "bulk_mail_jobs", jobs), mock.patch.object(
+        celery_tasks.send_mail_chunk, "retry", side_effect=Retry()
+    ) as retry, mock.patch.object(
+        celery_tasks.Config, "MAIL_DOMAIN_MAX_BACKOFF_SECONDS", 8
+    ):
+        for _ in range(6):
+            with pytest.raises(Retry):
+                celery_tasks.send_mail_chunk.run("job", ["a@x.com"], waited=waited)
+
+            countdowns.append(retry.call_args.kwargs["countdown"])
+            waited = retry.call_args.kwargs["kwargs"]["waited"]
+
+    assert countdowns == [1, 1, 2, 4, 8, 8]
+
+
+def test_dispatcher_marks_the_job_failed_when_a_chunk_raises():
+    with mock.patch.object(celery_tasks, "chord") as chord:
+        celery_tasks.dispatch_bulk_mail.run("job", [["a@x.com"], ["b@y.org"]])
+
+    header = list(chord.call_args.args[0])
+    body = chord.return_value.call_args.args[0]
+
+    assert [task.args for task in header] == [("job", ["a@x.com"]), ("job", ["b@y.org"])]
+    assert body.task == "src.celery_tasks.finish_bulk_mail"
+    assert [errback.task for errback in body.options["link_error"]] == [
+        "src.celery_tasks.fail_bulk_mail"
+    ]
+
+
+def test_bulk_mail_requires_an_admin():
+    client = TestClient(app, base_url="http://localhost")
+
+    with mock.patch("src.auth.routes.send_bulk_mail") as send_bulk_mail:
+        response = client.post(
+            "/api/v1/auth/send_mail", json={"addresses": ["a@x.com"]}
+        )
+
+    assert response.status_code in (401, 403)
+    send_bulk_mail.assert_not_called()
@@ -0,0 +1,55 @@
+import asyncio
+from unittest import mock
+
+import pytest
+
+from src.db import fastpath
+from src.db.bulkhead import Bulkhead, db_bulkhead
+from src.errors import DatabaseBusy
+from src.routing import get_policy
+
+
+def test_full_bulkhead_rejects_after_timeout_and_frees_on_exit():
+    bulkhead = Bulkhead("test", limit=1, timeout=0.01)
+
+    async def run():
+        async with bulkhead.acquire():
+            with pytest.raises(DatabaseBusy):
+                async with bulkhead.acquire():
+                    pass
+
+        async with bulkhead.acquire():
+            return bulkhead.in_use
+
+    assert asyncio.run(run()) == 1
+    assert bulkhead.in_use == 0
+
+
+def test_routes_are_assigned_to_configured_groups():
+    @db_bulkhead("admin")
+    async def endpoint():
+        pass
+
+    class Route:
+        pass
+
+    route = Route()
+    route.endpoint = endpoint
+    assert get_policy(route, "bulkhead") == "admin"
+
+    with pytest.raises(ValueError):
+        db_bulkhead("reports")
+
+
+def test_pooled_raw_connections_take_a_bulkhead():
+    bulkhead = mock.Mock(acquire=mock.Mock(side_effect=DatabaseBusy))
+
+    async def run():
+        async with fastpath.raw_connection(group="admin"):
+            pass
+
+    with mock.patch.dict(fastpath.bulkheads, {"admin": bulkhead}):
+        with pytest.raises(DatabaseBusy):
+            asyncio.run(run())
+
+    bulkhead.acquire.assert_called_once()
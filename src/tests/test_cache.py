@@ -0,0 +1,113 @@
+import asyncio
+import time
+import uuid
+from unittest import mock
+
+from fastapi.testclient import TestClient
+
+from src import app
+from src.cache import CachePolicy, book_key, response_cache
+from src.middleware import ResponseCacheMiddleware
+
+client = TestClient(app, base_url="http://localhost")
+tags_prefix = "/api/v1/tags/"
+
+
+def test_cache_hit_is_served_before_auth_and_db():
+    cached = (200, [["content-type", "application/json"]], b"[]", time.time() - 5)
+
+    with mock.patch.object(
+        response_cache, "vary_values", mock.AsyncMock(return_value=["user"])
+    ), mock.patch.object(
+        response_cache, "entry_key", mock.AsyncMock(return_value="key")
+    ), mock.patch.object(response_cache, "get", mock.AsyncMock(return_value=cached)):
+        response = client.get(tags_prefix, headers={"Authorization": "Bearer token"})
+
+    assert response.status_code == 200
+    assert response.json() == []
+    assert response.headers["x-cache"] == "HIT"
+    assert response.headers["cache-control"] == "private, max-age=60"
+    assert int(response.headers["age"]) >= 5
+
+
+def test_error_responses_are_not_stored():
+    store = mock.AsyncMock()
+
+    with mock.patch.object(
+        response_cache, "vary_values", mock.AsyncMock(return_value=["user"])
+    ), mock.patch.object(
+        response_cache, "entry_key", mock.AsyncMock(return_value="key")
+    ), mock.patch.object(
+        response_cache, "get", mock.AsyncMock(return_value=None)
+    ), mock.patch.object(response_cache, "set", store):
+        response = client.get(tags_prefix, headers={"Authorization": "Bearer token"})
+
+    assert response.status_code != 200
+    store.assert_not_called()
+
+
+def test_unverified_users_are_not_served_from_the_cache():
+    token_data = {"jti": "jti", "user": {"role": "user", "user_uid": "u1"}}
+    cache = type(response_cache)()
+    load_verified = mock.AsyncMock(side_effect=[False, True])
+
+    with mock.patch("src.cache.decode_token", return_value=token_data), mock.patch(
+        "src.cache.token_in_blocklist", mock.AsyncMock(return_value=False)
+    ), mock.patch.object(cache, "load_verified", load_verified):
+        assert asyncio.run(cache.vary_values("Bearer token", ["role"])) is None
+        assert asyncio.run(cache.vary_values("Bearer token", ["role"])) == ["user"]
+        # Verification is remembered once seen
+        assert asyncio.run(cache.vary_values("Bearer token", ["role"])) == ["user"]
+
+    assert load_verified.await_count == 2
+
+
+def test_profile_headers_are_not_stored():
+    store = mock.AsyncMock()
+    middleware = ResponseCacheMiddleware(app=None, router=None, max_bytes=1024)
+    policy = mock.Mock(ttl=60)
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    async def run():
+        send_wrapper = middleware.storing(
+            {"method": "GET"}, send, "key", policy, "private, max-age=60"
+        )
+        await send_wrapper(
+            {
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"x-profile-id", b"abc"),
+                ],
+            }
+        )
+        await send_wrapper({"type": "http.response.body", "body": b"[]"})
+
+    with mock.patch.object(response_cache, "set", store):
+        asyncio.run(run())
+
+    assert store.await_args.args[2] == [("content-type", "application/json")]
+    assert len(sent) == 2
+
+
+def test_book_invalidation_matches_reads_with_any_uid_spelling():
+    book_uid = uuid.uuid4()
+    redis = mock.AsyncMock()
+    redis.mget.return_value = [None]
+    policy = CachePolicy(ttl=60, surrogate_keys=["book:{book_uid}"])
+
+    with mock.patch("src.cache.redis_client", redis):
+        asyncio.run(
+            response_cache.entry_key(
+                policy, "/{book_uid}", {"book_uid": str(book_uid).upper()}, b"", []
+            )
+        )
+
+    assert redis.mget.await_args.args[0] == [
+        f"bookly:cache:surrogate:{book_key(book_uid.hex)}"
+    ]
+    assert book_key(str(book_uid).upper()) == f"book:{book_uid}"
@@ -0,0 +1,25 @@
+from src import celery_tasks
+from src.celery_tasks import c_app
+
+
+def test_unrouted_tasks_use_the_default_queue():
+    route = c_app.amqp.router.route({}, "src.celery_tasks.not_routed")
+
+    assert route["queue"].name == "default"
+    assert c_app.amqp.router.route({}, celery_tasks.send_email.name)["queue"].name == (
+        "transactional"
+    )
+
+
+def test_only_idempotent_tasks_ack_late():
+    assert not celery_tasks.send_email.acks_late
+    assert not celery_tasks.send_mail_chunk.acks_late
+    assert not celery_tasks.send_email.reject_on_worker_lost
+
+    for task in (
+        celery_tasks.finish_bulk_mail,
+        celery_tasks.purge_deleted_records,
+        celery_tasks.rebuild_book_documents,
+        celery_tasks.check_book_documents,
+    ):
+        assert task.acks_late and task.reject_on_worker_lost
@@ -0,0 +1,73 @@
+import gzip
+
+from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from fastapi.testclient import TestClient
+
+from src.compression import negotiate
+from src.middleware import CompressionMiddleware
+
+payload = [{"title": f"Book {i}", "author": "Some Author"} for i in range(200)]
+
+compressed_app = FastAPI()
+compressed_app.add_middleware(
+    CompressionMiddleware, minimum_size=1024, thread_threshold=4096
+)
+
+
+@compressed_app.get("/books")
+async def books():
+    return ORJSONResponse(payload)
+
+
+@compressed_app.get("/small")
+async def small():
+    return ORJSONResponse({"ok": True})
+
+
+@compressed_app.get("/stream")
+async def stream():
+    async def chunks():
+        for i in range(5):
+            yield f"line {i}\n".encode() * 100
+
+    return StreamingResponse(chunks(), media_type="text/plain")
+
+
+client = TestClient(compressed_app)
+
+
+def test_large_json_is_gzipped_with_length():
+    response = client.get("/books", headers={"Accept-Encoding": "gzip"})
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.json() == payload
+    assert int(response.headers["content-length"]) < len(response.content) // 2
+
+
+def test_small_and_unaccepted_responses_are_untouched():
+    small = client.get("/small", headers={"Accept-Encoding": "gzip"})
+    identity = client.get("/books", headers={"Accept-Encoding": "identity"})
+
+    assert "content-encoding" not in small.headers
+    assert "content-encoding" not in identity.headers
+
+
+def test_streamed_body_is_compressed_per_chunk():
+    with client.stream("GET", "/stream", headers={"Accept-Encoding": "gzip"}) as response:
+        raw = b"".join(response.iter_raw())
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert "content-length" not in response.headers
+    assert gzip.decompress(raw) == b"".join(
+        f"line {i}\n".encode() * 100 for i in range(5)
+    )
+
+
+def test_negotiate_respects_q_values_and_server_preference():
+    encoders = {"br": None, "gzip": None}
+
+    assert negotiate("gzip, br", encoders) == "br"
+    assert negotiate("br;q=0, gzip;q=0.5", encoders) == "gzip"
+    assert negotiate("identity", encoders) is None
@@ -0,0 +1,105 @@
+import asyncio
+from types import SimpleNamespace
+from unittest import mock
+
+import asyncpg
+import pytest
+from sqlalchemy.exc import DBAPIError
+
+from src.db import fastpath
+from src.db.deadlines import ClientDisconnected, QueryGuard, query_guard
+from src.db.main import get_session
+from src.errors import QueryTimeout
+from src.middleware import QueryCancellationMiddleware
+
+
+def test_disconnect_cancels_running_query_quietly():
+    cancelled = []
+
+    async def app(scope, receive, send):
+        guard = query_guard.get()
+        guard.running += 1
+
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    async def receive():
+        await asyncio.sleep(0.01)
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        pass
+
+    async def run():
+        scope = {"type": "http", "method": "GET", "path": "/api/v1/reviews/"}
+        await asyncio.wait_for(
+            QueryCancellationMiddleware(app)(scope, receive, send), timeout=1
+        )
+        return asyncio.current_task().cancelling()
+
+    assert asyncio.run(run()) == 0
+    assert cancelled == [True]
+
+
+def test_statement_timeout_becomes_query_timeout():
+    request = SimpleNamespace(scope={})
+    orig = Exception("canceling statement due to statement timeout")
+    orig.sqlstate = "57014"
+
+    async def run():
+        sessions = get_session(request)
+        session = await sessions.__anext__()
+        assert session.info["statement_timeout_ms"] == 30000
+
+        with pytest.raises(QueryTimeout):
+            await sessions.athrow(DBAPIError("SELECT 1", {}, orig))
+
+    asyncio.run(run())
+
+
+def test_fast_path_queries_are_guarded_and_time_out():
+    guard = QueryGuard(None)
+    running = []
+
+    async def fetch(sql, *args):
+        running.append(guard.running)
+        raise asyncpg.QueryCanceledError("canceling statement due to statement timeout")
+
+    async def run():
+        token = query_guard.set(guard)
+
+        try:
+            with pytest.raises(QueryTimeout):
+                await fastpath.timed(fetch, "SELECT 1")
+
+            guard.disconnected = True
+
+            with pytest.raises(ClientDisconnected):
+                await fastpath.timed(fetch, "SELECT 1")
+        finally:
+            query_guard.reset(token)
+
+    asyncio.run(run())
+
+    assert running == [1]
+    assert guard.running == 0
+
+
+def test_fast_path_runs_on_the_request_session_connection():
+    driver_connection = object()
+    conn = mock.Mock(
+        get_raw_connection=mock.AsyncMock(
+            return_value=mock.Mock(driver_connection=driver_connection)
+        )
+    )
+    session = mock.Mock(connection=mock.AsyncMock(return_value=conn))
+
+    async def run():
+        async with fastpath.raw_connection(session) as raw:
+            return raw
+
+    assert asyncio.run(run()) is driver_connection
+    session.connection.assert_awaited_once()
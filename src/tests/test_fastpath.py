@@ -0,0 +1,105 @@
+import asyncio
+from datetime import date, datetime, timedelta
+from unittest import mock
+
+import orjson
+
+from src.books.schemas import Book as BookModel
+from src.books.schemas import BookDetailModel
+from src.books.service import BookService
+from src.config import Config
+from src.db.models import Book, BookTag, Review, Tag, User
+from src.serializers import compile_serializer
+from src.tags.schemas import TagModel
+from src.tags.service import TagService
+
+book_service = BookService()
+tag_service = TagService()
+
+
+async def seed_book(session) -> Book:
+    now = datetime.now()
+    user = User(
+        username="fastpath",
+        email="fastpath@example.com",
+        first_name="fast",
+        last_name="path",
+        is_verified=True,
+        password_hash="hash",
+    )
+    session.add(user)
+    await session.flush()
+
+    book = Book(
+        title="Fast Path",
+        author="Author",
+        publisher="Publisher",
+        published_date=date(2024, 12, 10),
+        page_count=120,
+        language="English",
+        user_uid=user.uid,
+        created_at=now + timedelta(days=1),
+    )
+    tags = [
+        Tag(name=name, book_count=1, created_at=now + timedelta(days=1, seconds=i))
+        for i, name in enumerate(("zeta", "alpha"))
+    ]
+    session.add_all([book, *tags])
+    await session.flush()
+
+    session.add_all(
+        [
+            Review(
+                rating=rating,
+                review_text="review",
+                user_uid=user.uid,
+                book_uid=book.uid,
+                created_at=now + timedelta(minutes=rating),
+            )
+            for rating in (4, 2)
+        ]
+        + [BookTag(book_id=book.uid, tag_id=tag.uid) for tag in tags]
+    )
+    await session.flush()
+    # Make the ORM path load everything from the database, as the fast path does
+    session.expunge_all()
+
+    return book
+
+
+def render(model, result, many: bool = False) -> bytes:
+    serializer = compile_serializer(model)
+
+    return orjson.dumps(serializer.encode_many(result) if many else serializer.encode(result))
+
+
+def test_fast_path_returns_what_the_orm_path_returns(live_session):
+    async def read_all(book_uid, session, fast: bool):
+        with mock.patch.object(Config, "DB_FAST_PATH", fast):
+            return [
+                render(BookModel, await book_service.get_all_books(session), many=True),
+                render(
+                    BookDetailModel,
+                    await book_service.get_book_detail(book_uid, session),
+                ),
+                render(TagModel, await tag_service.get_tags(session), many=True),
+                render(
+                    TagModel,
+                    await tag_service.get_tags(session, sort="popular"),
+                    many=True,
+                ),
+            ]
+
+    async def run():
+        async with live_session() as session:
+            book = await seed_book(session)
+            orm = await read_all(book.uid, session, fast=False)
+            session.expunge_all()
+            fast = await read_all(book.uid, session, fast=True)
+
+        return orm, fast
+
+    orm, fast = asyncio.run(run())
+
+    assert orm == fast
+    assert b"Fast Path" in orm[1]
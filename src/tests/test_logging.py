@@ -0,0 +1,122 @@
+import asyncio
+import io
+import logging
+import queue
+from logging.handlers import QueueListener
+
+import orjson
+import pytest
+
+from src.logger import DeferredQueueHandler, JSONFormatter
+from src.middleware import AccessLogMiddleware, access_logger
+
+
+class Capture(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+@pytest.fixture
+def access_records():
+    handler = Capture()
+    access_logger.addHandler(handler)
+
+    yield handler.records
+
+    access_logger.removeHandler(handler)
+
+
+def serve(middleware, path="/api/v1/books/"):
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "path": path,
+        "client": ("10.0.0.1", 5000),
+    }
+
+    async def receive():
+        return {"type": "http.request"}
+
+    async def send(message):
+        pass
+
+    asyncio.run(middleware(scope, receive, send))
+
+
+def responding(status_code, delay=0.0):
+    async def app(scope, receive, send):
+        await asyncio.sleep(delay)
+        await send({"type": "http.response.start", "status": status_code, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    return app
+
+
+def test_access_log_records_status_and_latency(access_records):
+    serve(AccessLogMiddleware(responding(404, delay=0.02), sample_rate=0, slow_ms=1000))
+
+    [record] = access_records
+    fields = record.fields
+
+    assert record.getMessage() == "GET /api/v1/books/ 404"
+    assert fields["status"] == 404
+    assert fields["method"] == "GET" and fields["path"] == "/api/v1/books/"
+    assert fields["client"] == "10.0.0.1:5000"
+    assert 20 <= fields["duration_ms"] < 1000
+    assert fields["slow"] is False
+
+
+def test_access_log_samples_fast_successes_but_keeps_slow_ones(access_records):
+    serve(AccessLogMiddleware(responding(200), sample_rate=0, slow_ms=1000))
+    assert access_records == []
+
+    serve(AccessLogMiddleware(responding(200, delay=0.01), sample_rate=0, slow_ms=5))
+    assert access_records[0].fields["slow"] is True
+
+
+def test_access_log_reports_500_when_the_app_raises(access_records):
+    async def failing(scope, receive, send):
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        serve(AccessLogMiddleware(failing, sample_rate=0, slow_ms=1000))
+
+    assert access_records[0].fields["status"] == 500
+
+
+def test_queued_records_are_written_as_json_lines():
+    log_queue = queue.SimpleQueue()
+    stream = io.StringIO()
+    stream_handler = logging.StreamHandler(stream)
+    stream_handler.setFormatter(JSONFormatter())
+    listener = QueueListener(log_queue, stream_handler)
+
+    logger = logging.getLogger("bookly.test.queued")
+    logger.addHandler(DeferredQueueHandler(log_queue))
+    logger.propagate = False
+    listener.start()
+
+    try:
+        logger.warning("hello %s", "world", extra={"fields": {"status": 503}})
+
+        try:
+            raise ValueError("bad")
+        except ValueError:
+            logger.exception("failed")
+    finally:
+        listener.stop()
+        logger.handlers.clear()
+
+    first, second = [orjson.loads(line) for line in stream.getvalue().splitlines()]
+
+    assert first["message"] == "hello world"
+    assert first["level"] == "WARNING"
+    assert first["logger"] == "bookly.test.queued"
+    assert first["status"] == 503
+    assert "ts" in first
+    assert second["message"] == "failed"
+    assert "ValueError: bad" in second["exception"]
@@ -0,0 +1,23 @@
+import asyncio
+import time
+
+from src.loop_monitor import LoopMonitor
+
+
+def test_loop_monitor_captures_blocking_call_stack():
+    def blocking_call():
+        time.sleep(0.2)
+
+    async def run():
+        monitor = LoopMonitor(interval=0.01, stall_threshold=0.05)
+        monitor.start()
+        await asyncio.sleep(0.03)
+        blocking_call()
+        await asyncio.sleep(0.03)
+        await monitor.stop()
+
+        return monitor
+
+    monitor = asyncio.run(run())
+
+    assert any("blocking_call" in stack for stack in monitor.recent_stalls)
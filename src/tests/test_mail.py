@@ -0,0 +1,32 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.bench_mail import start_sink
+from src.mail import MailSender, SMTPPool, create_message, mail_config, render_email
+
+
+def test_messages_share_one_pooled_session():
+    sink, port = start_sink(latency=0, handshake=0)
+    config = mail_config.model_copy(
+        update={"MAIL_SERVER": "127.0.0.1", "MAIL_PORT": port, "MAIL_STARTTLS": False}
+    )
+    sender = MailSender(
+        SMTPPool(config, size=1, check_after=30, max_messages=100),
+        batch_size=10,
+        batch_wait=0,
+    )
+    message = create_message(["reader@example.com"], "Verify", "<p>Hi</p>")
+
+    with ThreadPoolExecutor(4) as executor:
+        list(executor.map(lambda _: sender.send(message, timeout=10), range(8)))
+
+    sender.stop()
+
+    assert sink.messages == 8
+    assert sink.connections == 1
+
+
+def test_templates_render_with_escaped_context():
+    subject, html = render_email("verify_email", {"link": 'http://x/"><script>'})
+
+    assert subject == "Verify Your email"
+    assert 'href="http://x/&#34;&gt;&lt;script&gt;"' in html
@@ -0,0 +1,109 @@
+import time
+import uuid
+from unittest import mock
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src import app
+from src.config import Config
+from src.db.stats import NPlusOneDetected, RequestStats
+from src import metrics
+from src.metrics import (
+    CELERY_PUBLISH_LATENCY,
+    CELERY_QUEUE_WAIT,
+    CELERY_TASKS,
+    on_after_task_publish,
+    on_before_task_publish,
+    on_task_postrun,
+    on_task_prerun,
+)
+from src.tracing import PendingSignals
+
+
+def test_request_latency_is_labelled_by_route_template():
+    client = TestClient(app, base_url="http://localhost")
+    book_uid = uuid.uuid4()
+
+    client.get(f"/api/v1/books/{book_uid}")
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert 'route="/api/v1/books/{book_uid}"' in response.text
+    assert str(book_uid) not in response.text
+
+
+def test_repeated_statement_is_flagged_as_n_plus_one():
+    stats = RequestStats()
+
+    with mock.patch.multiple(
+        Config, SQL_N_PLUS_ONE_MODE="raise", SQL_N_PLUS_ONE_THRESHOLD=3
+    ):
+        stats.record_query("SELECT tags.uid FROM tags WHERE tags.name = $1", 1.0)
+        stats.record_query("SELECT books.uid FROM books", 1.0)
+        stats.record_query("SELECT tags.uid FROM tags WHERE tags.name = $1", 1.0)
+
+        with pytest.raises(NPlusOneDetected):
+            stats.record_query("SELECT tags.uid FROM tags WHERE tags.name = $1", 1.0)
+
+    assert stats.query_count == 4
+    assert stats.server_timing().startswith('db;dur=4.0;desc="4 queries"')
+
+
+def test_server_timing_header_reports_phases():
+    client = TestClient(app, base_url="http://localhost")
+
+    response = client.get(f"/api/v1/books/{uuid.uuid4()}")
+
+    assert response.headers["server-timing"].startswith("db;dur=")
+    assert "auth;dur=" in response.headers["server-timing"]
+
+
+def test_celery_tasks_are_measured_per_queue():
+    request = {"published_at": time.time() - 2, "eta": None, "retries": 0}
+    task = mock.Mock()
+    task.name = "src.celery_tasks.send_email"
+    task.request = mock.Mock(
+        delivery_info={"routing_key": "transactional"}, eta=None, retries=0
+    )
+    task.request.get = request.get
+
+    on_task_prerun(task_id="t1", task=task)
+    on_task_postrun(task_id="t1", task=task, state="SUCCESS")
+
+    assert CELERY_TASKS.labels("transactional", task.name, "SUCCESS")._value.get() == 1
+    wait = CELERY_QUEUE_WAIT.labels("transactional")._sum.get()
+    assert 2 <= wait < 3
+
+
+def test_publish_latency_is_read_from_the_message_headers():
+    headers = {"id": "t2"}
+
+    on_before_task_publish(sender="src.celery_tasks.purge", headers=headers)
+    headers["published_at"] -= 1
+    on_after_task_publish(sender="src.celery_tasks.purge", headers=headers)
+
+    latency = CELERY_PUBLISH_LATENCY.labels("src.celery_tasks.purge")._sum.get()
+    assert 1 <= latency < 2
+
+
+def test_pending_signals_drop_the_oldest_entries():
+    pending = PendingSignals(maxsize=2)
+
+    for task_id in ("a", "b", "c"):
+        pending[task_id] = task_id
+
+    assert list(pending) == ["b", "c"]
+
+
+def test_exiting_process_is_marked_dead_in_multiprocess_mode():
+    with mock.patch.object(metrics, "multiprocess") as multiprocess:
+        with mock.patch.object(metrics, "MULTIPROCESS", False):
+            metrics.mark_process_dead()
+
+        multiprocess.mark_process_dead.assert_not_called()
+
+        with mock.patch.object(metrics, "MULTIPROCESS", True):
+            metrics.mark_process_dead()
+
+    multiprocess.mark_process_dead.assert_called_once()
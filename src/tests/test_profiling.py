@@ -0,0 +1,94 @@
+import asyncio
+import time
+from unittest import mock
+
+from fastapi.testclient import TestClient
+
+from src import app
+from src.admin.profiling import RequestProfiler, profile_store
+from src.cache import response_cache
+
+client = TestClient(app, base_url="http://localhost")
+
+
+def profiling_middleware():
+    layer = app.middleware_stack
+
+    while type(layer).__name__ != "ProfilingMiddleware":
+        layer = layer.app
+
+    return layer
+
+
+def test_profile_quota_failure_serves_the_request_unprofiled():
+    with mock.patch(
+        "src.middleware.is_admin", mock.AsyncMock(return_value=True)
+    ), mock.patch.object(
+        profile_store, "acquire_slot", mock.AsyncMock(side_effect=ConnectionError)
+    ):
+        response = client.get("/health", headers={"X-Profile": "1"})
+
+    assert response.status_code == 200
+    assert response.headers["x-profile-status"] == "rate-limited"
+    assert profiling_middleware().active is False
+
+
+def test_profile_save_failure_does_not_break_profiling():
+    with mock.patch(
+        "src.middleware.is_admin", mock.AsyncMock(return_value=True)
+    ), mock.patch.object(
+        profile_store, "acquire_slot", mock.AsyncMock(return_value=True)
+    ), mock.patch.object(
+        profile_store, "save", mock.AsyncMock(side_effect=ConnectionError)
+    ):
+        response = client.get("/health", headers={"X-Profile": "1"})
+
+    assert response.status_code == 200
+    assert "x-profile-id" in response.headers
+    assert profiling_middleware().active is False
+
+
+def test_profiled_requests_skip_the_response_cache():
+    cached = (200, [["content-type", "application/json"]], b"[]", time.time())
+    cache_get = mock.AsyncMock(return_value=cached)
+
+    with mock.patch(
+        "src.middleware.is_admin", mock.AsyncMock(return_value=True)
+    ), mock.patch.object(
+        profile_store, "acquire_slot", mock.AsyncMock(return_value=True)
+    ), mock.patch.object(
+        profile_store, "save", mock.AsyncMock()
+    ), mock.patch.object(
+        response_cache, "vary_values", mock.AsyncMock(return_value=["user"])
+    ), mock.patch.object(
+        response_cache, "entry_key", mock.AsyncMock(return_value="key")
+    ), mock.patch.object(response_cache, "get", cache_get):
+        response = client.get(
+            "/api/v1/tags/",
+            headers={"X-Profile": "1", "Authorization": "Bearer token"},
+        )
+
+    assert "x-profile-id" in response.headers
+    assert "x-cache" not in response.headers
+    cache_get.assert_not_called()
+
+
+def test_request_profiler_samples_the_running_task():
+    def busy_work():
+        deadline = time.monotonic() + 0.05
+        while time.monotonic() < deadline:
+            pass
+
+    async def profiled():
+        profiler = RequestProfiler(interval=0.001, max_seconds=5)
+        profiler.start()
+        busy_work()
+        await asyncio.sleep(0.02)
+        profiler.stop()
+
+        return profiler.folded()
+
+    folded = asyncio.run(profiled())
+
+    assert "busy_work (" in folded
+    assert "(awaiting I/O)" in folded
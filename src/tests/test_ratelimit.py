@@ -0,0 +1,49 @@
+import asyncio
+from unittest import mock
+
+from fastapi.testclient import TestClient
+
+from src import app, ratelimit
+from src.ratelimit import Decision, RateLimiter, RateLimitPolicy, rate_limiter
+
+policy = RateLimitPolicy(per_minute=600, burst=100)
+
+
+def test_reserved_tokens_are_spent_without_redis():
+    limiter = RateLimiter()
+    bucket = mock.AsyncMock(return_value=[10, b"90", 0])
+
+    async def run():
+        return [await limiter.check(policy, "books", "user:1", None) for _ in range(10)]
+
+    with mock.patch.object(ratelimit, "token_bucket", bucket):
+        decisions = asyncio.run(run())
+
+    assert bucket.await_count == 1
+    assert all(decision.allowed for decision in decisions)
+    assert decisions[-1].remaining == 90
+
+
+def test_empty_bucket_is_rejected_with_retry_after():
+    limiter = RateLimiter()
+    bucket = mock.AsyncMock(return_value=[0, b"0.2", 1500])
+
+    with mock.patch.object(ratelimit, "token_bucket", bucket):
+        decision = asyncio.run(limiter.check(policy, "books", "ip:1.2.3.4", None))
+
+    assert not decision.allowed
+    assert decision.retry_after == 1.5
+
+
+def test_rate_limited_request_gets_429_with_headers():
+    client = TestClient(app, base_url="http://localhost")
+    rejected = mock.AsyncMock(return_value=Decision(False, 10, 0, 2.5))
+
+    with mock.patch.object(rate_limiter, "check", rejected):
+        response = client.post("/api/v1/auth/login", json={})
+
+    assert response.status_code == 429
+    assert response.json()["error_code"] == "rate_limited"
+    assert response.headers["retry-after"] == "3"
+    assert response.headers["x-ratelimit-limit"] == "10"
+    assert rejected.await_args.args[1] == "POST:/api/v1/auth/login"
@@ -0,0 +1,109 @@
+import json
+import uuid
+from datetime import date, datetime
+
+import orjson
+
+from src.auth.schemas import UserBooksModel
+from src.books.schemas import BookDetailModel
+from src.db.fastpath import BookRecord, ReviewRecord, TagRecord
+from src.db.models import Book, Review, Tag, User
+from src.serializers import compile_serializer
+
+
+def make_book():
+    book = Book(
+        uid=uuid.uuid4(),
+        title="sample title",
+        author="sample author",
+        publisher="sample publisher",
+        published_date=date(2024, 12, 10),
+        page_count=200,
+        language="English",
+        created_at=datetime(2024, 12, 10, 8, 30),
+        update_at=datetime.now(),
+    )
+    book.reviews = [
+        Review(
+            uid=uuid.uuid4(),
+            rating=4,
+            review_text="Great read",
+            user_uid=uuid.uuid4(),
+            book_uid=book.uid,
+            created_at=datetime.now(),
+            update_at=datetime.now(),
+        )
+    ]
+    book.tags = [
+        Tag(uid=uuid.uuid4(), name="fiction", book_count=3, created_at=datetime.now())
+    ]
+    return book
+
+
+def pydantic_json(model, obj):
+    validated = model.model_validate(obj, from_attributes=True)
+    return json.loads(validated.model_dump_json())
+
+
+def test_book_detail_serializer_matches_pydantic():
+    book = make_book()
+
+    fast = orjson.loads(orjson.dumps(compile_serializer(BookDetailModel).encode(book)))
+
+    assert fast == pydantic_json(BookDetailModel, book)
+
+
+def test_user_serializer_skips_excluded_fields():
+    user = User(
+        uid=uuid.uuid4(),
+        username="jod35",
+        email="jodestrevin@gmail.com",
+        first_name="jonathan",
+        last_name="ssali",
+        is_verified=True,
+        password_hash="secret",
+        created_at=datetime.now(),
+        update_at=datetime.now(),
+    )
+    user.books = [make_book()]
+    user.reviews = []
+
+    encoded = compile_serializer(UserBooksModel).encode(user)
+
+    assert "password_hash" not in encoded
+    assert orjson.loads(orjson.dumps(encoded)) == pydantic_json(UserBooksModel, user)
+
+
+def test_fast_path_records_serialize_like_orm_objects():
+    book = make_book()
+    review, tag = book.reviews[0], book.tags[0]
+
+    record = BookRecord(
+        str(book.uid),
+        book.title,
+        book.author,
+        book.publisher,
+        book.published_date,
+        book.page_count,
+        book.language,
+        book.created_at,
+        book.update_at,
+    )
+    record.reviews = [
+        ReviewRecord(
+            str(review.uid),
+            review.rating,
+            review.review_text,
+            str(review.user_uid),
+            str(review.book_uid),
+            review.created_at,
+            review.update_at,
+        )
+    ]
+    record.tags = [TagRecord(str(tag.uid), tag.name, tag.book_count, tag.created_at)]
+
+    serializer = compile_serializer(BookDetailModel)
+
+    assert orjson.dumps(serializer.encode(record)) == orjson.dumps(
+        serializer.encode(book)
+    )
@@ -0,0 +1,106 @@
+import asyncio
+from unittest import mock
+
+import pytest
+
+from src.db.deadlines import ClientDisconnected
+from src.singleflight import SingleFlight, single_flight
+
+
+class FakeService:
+    def __init__(self):
+        self.calls = 0
+
+    @single_flight()
+    async def get_thing(self, uid: str, session=None):
+        self.calls += 1
+        await asyncio.sleep(0.01)
+        return {"uid": uid}
+
+
+def test_concurrent_identical_calls_share_one_execution():
+    service = FakeService()
+
+    async def run():
+        return await asyncio.gather(
+            *(service.get_thing("a") for _ in range(10)), service.get_thing("b")
+        )
+
+    results = asyncio.run(run())
+
+    assert service.calls == 2
+    assert results[:10] == [{"uid": "a"}] * 10
+    assert results[10] == {"uid": "b"}
+
+
+def test_waiters_run_the_call_when_the_leader_is_cancelled():
+    flight = SingleFlight("test")
+    calls = []
+
+    async def call():
+        calls.append(1)
+        await asyncio.sleep(0.02)
+        return "done"
+
+    async def run():
+        leader = asyncio.create_task(flight.do("key", call))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(flight.do("key", call))
+        await asyncio.sleep(0)
+        leader.cancel()
+
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+
+        return await waiter
+
+    assert asyncio.run(run()) == "done"
+    assert len(calls) == 2
+
+
+def test_waiters_run_the_call_when_the_leader_client_disconnects():
+    flight = SingleFlight("test")
+    calls = []
+    leader_gone = asyncio.Event()
+
+    async def leader_call():
+        calls.append("leader")
+        await leader_gone.wait()
+        raise ClientDisconnected()
+
+    async def follower_call():
+        calls.append("follower")
+        return "done"
+
+    async def run():
+        leader = asyncio.create_task(flight.do("key", leader_call))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(flight.do("key", follower_call))
+        await asyncio.sleep(0)
+        leader_gone.set()
+
+        with pytest.raises(ClientDisconnected):
+            await leader
+
+        return await follower
+
+    assert asyncio.run(run()) == "done"
+    assert calls == ["leader", "follower"]
+
+
+def test_distributed_leader_does_not_publish_a_miss():
+    flight = SingleFlight("test", distributed=True)
+    redis = mock.AsyncMock()
+    redis.get.return_value = None
+    redis.set.return_value = True
+
+    async def call():
+        return None
+
+    with mock.patch("src.singleflight.redis_client", redis):
+        assert asyncio.run(flight.do("key", call)) is None
+
+    # Only the lock was set; the result was not published
+    assert redis.set.await_count == 1
+    assert redis.set.await_args.kwargs["nx"] is True
+    redis.delete.assert_awaited_once()
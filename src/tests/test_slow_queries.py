@@ -0,0 +1,50 @@
+import asyncio
+from unittest import mock
+
+from src.config import Config
+from src.db import slow_queries
+from src.db.slow_queries import SlowQueryLog, fingerprint
+
+
+def test_slow_query_fingerprint_ignores_values_and_in_list_length():
+    short = "SELECT tags.uid FROM tags WHERE tags.name IN ($1, $2) LIMIT $3"
+    long = "SELECT tags.uid FROM tags WHERE tags.name IN ($1, $2, $3, $4)\n LIMIT $5"
+
+    assert fingerprint(short) == fingerprint(long)
+    assert fingerprint(short) != fingerprint("SELECT books.uid FROM books")
+
+
+def test_fingerprints_outside_the_kept_set_are_not_explained():
+    log = SlowQueryLog()
+    record = mock.AsyncMock(return_value=0)
+    entry = {"fingerprint": "fp", "statement": "SELECT 1", "elapsed_ms": 250.0}
+
+    with mock.patch.object(slow_queries, "record_slow_query", record), mock.patch.object(
+        log, "should_explain", mock.AsyncMock()
+    ) as should_explain, mock.patch.object(Config, "SLOW_QUERY_MAX_FINGERPRINTS", 5):
+        asyncio.run(log.process(entry, ()))
+
+    assert record.await_args.kwargs["keys"] == [
+        slow_queries.STATS_KEY,
+        slow_queries.COUNTS_KEY,
+        slow_queries.SAMPLES_KEY,
+    ]
+    assert record.await_args.kwargs["args"][:3] == ["fp", 250.0, 5]
+    should_explain.assert_not_awaited()
+
+
+def test_explain_bookkeeping_is_bounded():
+    log = SlowQueryLog()
+    redis = mock.AsyncMock()
+    redis.set.return_value = True
+
+    async def run():
+        for fp in ("a", "b", "c", "d"):
+            assert await log.should_explain(fp)
+
+    with mock.patch.object(slow_queries, "redis_client", redis), mock.patch.object(
+        Config, "SLOW_QUERY_MAX_FINGERPRINTS", 2
+    ):
+        asyncio.run(run())
+
+    assert list(log.explained_at) == ["c", "d"]
@@ -0,0 +1,205 @@
+import asyncio
+import uuid
+from contextlib import asynccontextmanager
+from datetime import date, datetime, timedelta
+from unittest import mock
+
+from sqlmodel import select, update
+
+from src import celery_tasks
+from src.books.service import BookService
+from src.cache import response_cache
+from src.config import Config
+from src.db.models import Book, BookTag, Review, Tag, User
+from src.reviews.service import ReviewService
+from src.tags.suggest import tag_suggest_index
+
+book_service = BookService()
+review_service = ReviewService()
+
+
+def test_relationships_hide_tombstoned_rows():
+    joins = [
+        Book.reviews.property.primaryjoin,
+        User.books.property.primaryjoin,
+        User.reviews.property.primaryjoin,
+        Tag.books.property.secondaryjoin,
+    ]
+
+    for join in joins:
+        assert "deleted_at IS NULL" in str(join)
+
+
+def test_purge_runs_batches_until_one_comes_back_short():
+    purge = mock.AsyncMock(side_effect=[2, 2, 1, 2])
+
+    @asynccontextmanager
+    async def session():
+        yield mock.Mock()
+
+    with mock.patch.object(celery_tasks, "WorkerSession", session), mock.patch.multiple(
+        Config, PURGE_BATCH_SIZE=2, PURGE_MAX_BATCHES=10, PURGE_BATCH_PAUSE_SECONDS=0
+    ):
+        assert asyncio.run(celery_tasks.purge_in_batches(purge)) == 5
+
+    assert purge.await_count == 3
+    assert purge.await_args.args[:2] == (2, timedelta(seconds=Config.PURGE_GRACE_SECONDS))
+
+
+def test_purge_stops_after_the_batch_limit():
+    purge = mock.AsyncMock(return_value=2)
+
+    @asynccontextmanager
+    async def session():
+        yield mock.Mock()
+
+    with mock.patch.object(celery_tasks, "WorkerSession", session), mock.patch.multiple(
+        Config, PURGE_BATCH_SIZE=2, PURGE_MAX_BATCHES=3, PURGE_BATCH_PAUSE_SECONDS=0
+    ):
+        assert asyncio.run(celery_tasks.purge_in_batches(purge)) == 6
+
+    assert purge.await_count == 3
+
+
+def test_purge_refreshes_tag_popularity():
+    book_uid, tag_uid = uuid.uuid4(), uuid.uuid4()
+    results = [
+        mock.Mock(all=mock.Mock(return_value=[book_uid])),
+        mock.Mock(all=mock.Mock(return_value=[(tag_uid, 1)])),
+        mock.Mock(),
+        mock.Mock(),
+    ]
+    session = mock.Mock(exec=mock.AsyncMock(side_effect=results), commit=mock.AsyncMock())
+    invalidate = mock.AsyncMock()
+
+    with mock.patch.object(response_cache, "invalidate", invalidate), mock.patch.object(
+        tag_suggest_index, "bump"
+    ) as bump:
+        purged = asyncio.run(
+            book_service.purge_deleted_books(10, timedelta(hours=1), session)
+        )
+
+    assert purged == 1
+    invalidate.assert_awaited_once_with("tags")
+    bump.assert_called_once_with(tag_uid, -1)
+
+
+async def seed(session):
+    user = User(
+        username="tombstone",
+        email="tombstone@example.com",
+        first_name="tomb",
+        last_name="stone",
+        password_hash="hash",
+    )
+    session.add(user)
+    await session.flush()
+
+    books = [
+        Book(
+            title=f"Book {i}",
+            author="Author",
+            publisher="Publisher",
+            published_date=date(2024, 12, 10),
+            page_count=100,
+            language="English",
+            user_uid=user.uid,
+        )
+        for i in range(3)
+    ]
+    tag = Tag(name="tombstoned", book_count=len(books))
+    session.add_all([*books, tag])
+    await session.flush()
+
+    reviews = [
+        Review(rating=3, review_text="review", user_uid=user.uid, book_uid=book.uid)
+        for book in books
+    ]
+    session.add_all(reviews + [BookTag(book_id=book.uid, tag_id=tag.uid) for book in books])
+    await session.flush()
+
+    return user.uid, [book.uid for book in books], tag.uid, [r.uid for r in reviews]
+
+
+def test_tombstoned_books_and_reviews_are_hidden(live_session):
+    async def run():
+        async with live_session() as session:
+            user_uid, book_uids, tag_uid, review_uids = await seed(session)
+
+            assert await book_service.delete_book(book_uids[0], session) == {}
+            # Deleting twice finds nothing live
+            assert await book_service.delete_book(book_uids[0], session) is None
+
+            await session.exec(
+                update(Review)
+                .where(Review.uid == review_uids[1])
+                .values(deleted_at=datetime.now())
+            )
+            session.expunge_all()
+
+            assert await book_service.get_book(book_uids[0], session) is None
+
+            user = (await session.exec(select(User).where(User.uid == user_uid))).one()
+            tag = (await session.exec(select(Tag).where(Tag.uid == tag_uid))).one()
+            book = await book_service.get_book(book_uids[1], session)
+
+            return (
+                book_uids,
+                review_uids,
+                {b.uid for b in user.books},
+                {b.uid for b in tag.books},
+                {r.uid for r in user.reviews},
+                book.reviews,
+            )
+
+    book_uids, review_uids, user_books, tag_books, user_reviews, book_reviews = (
+        asyncio.run(run())
+    )
+
+    assert user_books == tag_books == set(book_uids[1:])
+    assert user_reviews == {review_uids[0], review_uids[2]}
+    assert book_reviews == []
+
+
+def test_purge_removes_expired_tombstones_in_batches(live_session):
+    async def run():
+        async with live_session() as session:
+            _, book_uids, tag_uid, review_uids = await seed(session)
+            expired = datetime.now() - timedelta(hours=2)
+
+            await session.exec(
+                update(Book).where(Book.uid.in_(book_uids[:2])).values(deleted_at=expired)
+            )
+            await session.exec(
+                update(Review).where(Review.uid == review_uids[2]).values(deleted_at=expired)
+            )
+
+            grace = timedelta(hours=1)
+            first = await book_service.purge_deleted_books(1, grace, session)
+            second = await book_service.purge_deleted_books(1, grace, session)
+            third = await book_service.purge_deleted_books(1, grace, session)
+            reviews = await review_service.purge_deleted_reviews(10, grace, session)
+            session.expunge_all()
+
+            remaining_books = (
+                await session.exec(select(Book.uid).where(Book.uid.in_(book_uids)))
+            ).all()
+            remaining_reviews = (
+                await session.exec(select(Review.uid).where(Review.uid.in_(review_uids)))
+            ).all()
+            tag = (await session.exec(select(Tag).where(Tag.uid == tag_uid))).one()
+
+            return (
+                (first, second, third, reviews),
+                remaining_books == [book_uids[2]],
+                remaining_reviews,
+                tag.book_count,
+            )
+
+    counts, only_live_book_left, remaining_reviews, book_count = asyncio.run(run())
+
+    assert counts == (1, 1, 0, 1)
+    assert only_live_book_left
+    # Reviews of purged books go with them; the expired review on the live book too
+    assert remaining_reviews == []
+    assert book_count == 1
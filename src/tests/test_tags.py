@@ -0,0 +1,192 @@
+import asyncio
+import uuid
+from types import SimpleNamespace
+from unittest import mock
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.dialects import postgresql
+
+from src import app
+from src.cache import response_cache
+from src.config import Config
+from src.db import fastpath
+from src.db.models import Tag
+from src.errors import TagNotFound
+from src.tags import routes as tag_routes
+from src.tags import service as tag_service_module
+from src.tags.schemas import TagAddModel
+from src.tags.service import TagService
+from src.tags.suggest import TagSuggestIndex, search_tags_in_db
+
+
+def build_index(*rows):
+    index = TagSuggestIndex()
+    index.build([(uuid.uuid4(), name, weight) for name, weight in rows])
+    return index
+
+
+def test_suggest_orders_prefix_matches_by_popularity():
+    index = build_index(("Python", 3), ("Pytest", 10), ("Rust", 50), ("pyramid", 1))
+
+    names = [tag["name"] for tag in index.search("py", limit=10)]
+
+    assert names == ["Pytest", "Python", "pyramid"]
+
+
+def test_suggest_respects_limit():
+    index = build_index(("fantasy", 5), ("fable", 2), ("fairy tales", 9))
+
+    names = [tag["name"] for tag in index.search("FA", limit=2)]
+
+    assert names == ["fairy tales", "fantasy"]
+
+
+def test_suggest_index_tracks_mutations():
+    index = build_index(("history", 4))
+    tag_uid = uuid.uuid4()
+
+    index.add(tag_uid, "horror")
+    index.link(tag_uid, "horror")
+    assert index.search("hor", limit=5)[0]["book_count"] == 1
+
+    index.rename(tag_uid, "thriller")
+    assert index.search("hor", limit=5) == []
+    assert index.search("thr", limit=5)[0]["uid"] == tag_uid
+
+    index.remove(tag_uid)
+    assert index.search("thr", limit=5) == []
+    assert len(index) == 1
+
+
+
+def test_suggest_ranking_for_short_prefixes_follows_mutations():
+    index = build_index(("poetry", 5), ("politics", 2))
+    tag_uid = uuid.uuid4()
+
+    assert [tag["name"] for tag in index.search("p", limit=1)] == ["poetry"]
+
+    index.add(tag_uid, "philosophy", 9)
+    assert [tag["name"] for tag in index.search("p", limit=1)] == ["philosophy"]
+
+    index.bump(tag_uid, -9)
+    assert [tag["name"] for tag in index.search("P", limit=3)] == [
+        "poetry",
+        "politics",
+        "philosophy",
+    ]
+
+
+def test_suggest_db_fallback_trims_like_the_index():
+    session = mock.Mock(exec=mock.AsyncMock(return_value=mock.Mock(all=list)))
+
+    asyncio.run(search_tags_in_db("  Sci ", 5, session))
+
+    statement = session.exec.await_args.args[0]
+    sql = str(statement.compile(dialect=postgresql.dialect()))
+
+    assert "lower(trim(tags.name)) LIKE" in sql
+    assert "sci%" in statement.compile().params.values()
+    assert build_index((" Science ", 1)).search("  Sci ", limit=5)[0]["name"] == " Science "
+
+
+@pytest.mark.parametrize(
+    "path", ["/api/v1/tags/not-a-uid/books", f"/api/v1/tags/{uuid.uuid4()}/books?after=oops"]
+)
+def test_tag_books_rejects_malformed_uids(path):
+    get_tag_books = mock.AsyncMock()
+    app.dependency_overrides[tag_routes.user_role_checker.dependency] = lambda: True
+
+    try:
+        with mock.patch.object(tag_routes.tag_service, "get_tag_books", get_tag_books):
+            response = TestClient(app, base_url="http://localhost").get(path)
+    finally:
+        app.dependency_overrides.pop(tag_routes.user_role_checker.dependency)
+
+    assert response.status_code == 422
+    get_tag_books.assert_not_called()
+
+
+
+def statement_sql(call):
+    return str(call.args[0].compile(dialect=postgresql.dialect()))
+
+
+@pytest.fixture
+def tag_writes():
+    session = mock.Mock(
+        exec=mock.AsyncMock(), commit=mock.AsyncMock(), refresh=mock.AsyncMock()
+    )
+
+    with mock.patch.object(
+        response_cache, "invalidate", mock.AsyncMock()
+    ), mock.patch.object(tag_service_module, "tag_suggest_index") as index:
+        yield session, index
+
+
+def test_linking_tags_counts_each_new_link_once(tag_writes):
+    session, index = tag_writes
+    linked = Tag(uid=uuid.uuid4(), name="linked", book_count=2)
+    existing = Tag(uid=uuid.uuid4(), name="existing", book_count=5)
+    book = SimpleNamespace(uid=uuid.uuid4(), tags=[linked])
+    session.exec.side_effect = [
+        mock.Mock(all=mock.Mock(return_value=[linked, existing])),
+        mock.Mock(),
+    ]
+    tag_data = TagAddModel(
+        tags=[{"name": name} for name in ("linked", "existing", "new", "existing")]
+    )
+
+    with mock.patch.object(
+        tag_service_module.book_service, "get_book", mock.AsyncMock(return_value=book)
+    ):
+        asyncio.run(TagService().add_tags_to_book(book.uid, tag_data, session))
+
+    increment = session.exec.await_args_list[1]
+    params = increment.args[0].compile(dialect=postgresql.dialect()).params
+
+    assert "SET book_count=(tags.book_count + " in statement_sql(increment)
+    # Only the already existing, not yet linked tag is incremented, once
+    assert params["uid_1"] == [existing.uid]
+    assert params["book_count_1"] == 1
+    assert [tag.name for tag in book.tags] == ["linked", "existing", "new"]
+    assert book.tags[-1].book_count == 1
+    assert [call.args[1] for call in index.link.call_args_list] == ["existing", "new"]
+
+
+def test_unlinking_a_tag_lowers_its_count(tag_writes):
+    session, index = tag_writes
+    tag_uid = uuid.uuid4()
+    session.exec.side_effect = [mock.Mock(scalar=mock.Mock(return_value=tag_uid)), mock.Mock()]
+
+    asyncio.run(TagService().remove_tag_from_book(uuid.uuid4(), tag_uid, session))
+
+    unlink, decrement = (statement_sql(call) for call in session.exec.await_args_list)
+
+    assert unlink.startswith("DELETE FROM booktag")
+    assert "SET book_count=(tags.book_count - " in decrement
+    index.bump.assert_called_once_with(tag_uid, -1)
+
+
+def test_unlinking_a_tag_that_is_not_linked_changes_no_count(tag_writes):
+    session, index = tag_writes
+    session.exec.side_effect = [mock.Mock(scalar=mock.Mock(return_value=None))]
+
+    with pytest.raises(TagNotFound):
+        asyncio.run(TagService().remove_tag_from_book(uuid.uuid4(), uuid.uuid4(), session))
+
+    assert session.exec.await_count == 1
+    session.commit.assert_not_awaited()
+    index.bump.assert_not_called()
+
+
+def test_popular_tags_are_ordered_by_book_count():
+    session = mock.Mock(exec=mock.AsyncMock(return_value=mock.Mock(all=list)))
+
+    with mock.patch.object(Config, "DB_FAST_PATH", False):
+        asyncio.run(TagService().get_tags(session, sort="popular"))
+
+    assert statement_sql(session.exec.await_args).endswith(
+        "ORDER BY tags.book_count DESC, tags.created_at DESC"
+    )
+    assert "ORDER BY book_count DESC, created_at DESC" in fastpath.TAG_LIST_SQL["popular"]
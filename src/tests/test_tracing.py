@@ -0,0 +1,40 @@
+from unittest import mock
+
+from fastapi.testclient import TestClient
+
+from src import app
+from src.config import Config
+from src.tracing import exporter, inject_trace_context, span
+
+
+def test_request_spans_continue_incoming_trace():
+    trace_id = "4bf92f3577b34da6a3ce929d0e0e4736"
+    client = TestClient(app, base_url="http://localhost")
+
+    with mock.patch.object(Config, "TRACE_EXPORTER", "file"), mock.patch.object(
+        exporter, "export"
+    ) as export:
+        response = client.get(
+            "/api/v1/books/6f1a4c1e-8a53-4a7b-9d0e-0c1c2f7a1b2c",
+            headers={"traceparent": f"00-{trace_id}-00f067aa0ba902b7-01"},
+        )
+
+    spans = {s.name: s for (s,), _ in export.call_args_list}
+    server = spans["GET /api/v1/books/{book_uid}"]
+
+    assert server.trace_id == trace_id
+    assert server.parent_id == "00f067aa0ba902b7"
+    assert spans["AccessTokenBearer"].parent_id == server.span_id
+    assert response.headers["traceparent"] == server.traceparent
+
+
+def test_celery_publish_carries_traceparent():
+    headers = {"id": "task-1"}
+
+    with mock.patch.object(Config, "TRACE_EXPORTER", "file"), mock.patch.object(
+        exporter, "export"
+    ):
+        with span("request") as request_span:
+            inject_trace_context(sender="src.celery_tasks.send_email", headers=headers)
+
+    assert headers["traceparent"].split("-")[1] == request_span.trace_id
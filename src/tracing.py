@@ -0,0 +1,343 @@
+import functools
+import inspect
+import logging
+import os
+import queue
+import threading
+import time
+import urllib.request
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import orjson
+from celery.signals import (
+    after_task_publish,
+    before_task_publish,
+    task_postrun,
+    task_prerun,
+)
+
+from src.config import Config
+
+logger = logging.getLogger("bookly.tracing")
+
+SPAN_KIND = {"internal": 1, "server": 2, "client": 3, "producer": 4, "consumer": 5}
+
+
+class Span:
+    __slots__ = (
+        "trace_id",
+        "span_id",
+        "parent_id",
+        "name",
+        "kind",
+        "start_ns",
+        "end_ns",
+        "attributes",
+        "error",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        parent: Optional["Span"] = None,
+        kind: str = "internal",
+        trace_id: Optional[str] = None,
+        parent_id: Optional[str] = None,
+        attributes: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        self.trace_id = trace_id or (parent.trace_id if parent else os.urandom(16).hex())
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id or (parent.span_id if parent else None)
+        self.name = name
+        self.kind = kind
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes = attributes or {}
+        self.error: Optional[str] = None
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def end(self) -> None:
+        self.end_ns = time.time_ns()
+        exporter.export(self)
+
+    def to_otlp(self) -> dict:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": SPAN_KIND[self.kind],
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [
+                {"key": key, "value": {"stringValue": str(value)}}
+                for key, value in self.attributes.items()
+            ],
+            "status": {"code": 2, "message": self.error} if self.error else {"code": 1},
+        }
+
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+
+        return span
+
+
+class SpanExporter:
+    """Batch finished spans on a background thread as OTLP/JSON.
+
+    TRACE_EXPORTER=file appends one OTLP `ExportTraceServiceRequest` per
+    batch to TRACE_FILE; TRACE_EXPORTER=otlp posts it to an OTLP/HTTP
+    collector at TRACE_OTLP_ENDPOINT.
+    """
+
+    def __init__(self) -> None:
+        self.queue: queue.SimpleQueue = queue.SimpleQueue()
+        self.thread: Optional[threading.Thread] = None
+        self.pid: Optional[int] = None
+
+    def export(self, span: Span) -> None:
+        if self.pid != os.getpid():
+            # Forked workers (uvicorn, celery prefork) need their own thread
+            self.pid = os.getpid()
+            self.thread = threading.Thread(
+                target=self.run, name="bookly-span-exporter", daemon=True
+            )
+            self.thread.start()
+
+        self.queue.put(span)
+
+    def run(self) -> None:
+        while True:
+            batch = [self.queue.get()]
+            deadline = time.monotonic() + Config.TRACE_EXPORT_INTERVAL_SECONDS
+
+            while len(batch) < Config.TRACE_EXPORT_BATCH_SIZE:
+                timeout = deadline - time.monotonic()
+
+                if timeout <= 0:
+                    break
+
+                try:
+                    batch.append(self.queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+
+            try:
+                self.write(batch)
+            except Exception:
+                logger.exception("Could not export %s spans", len(batch))
+
+    def write(self, batch) -> None:
+        payload = orjson.dumps(
+            {
+                "resourceSpans": [
+                    {
+                        "resource": {
+                            "attributes": [
+                                {
+                                    "key": "service.name",
+                                    "value": {"stringValue": Config.TRACE_SERVICE_NAME},
+                                }
+                            ]
+                        },
+                        "scopeSpans": [
+                            {
+                                "scope": {"name": "bookly"},
+                                "spans": [span.to_otlp() for span in batch],
+                            }
+                        ],
+                    }
+                ]
+            }
+        )
+
+        if Config.TRACE_EXPORTER == "otlp":
+            request = urllib.request.Request(
+                Config.TRACE_OTLP_ENDPOINT,
+                data=payload,
+                headers={"Content-Type": "application/json"},
+                method="POST",
+            )
+            urllib.request.urlopen(request, timeout=5).close()
+            return
+
+        path = Path(Config.TRACE_FILE)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        with path.open("ab") as f:
+            f.write(payload + b"\n")
+
+
+exporter = SpanExporter()
+
+current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+def tracing_enabled() -> bool:
+    return Config.TRACE_EXPORTER != "off"
+
+
+def parse_traceparent(value: Optional[str]):
+    """Return (trace_id, parent span_id) from a W3C `traceparent` header"""
+
+    parts = (value or "").split("-")
+
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None, None
+
+    return parts[1], parts[2]
+
+
+def start_span(name: str, kind: str = "internal", **attributes) -> Optional[Span]:
+    """Start a child of the current span without making it current (leaf spans)"""
+
+    if not tracing_enabled():
+        return None
+
+    return Span(name, parent=current_span.get(), kind=kind, attributes=attributes)
+
+
+@contextmanager
+def span(name: str, kind: str = "internal", traceparent: Optional[str] = None, **attributes):
+    """Run the block inside a new span that becomes the current one"""
+
+    if not tracing_enabled():
+        yield None
+        return
+
+    trace_id, parent_id = parse_traceparent(traceparent)
+    new_span = Span(
+        name,
+        parent=current_span.get(),
+        kind=kind,
+        trace_id=trace_id,
+        parent_id=parent_id,
+        attributes=attributes,
+    )
+    token = current_span.set(new_span)
+
+    try:
+        yield new_span
+    except BaseException as exc:
+        new_span.error = f"{type(exc).__name__}: {exc}"
+        raise
+    finally:
+        current_span.reset(token)
+        new_span.end()
+
+
+def traced(name: Optional[str] = None):
+    """Decorator running a sync or async function inside a span"""
+
+    def decorator(func):
+        span_name = name or func.__qualname__
+
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(span_name):
+                    return await func(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def traced_service(cls):
+    """Class decorator tracing every public coroutine method of a service"""
+
+    for attr, value in list(vars(cls).items()):
+        if not attr.startswith("_") and inspect.iscoroutinefunction(value):
+            setattr(cls, attr, traced(f"{cls.__name__}.{attr}")(value))
+
+    return cls
+
+
+class PendingSignals(OrderedDict):
+    """Entries keyed by task id between a start and an end Celery signal.
+
+    The oldest entries are dropped once `maxsize` are pending, so ones whose
+    end signal never fires (a publish that raised, a killed worker) cannot
+    pile up for the life of the process.
+    """
+
+    def __init__(self, maxsize: int = 10_000) -> None:
+        super().__init__()
+        self.maxsize = maxsize
+
+    def __setitem__(self, key, value) -> None:
+        super().__setitem__(key, value)
+
+        while len(self) > self.maxsize:
+            self.popitem(last=False)
+
+
+_publish_spans: Dict[str, Span] = PendingSignals()
+_task_spans: Dict[str, tuple] = PendingSignals()
+
+
+@before_task_publish.connect
+def inject_trace_context(sender=None, headers=None, **kwargs):
+    if headers is None or "id" not in headers:
+        return
+
+    publish_span = start_span(f"celery.publish {sender}", kind="producer", task=sender)
+
+    if publish_span is not None:
+        headers["traceparent"] = publish_span.traceparent
+        _publish_spans[headers["id"]] = publish_span
+
+
+@after_task_publish.connect
+def end_publish_span(sender=None, headers=None, **kwargs):
+    publish_span = _publish_spans.pop((headers or {}).get("id"), None)
+
+    if publish_span is not None:
+        publish_span.end()
+
+
+@task_prerun.connect
+def start_task_span(task_id=None, task=None, **kwargs):
+    if not tracing_enabled():
+        return
+
+    trace_id, parent_id = parse_traceparent(task.request.get("traceparent"))
+    task_span = Span(
+        f"celery.task {task.name}",
+        kind="consumer",
+        trace_id=trace_id,
+        parent_id=parent_id,
+        attributes={"task_id": task_id},
+    )
+    _task_spans[task_id] = (task_span, current_span.set(task_span))
+
+
+@task_postrun.connect
+def end_task_span(task_id=None, state=None, **kwargs):
+    entry = _task_spans.pop(task_id, None)
+
+    if entry is None:
+        return
+
+    task_span, token = entry
+    current_span.reset(token)
+    task_span.attributes["state"] = state
+
+    if state == "FAILURE":
+        task_span.error = state
+
+    task_span.end()